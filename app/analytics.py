@@ -0,0 +1,52 @@
+import os
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class LazyPosthog:
+    """
+    Stand-in for the PostHog client that imports posthog (~50 ms) and
+    builds the real client on the first attribute access instead of at boot.
+    """
+
+    def __init__(self):
+        self._client = None
+        # The startup prewarm thread and the first request can both get here first.
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._client is not None
+
+    def __getattr__(self, name):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from posthog import Posthog
+                    client = Posthog(
+                        project_api_key=os.getenv("POSTHOG_API_KEY"),
+                        host=os.getenv("POSTHOG_HOST", "https://us.i.posthog.com"),
+                        enable_exception_autocapture=True,
+                    )
+                    atexit.register(client.shutdown)
+                    self._client = client
+        return getattr(self._client, name)
+
+
+posthog_client = LazyPosthog()
+
+
+@contextmanager
+def new_context():
+    from posthog import new_context as posthog_new_context
+    with posthog_new_context():
+        yield
+
+
+def identify_context(distinct_id: str) -> None:
+    from posthog import identify_context as posthog_identify_context
+    posthog_identify_context(distinct_id)
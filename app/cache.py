@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU map with hit/miss counters.
+
+    Used for per-process caches that must not grow with the number of users
+    (Gmail service clients, mailboxes, LLM results). Lookups move the key to
+    the most-recently-used end; inserting past `maxsize` evicts from the
+    least-recently-used end. With `ttl` set, entries older than `ttl` seconds
+    are dropped on lookup and count as misses.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key) -> bool:
+        if key not in self._data:
+            return False
+        if self.ttl is not None and time.monotonic() - self._data[key][0] > self.ttl:
+            del self._data[key]
+            return False
+        return True
+
+    def get(self, key, default=None):
+        with self._lock:
+            if self._live(key):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][1]
+            self.misses += 1
+            return default
+
+    def pop(self, key, default=None):
+        """Removes and returns an entry, counting it as a hit or miss like get()."""
+        with self._lock:
+            if self._live(key):
+                self.hits += 1
+                return self._data.pop(key)[1]
+            self.misses += 1
+            return default
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._live(key)
@@ -0,0 +1,89 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Alexa gives a skill 8 seconds to answer. The budget leaves room for the
+# Lambda hop and for speaking a fallback instead of timing out silently.
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "7.0"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised by a stage that can't finish before the request deadline."""
+
+
+class Deadline:
+    """
+    The point in time a request must answer by. Stages size their own
+    timeouts from what's left and skip optional work when it's short.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.exceeded = False
+        # Set once the request has started a Gmail write it can't take back.
+        self.committed = False
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def allows(self, seconds: float) -> bool:
+        """True if `seconds` of work still fits before the deadline."""
+        return self.remaining() >= seconds
+
+    def timeout(self, cap: float) -> float:
+        """
+        A stage timeout: `cap`, or less if the deadline comes first.
+
+        :raises DeadlineExceeded: if the deadline has already passed
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.expire()
+        return min(cap, remaining)
+
+    def expire(self, cause: Exception = None):
+        """Marks the request as out of time and raises DeadlineExceeded (from `cause`, the timeout that hit it)."""
+        self.exceeded = True
+        raise DeadlineExceeded(f"Request deadline of {self.budget:.1f}s exceeded") from cause
+
+
+_current = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(budget: float = None):
+    """
+    Sets the deadline for everything the request runs, including tasks and
+    worker threads it starts (they copy the context).
+
+    :param budget: Seconds from now; REQUEST_DEADLINE if None
+    :type budget: float
+    """
+    deadline = Deadline(REQUEST_DEADLINE if budget is None else budget)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current() -> Deadline | None:
+    """The running request's deadline, or None outside one (scripts, tests, streaming endpoints)."""
+    return _current.get()
+
+
+def stage_timeout(cap: float) -> float:
+    """`cap` seconds, cut to the current deadline if there is one."""
+    deadline = _current.get()
+    return cap if deadline is None else deadline.timeout(cap)
+
+
+def time_allows(seconds: float) -> bool:
+    """True unless the current deadline leaves less than `seconds`; gates optional work."""
+    deadline = _current.get()
+    return deadline is None or deadline.allows(seconds)
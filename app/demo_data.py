@@ -107,3 +107,14 @@ MOCK_EMAILS = {
         "snippet": "Hackathon recap, Tuesday meeting, job board updates, LLM workshop Friday.",
     },
 }
+
+# The commands the demo UI suggests. Their responses are computed at startup
+# (app.main) so most visitors never wait on, or spend, a model call.
+DEMO_SAMPLE_COMMANDS = [
+    "Summarize my emails",
+    "What's my verification code?",
+    "Did Connor email me?",
+    "Any emails from Professor Chen?",
+    "Draft an email to Professor Chen",
+    "Reply to Connor saying I'll be at the study session",
+]
@@ -1,15 +1,24 @@
-import os, dotenv, requests
+import os, dotenv
+import hashlib
+import json
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime, timedelta, timezone
-from email.utils import parsedate_to_datetime
+from email.utils import parseaddr, parsedate_to_datetime
 import random 
+import re
+import time
+import asyncio
+from app.cache import LRUCache
+from app.groq_client import chat_completion, achat_completion, astream_chat_completion, run_sync, GroqAPIError
+from app.verification_codes import CODE_KEYWORDS, find_verification_code, spoken_code
+from app.gmail_services import TRIAGE_SKIP
+from app.sender_match import match_sender, query_tokens, tokens_match
+from app.deadline import time_allows
 
 dotenv.load_dotenv()
 
 ACCESS_TOKEN = os.getenv("GMAIL_ACCESS_TOKEN")
-GROQ_API_URL = os.getenv("GROQ_API_URL")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GENERATION_MODEL = os.getenv("GENERATION_MODEL")
 VALIDATION_MODEL = os.getenv("VALIDATION_MODEL")
 SUMMARY_MODEL = os.getenv("SUMMARY_MODEL")
@@ -17,29 +26,257 @@ REASONING_MODEL = os.getenv("REASONING_MODEL")
 
 logger = logging.getLogger(__name__)
 
+# Summaries run at temperature 0.0, so an identical request gets an identical
+# answer. The key is a digest of the whole request payload: the emails
+# (headers and bodies, in order) and the "Today is ..." line, so a changed
+# inbox or a new calendar day is a different key. The TTL bounds how long a
+# summary can go unrefreshed if the model or upstream behaviour changes.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "900"))
 
-def prioritized_insights(emails: dict) -> str:
+_result_cache = LRUCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+
+def _request_digest(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+async def _cached_completion_async(data: dict) -> str:
+    """achat_completion() for deterministic requests, memoized by payload digest. Errors are not cached."""
+    key = _request_digest(data)
+    result = _result_cache.get(key)
+    if result is None:
+        result = (await achat_completion(data)).strip()
+        _result_cache.set(key, result)
+    else:
+        logger.info("Serving completion from result cache")
+    return result
+
+
+async def _cached_completion_stream(data: dict):
     """
-    Analyzes a batch of emails and delivers a voice-optimized briefing
-    of only the items that genuinely need the user's attention.
+    Streaming _cached_completion_async(): yields text as Groq generates it and
+    caches the joined result once the stream completes. A cache hit is
+    yielded as a single chunk.
+    """
+    key = _request_digest(data)
+    result = _result_cache.get(key)
+    if result is not None:
+        logger.info("Serving completion from result cache")
+        yield result
+        return
+
+    parts = []
+    async for delta in astream_chat_completion(data):
+        if not parts:
+            delta = delta.lstrip()
+            if not delta:
+                continue
+        parts.append(delta)
+        yield delta
+    _result_cache.set(key, "".join(parts).strip())
+
+
+async def _stream_with_fallback(data: dict, fallback: str):
+    """
+    Yields the streamed completion, or `fallback` if Groq errors before the
+    first chunk. An error after that is raised, so callers can tell a cut-off
+    answer from a finished one.
+    """
+    started = False
+    try:
+        async for chunk in _cached_completion_stream(data):
+            started = True
+            yield chunk
+    except GroqAPIError as e:
+        logger.error(f"GROQ API error: {e.status_code} - {e.text}")
+        if started:
+            raise
+        yield fallback
 
-    Unlike summarize_emails(), this function triages before it speaks —
-    skipping automated, mass, and purely informational emails entirely,
-    and surfacing only deadlines, personal requests, and schedule changes
-    in a directive EA-style format rather than a narrative summary.
 
-    Args:
-        emails: The raw emails dict from get_unread(), keyed by Gmail message ID.
-                Each value contains: from, from-email, subject, body, rfc-id.
+def result_cache_stats() -> dict:
+    return _result_cache.stats()
 
-    Returns:
-        A voice-ready string of 1-3 sentences covering only what needs attention,
-        or a graceful fallback if nothing in the inbox requires action.
+
+# Token budgets for the emails block of each prompt, so prompt size (and with
+# it latency and cost) has a ceiling however many emails a lookback returns.
+SUMMARY_PROMPT_TOKENS = int(os.getenv("SUMMARY_PROMPT_TOKENS", "3000"))
+SENDER_PROMPT_TOKENS = int(os.getenv("SENDER_PROMPT_TOKENS", "2000"))
+VERIFICATION_PROMPT_TOKENS = int(os.getenv("VERIFICATION_PROMPT_TOKENS", "1000"))
+
+# Rough size of a token in English text; good enough to budget with.
+CHARS_PER_TOKEN = 4
+# Per-email formatting around the headers ("[Email 3] [SENT TODAY]", labels, "---").
+EMAIL_OVERHEAD_CHARS = 60
+# Headers may take at most this share of a budget; past it the lowest-priority
+# emails are left out rather than every body shrinking to nothing.
+MAX_HEADER_SHARE = 0.5
+TRUNCATED = " ... [truncated]"
+
+_BULK_SENDER = re.compile(r"no-?reply|newsletter|notifications?@|mailer|marketing|digest|updates@|news@", re.IGNORECASE)
+_URGENT_SUBJECT = re.compile(r"\b(?:urgent|asap|action required|deadline|due|today|tomorrow|reminder|important|re:)", re.IGNORECASE)
+
+
+def _tokens(chars: int) -> int:
+    return -(-chars // CHARS_PER_TOKEN)
+
+
+def estimate_tokens(text: str) -> int:
+    return _tokens(len(text))
+
+
+def _recency(email_data: dict) -> float:
+    """1.0 for mail sent now, 0.5 a day old, 0.25 three days old."""
+    # Measured from the start of the hour, so an unchanged inbox packs the same
+    # way (and hits the result cache) for the rest of it.
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    try:
+        age = now - parsedate_to_datetime(email_data['date'])
+    except Exception:
+        return 0.5
+    return 1 / (1 + max(age.total_seconds(), 0) / 86400)
+
+
+def _summary_priority(email_data: dict) -> float:
+    # Mirrors the summary prompt's importance hierarchy: people first, bulk mail last.
+    score = 1 + _recency(email_data)
+    if _BULK_SENDER.search(email_data.get('from', '')):
+        score /= 4
+    if _URGENT_SUBJECT.search(email_data.get('subject', '')):
+        score *= 2
+    return score
+
+
+def _sender_priority(sender_name: str):
+    tokens = query_tokens(sender_name)
+
+    def priority(email_data: dict) -> float:
+        matched = tokens_match(tokens, email_data.get('from', ''))
+        return (4 if matched else 0.25) + _recency(email_data) / 2
+
+    return priority
+
+
+def _verification_priority(email_data: dict) -> float:
+    score = 1 + 3 * _recency(email_data)
+    if CODE_KEYWORDS.search(email_data.get('subject', '')):
+        score += 2
+    return score
+
+
+def _water_fill(needs: list, weights: list, available: int) -> list:
+    """Splits `available` in proportion to weights, capping each share at its need and handing the rest on."""
+    shares = [0] * len(needs)
+    total_weight = sum(weights)
+    for i in sorted(range(len(needs)), key=lambda i: needs[i] / weights[i]):
+        share = min(needs[i], int(available * weights[i] / total_weight)) if total_weight else 0
+        shares[i] = share
+        available -= share
+        total_weight -= weights[i]
+    return shares
+
+
+def pack_emails(emails: dict, budget_tokens: int, priority=_summary_priority) -> tuple:
     """
-    if not emails:
-        logger.info("No emails passed to prioritized_insights")
-        return "Nothing in your inbox needs attention right now."
+    Fits emails into a prompt token budget. Every email keeps its headers and
+    its place in the original order; body space is split by priority, so
+    important mail keeps more of its body and a long newsletter can't crowd
+    it out. If even the headers don't fit, the lowest-priority emails are left
+    out so the rest keep some of their bodies. An inbox that already fits is
+    returned unchanged.
+
+    :param emails: Emails keyed by message ID (from, subject, body, ...)
+    :type emails: dict
+    :param budget_tokens: Estimated tokens the formatted emails may use
+    :type budget_tokens: int
+    :param priority: email_data -> positive weight (recency and signal)
+    :return: (packed emails dict, estimated tokens used)
+    :rtype: tuple
+    """
+    overhead = {
+        msg_id: EMAIL_OVERHEAD_CHARS + sum(len(str(data.get(key) or "")) for key in ('from', 'subject', 'date'))
+        for msg_id, data in emails.items()
+    }
+    budget = budget_tokens * CHARS_PER_TOKEN
+    total = sum(overhead.values()) + sum(len(data.get('body') or "") for data in emails.values())
+    if total <= budget:
+        return emails, _tokens(total)
+
+    weights = {msg_id: priority(data) for msg_id, data in emails.items()}
+    kept = sorted(emails, key=lambda msg_id: -weights[msg_id])
+    header_chars = sum(overhead.values())
+    while len(kept) > 1 and header_chars > budget * MAX_HEADER_SHARE:
+        header_chars -= overhead[kept.pop()]
+    kept = set(kept)
+    kept = [msg_id for msg_id in emails if msg_id in kept]
+
+    available = max(budget - header_chars, 0)
+    shares = _water_fill([len(emails[msg_id].get('body') or "") for msg_id in kept],
+                         [weights[msg_id] for msg_id in kept], available)
+
+    packed, used = {}, 0
+    for msg_id, share in zip(kept, shares):
+        body = emails[msg_id].get('body') or ""
+        if share < len(body):
+            room = max(share - len(TRUNCATED), 0)
+            cut = body.rfind(" ", 0, room)
+            body = body[:cut if cut > 0 else room] + TRUNCATED
+        packed[msg_id] = {**emails[msg_id], 'body': body}
+        used += overhead[msg_id] + len(body)
+    return packed, _tokens(used)
+
+
+def _packed(emails: dict, budget_tokens: int, priority) -> dict:
+    packed, tokens = pack_emails(emails, budget_tokens, priority)
+    logger.info(f"Packed {len(packed)} of {len(emails)} emails into ~{tokens} prompt tokens (budget {budget_tokens})")
+    return packed
+
+
+# How many skipped senders a tally names before it just counts.
+TALLY_SENDERS = 4
+
+
+def triage_emails(emails: dict) -> tuple:
+    """
+    Splits emails by their header triage verdict (gmail_services.triage).
+
+    :param emails: Emails keyed by message ID; records without a 'triage' key are kept
+    :type emails: dict
+    :return: (kept emails dict, list of skipped email records)
+    :rtype: tuple
+    """
+    kept, skipped = {}, []
+    for msg_id, email_data in emails.items():
+        if email_data.get('triage') == TRIAGE_SKIP:
+            skipped.append(email_data)
+        else:
+            kept[msg_id] = email_data
+    if skipped:
+        logger.info(f"Triage skipped {len(skipped)} of {len(emails)} emails as bulk or automated")
+    return kept, skipped
+
+
+def _skipped_senders(skipped: list) -> str:
+    names = []
+    for email_data in skipped:
+        name, address = parseaddr(email_data.get('from', ''))
+        name = name.strip().strip('"') or address
+        if name and name not in names:
+            names.append(name)
+    if len(names) > TALLY_SENDERS:
+        return ", ".join(names[:TALLY_SENDERS]) + " and others"
+    return " and ".join([", ".join(names[:-1]), names[-1]]) if len(names) > 1 else "".join(names)
 
+
+def _bulk_only_reply(skipped: list) -> str:
+    senders = _skipped_senders(skipped)
+    source = f", from {senders}" if senders else ""
+    return f"Only newsletters and automated emails came in{source}. Nothing needs your attention right now."
+
+
+def _prioritized_insights_request(emails: dict, skipped: list = ()) -> dict:
+    emails = _packed(emails, SUMMARY_PROMPT_TOKENS, _summary_priority)
     # Format emails with subject lines included — subject carries critical triage signal
     # (e.g., "ACTION REQUIRED", "URGENT", "Re:") that the body-only format loses.
     # Pre-compute email age so the model doesn't need to do date arithmetic itself.
@@ -68,6 +305,14 @@ def prioritized_insights(emails: dict) -> str:
             f"---\n"
         )
 
+    # Bulk mail dropped by triage is one line, so the model can still say the
+    # rest of the inbox is newsletters without reading them.
+    if skipped:
+        formatted_emails += (
+            f"[Also received {len(skipped)} newsletter or automated emails, not shown, "
+            f"from {_skipped_senders(skipped)}]\n"
+        )
+
     temporal_preamble = ""
     if temporal_notes:
         temporal_preamble = (
@@ -81,11 +326,6 @@ def prioritized_insights(emails: dict) -> str:
     # "Due March 1st" means something very different depending on when it's read.
     today = datetime.now(timezone.utc).strftime("%A, %B %d, %Y")
 
-    logger.info(f"Calling GROQ API for prioritized insights across {len(emails)} emails")
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
     data = {
         "model": SUMMARY_MODEL,
         "messages": [
@@ -116,51 +356,87 @@ def prioritized_insights(emails: dict) -> str:
         ],
         "temperature": 0.0,
     }
+    return data
 
 
-    preamble = [
-        "Here's what I found:",           # neutral, direct
-        "Here's a quick update:", # warm, conversational
-    ]
-    epilogue = [
-        "That's all for now. Have a great day!",  # warm, friendly
-        "That's everything worth noting. Have a good one!",         # clean, no forced cheerfulness
-        "That covers it from your inbox. Enjoy your day!",         # clear, definitive
-    ]
+INSIGHTS_FAILED = "Sorry, I had trouble checking your inbox."
 
 
-    response = requests.post(GROQ_API_URL, headers=headers, json=data)
-    if response.status_code == 200:
-        result = response.json()['choices'][0]['message']['content'].strip()
+def _prioritized_insights_plan(emails: dict) -> tuple:
+    """(reply, None) when the inbox is answered without the LLM, else (None, request)."""
+    if not emails:
+        logger.info("No emails passed to prioritized_insights")
+        return "Nothing in your inbox needs attention right now.", None
 
-        #full_result = preamble[random.randint(0, len(preamble)-1)] + " " + result.strip() + " " + epilogue[random.randint(0, len(epilogue)-1)]
-        #logger.info("Prioritized insights generated successfully")
-        return result
-    else:
-        logger.error(f"GROQ API error: {response.status_code} - {response.text}")
-        return "Sorry, I had trouble checking your inbox."
+    emails, skipped = triage_emails(emails)
+    if not emails:
+        return _bulk_only_reply(skipped), None
 
-def summarize_sender_emails(emails: dict, sender_name: str) -> str:
+    logger.info(f"Calling GROQ API for prioritized insights across {len(emails)} emails")
+    return None, _prioritized_insights_request(emails, skipped)
+
+
+async def prioritized_insights_async(emails: dict) -> str:
     """
-    Given a batch of recent emails and a loosely-specified sender name,
-    uses the LLM to fuzzy-match the sender and summarize what they said.
+    Analyzes a batch of emails and delivers a voice-optimized briefing
+    of only the items that genuinely need the user's attention.
 
-    The LLM handles cases where the user's phrasing ("my advisor", "mom",
-    "Professor Kim") doesn't exactly match the From header ("Kimberly Johnson
-    <k.johnson@ucsb.edu>"). If no emails match, it returns a graceful fallback.
+    Unlike summarize_emails(), this function triages before it speaks —
+    skipping automated, mass, and purely informational emails entirely,
+    and surfacing only deadlines, personal requests, and schedule changes
+    in a directive EA-style format rather than a narrative summary.
+    Mail that header triage marked SKIP is reduced to a one-line tally, and
+    an inbox with nothing else in it is answered without the LLM.
 
     Args:
-        emails: Recent emails dict from get_emails(), keyed by Gmail message ID.
-        sender_name: The sender as described by the user (may be informal or partial).
+        emails: The raw emails dict from get_unread(), keyed by Gmail message ID.
+                Each value contains: from, from-email, subject, body, rfc-id.
 
     Returns:
-        A voice-ready string summarizing what the sender wrote, or a fallback
-        if no matching emails are found.
+        A voice-ready string of 1-3 sentences covering only what needs attention,
+        or a graceful fallback if nothing in the inbox requires action.
     """
-    if not emails:
-        logger.info("No emails passed to summarize_sender_emails")
-        return f"I didn't find any recent emails from {sender_name}."
+    reply, data = _prioritized_insights_plan(emails)
+    if reply is not None:
+        return reply
+    try:
+        return await _cached_completion_async(data)
+    except GroqAPIError as e:
+        logger.error(f"GROQ API error: {e.status_code} - {e.text}")
+        return INSIGHTS_FAILED
+
+
+def prioritized_insights(emails: dict) -> str:
+    """Blocking prioritized_insights_async() for scripts and tests."""
+    return run_sync(prioritized_insights_async, emails)
+
+
+async def prioritized_insights_stream(emails: dict):
+    """Streaming prioritized_insights_async() for SSE clients; yields text chunks as they're generated."""
+    reply, data = _prioritized_insights_plan(emails)
+    if reply is not None:
+        yield reply
+        return
+    async for chunk in _stream_with_fallback(data, INSIGHTS_FAILED):
+        yield chunk
 
+
+def _sender_candidates(emails: dict, sender_name: str) -> dict:
+    """
+    The emails worth sending to the LLM for a sender check: those the local
+    fuzzy matcher ties to sender_name, all of them if the name is a
+    relationship it can't resolve ("my advisor"), or {} if nobody matches.
+    """
+    matched = match_sender(sender_name, emails)
+    if matched is None:
+        logger.info(f"No local match for '{sender_name}', leaving it to the LLM across {len(emails)} emails")
+        return emails
+    logger.info(f"Matched {len(matched)} of {len(emails)} emails to '{sender_name}' locally")
+    return matched
+
+
+def _summarize_sender_emails_request(emails: dict, sender_name: str) -> dict:
+    emails = _packed(emails, SENDER_PROMPT_TOKENS, _sender_priority(sender_name))
     formatted_emails = ""
     for i, email_data in enumerate(emails.values(), 1):
         formatted_emails += (
@@ -171,11 +447,6 @@ def summarize_sender_emails(emails: dict, sender_name: str) -> str:
             f"---\n"
         )
 
-    logger.info(f"Calling GROQ API to find emails from '{sender_name}' across {len(emails)} emails")
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
     data = {
         "model": GENERATION_MODEL,
         "messages": [
@@ -207,34 +478,73 @@ def summarize_sender_emails(emails: dict, sender_name: str) -> str:
         ],
         "temperature": 0.0,
     }
+    return data
 
-    response = requests.post(GROQ_API_URL, headers=headers, json=data)
-    if response.status_code == 200:
-        result = response.json()['choices'][0]['message']['content'].strip()
-        logger.info(f"Sender email summary generated successfully for '{sender_name}'")
-        return result
-    else:
-        logger.error(f"GROQ API error: {response.status_code} - {response.text}")
-        return f"Sorry, I had trouble checking your emails for messages from {sender_name}."
 
+def _sender_plan(emails: dict, sender_name: str) -> tuple:
+    """(reply, None) when nobody matches sender_name, else (None, request)."""
+    if emails:
+        emails = _sender_candidates(emails, sender_name)
+    if not emails:
+        logger.info(f"No emails from '{sender_name}' to summarize")
+        return f"I didn't find any recent emails from {sender_name}.", None
 
-def extract_verification_code(emails: dict) -> str:
+    logger.info(f"Calling GROQ API to find emails from '{sender_name}' across {len(emails)} emails")
+    return None, _summarize_sender_emails_request(emails, sender_name)
+
+
+def _sender_failed(sender_name: str) -> str:
+    return f"Sorry, I had trouble checking your emails for messages from {sender_name}."
+
+
+async def summarize_sender_emails_async(emails: dict, sender_name: str) -> str:
     """
-    Scans a batch of recent emails and extracts the most recent verification
-    code, OTP, or one-time password for Alexa to read aloud.
+    Given a batch of recent emails and a loosely-specified sender name,
+    uses the LLM to fuzzy-match the sender and summarize what they said.
+
+    The LLM handles cases where the user's phrasing ("my advisor", "mom",
+    "Professor Kim") doesn't exactly match the From header ("Kimberly Johnson
+    <k.johnson@ucsb.edu>"). Names are matched locally first (sender_match)
+    and only matching emails are sent; if none match, it returns a graceful
+    fallback without calling the LLM.
 
     Args:
-        emails: Dict of recent emails from get_recent_all_emails(), keyed by
-                Gmail message ID. Each value contains: from, subject, body.
+        emails: Recent emails dict from get_emails(), keyed by Gmail message ID.
+        sender_name: The sender as described by the user (may be informal or partial).
 
     Returns:
-        A voice-ready string with the code (e.g. "Your verification code from
-        Google is 4 8 3 2 1 9."), or a graceful fallback if none is found.
+        A voice-ready string summarizing what the sender wrote, or a fallback
+        if no matching emails are found.
     """
-    if not emails:
-        logger.info("No emails passed to extract_verification_code")
-        return "I couldn't find any recent emails with a verification code."
+    reply, data = _sender_plan(emails, sender_name)
+    if reply is not None:
+        return reply
+    try:
+        result = await _cached_completion_async(data)
+        logger.info(f"Sender email summary generated successfully for '{sender_name}'")
+        return result
+    except GroqAPIError as e:
+        logger.error(f"GROQ API error: {e.status_code} - {e.text}")
+        return _sender_failed(sender_name)
+
+
+def summarize_sender_emails(emails: dict, sender_name: str) -> str:
+    """Blocking summarize_sender_emails_async() for scripts and tests."""
+    return run_sync(summarize_sender_emails_async, emails, sender_name)
+
 
+async def summarize_sender_emails_stream(emails: dict, sender_name: str):
+    """Streaming summarize_sender_emails_async() for SSE clients; yields text chunks as they're generated."""
+    reply, data = _sender_plan(emails, sender_name)
+    if reply is not None:
+        yield reply
+        return
+    async for chunk in _stream_with_fallback(data, _sender_failed(sender_name)):
+        yield chunk
+
+
+def _extract_verification_code_request(emails: dict) -> dict:
+    emails = _packed(emails, VERIFICATION_PROMPT_TOKENS, _verification_priority)
     formatted_emails = ""
     for i, email_data in enumerate(emails.values(), 1):
         formatted_emails += (
@@ -245,11 +555,6 @@ def extract_verification_code(emails: dict) -> str:
             f"---\n"
         )
 
-    logger.info(f"Calling GROQ API to extract verification code from {len(emails)} emails")
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
     data = {
         "model": GENERATION_MODEL,
         "messages": [
@@ -278,24 +583,62 @@ def extract_verification_code(emails: dict) -> str:
         ],
         "temperature": 0.0,
     }
+    return data
+
+
+def _local_verification_code(emails: dict) -> str | None:
+    # Users are waiting at a login screen, so a single unambiguous code is
+    # answered without the LLM round trip.
+    candidate = find_verification_code(emails)
+    if candidate is None:
+        return None
+    logger.info(f"Verification code found locally (score {candidate['score']}), skipping GROQ API")
+    return spoken_code(candidate["code"], candidate["sender"])
 
-    response = requests.post(GROQ_API_URL, headers=headers, json=data)
-    if response.status_code == 200:
-        result = response.json()['choices'][0]['message']['content'].strip()
+
+async def extract_verification_code_async(emails: dict) -> str:
+    """
+    Scans a batch of recent emails and extracts the most recent verification
+    code, OTP, or one-time password for Alexa to read aloud. A single
+    high-confidence code is answered locally; ambiguous cases go to the LLM.
+
+    Args:
+        emails: Dict of recent emails from get_recent_all_emails(), keyed by
+                Gmail message ID. Each value contains: from, subject, body.
+
+    Returns:
+        A voice-ready string with the code (e.g. "Your verification code from
+        Google is 4 8 3 2 1 9."), or a graceful fallback if none is found.
+    """
+    if not emails:
+        logger.info("No emails passed to extract_verification_code")
+        return "I couldn't find any recent emails with a verification code."
+
+    local_answer = _local_verification_code(emails)
+    if local_answer is not None:
+        return local_answer
+
+    logger.info(f"Calling GROQ API to extract verification code from {len(emails)} emails")
+    try:
+        result = (await achat_completion(_extract_verification_code_request(emails))).strip()
         logger.info("Verification code extracted successfully")
         return result
-    else:
-        logger.error(f"GROQ API error: {response.status_code} - {response.text}")
+    except GroqAPIError as e:
+        logger.error(f"GROQ API error: {e.status_code} - {e.text}")
         return "Sorry, I had trouble checking your emails for a verification code."
 
 
+def extract_verification_code(emails: dict) -> str:
+    """Blocking extract_verification_code_async() for scripts and tests."""
+    return run_sync(extract_verification_code_async, emails)
+
+
 def summarize_emails(email_content):
     if not email_content or "no unread emails" in email_content:
         logger.info("No unread emails to summarize")
         return "You have no new emails. Enjoy your day!"
 
     logger.info("Calling GROQ API to summarize emails")
-    headers = {"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"}
     data = {
         "model": GENERATION_MODEL,
         "messages": [
@@ -326,22 +669,77 @@ def summarize_emails(email_content):
 
 
 
-    response = requests.post(GROQ_API_URL, headers=headers, json=data)
-    if response.status_code == 200:
-        result = response.json()['choices'][0]['message']['content']
+    try:
+        result = chat_completion(data)
         logger.info("Email summary generated successfully")
         return result
-    else:
-        logger.error(f"GROQ API error: {response.status_code} - {response.text}")
+    except GroqAPIError as e:
+        logger.error(f"GROQ API error: {e.status_code} - {e.text}")
         return "Sorry, I had trouble summarizing your emails."
 
 
-def _generate_single_draft(recipient_name: str, email_description: str, system_prompt: str, temperature: float) -> str | None:
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    data = {
+# How generate_draft spends completions:
+#   fast       one call with the balanced variant
+#   hedged     the balanced variant first; another variant starts whenever the
+#              calls in flight outlast HEDGE_PERCENTILE of recent draft latencies
+#              (or all fail), and the first valid draft wins
+#   best-of-n  all variants, then the reasoning model picks one (one more round trip)
+DRAFT_FAST = "fast"
+DRAFT_HEDGED = "hedged"
+DRAFT_BEST_OF_N = "best-of-n"
+DRAFT_STRATEGIES = (DRAFT_FAST, DRAFT_HEDGED, DRAFT_BEST_OF_N)
+DRAFT_STRATEGY = os.getenv("DRAFT_STRATEGY", DRAFT_BEST_OF_N)
+
+# HEDGE_PERCENTILE=0 races every variant from the start. Until enough
+# latencies are recorded, backups start after HEDGE_DELAY seconds.
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "1.5"))
+HEDGE_MIN_SAMPLES = 20
+
+# Under a request deadline best-of-n needs about this long for its drafts and
+# selection; with less left it runs hedged. Selection alone is skipped (the
+# balanced draft wins) when less than DRAFT_SELECT_TIME remains.
+BEST_OF_N_TIME = float(os.getenv("BEST_OF_N_TIME", "4.0"))
+DRAFT_SELECT_TIME = float(os.getenv("DRAFT_SELECT_TIME", "1.5"))
+
+_draft_latencies = deque(maxlen=200)
+
+# A draft that broke the prompt's rules ("[Your Name]", a subject line) loses a hedged race.
+_DRAFT_ARTIFACT = re.compile(r"\[[^\]\n]{1,40}\]|^\s*subject\s*:", re.IGNORECASE)
+
+
+class DraftFailed(Exception):
+    """Raised when every draft attempt failed, so no draft body exists to save."""
+
+
+def _draft_strategy(strategy: str | None) -> str:
+    if strategy is None:
+        strategy = DRAFT_STRATEGY
+    if strategy not in DRAFT_STRATEGIES:
+        logger.warning(f"Unknown draft strategy {strategy!r}, using {DRAFT_BEST_OF_N}")
+        strategy = DRAFT_BEST_OF_N
+    if strategy == DRAFT_BEST_OF_N and not time_allows(BEST_OF_N_TIME):
+        logger.info("Short on time, drafting hedged instead of best-of-n")
+        return DRAFT_HEDGED
+    return strategy
+
+
+def hedge_delay() -> float:
+    """Seconds the drafts in flight may run before a hedged draft starts another."""
+    if HEDGE_PERCENTILE <= 0:
+        return 0.0
+    if len(_draft_latencies) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DELAY
+    ordered = sorted(_draft_latencies)
+    return ordered[min(len(ordered) - 1, int(HEDGE_PERCENTILE * len(ordered)))]
+
+
+def _valid_draft(draft: str | None) -> bool:
+    return bool(draft) and not _DRAFT_ARTIFACT.search(draft)
+
+
+def _single_draft_request(recipient_name: str, email_description: str, system_prompt: str, temperature: float) -> dict:
+    return {
         "model": GENERATION_MODEL,
         "messages": [
             {"role": "system", "content": system_prompt},
@@ -350,28 +748,26 @@ def _generate_single_draft(recipient_name: str, email_description: str, system_p
         "temperature": temperature,
         "max_tokens": 500
     }
+
+
+async def _generate_single_draft_async(recipient_name: str, email_description: str, system_prompt: str, temperature: float) -> str | None:
+    data = _single_draft_request(recipient_name, email_description, system_prompt, temperature)
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"].strip()
-        logger.error(f"Draft generation API error: {response.status_code} - {response.text}")
+        start = time.perf_counter()
+        draft = (await achat_completion(data)).strip()
+        _draft_latencies.append(time.perf_counter() - start)
+        return draft
+    except GroqAPIError as e:
+        logger.error(f"Draft generation API error: {e.status_code} - {e.text}")
         return None
     except Exception as e:
-        logger.error(f"Exception in _generate_single_draft: {e}", exc_info=True)
+        logger.error(f"Exception in _generate_single_draft_async: {e}", exc_info=True)
         return None
 
 
-def _select_best_draft(drafts: list, recipient_name: str, email_description: str) -> str:
-    for draft in drafts:
-        print(f"Draft option:\n{draft}\n{'-'*40}")
-    
-    
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
+def _select_best_draft_request(drafts: list, recipient_name: str, email_description: str) -> dict:
     drafts_block = "\n\n---\n\n".join(f"Draft {i + 1}:\n{d}" for i, d in enumerate(drafts))
-    data = {
+    return {
         "model": REASONING_MODEL,
         "messages": [
             {
@@ -396,91 +792,143 @@ def _select_best_draft(drafts: list, recipient_name: str, email_description: str
         ],
         "temperature": 0.0,
     }
+
+
+def _pick_selected_draft(raw: str, drafts: list) -> str | None:
+    for char in raw:
+        if char.isdigit():
+            idx = int(char) - 1
+            if 0 <= idx < len(drafts):
+                logger.info(f"Selected draft {char} of {len(drafts)}")
+                return drafts[idx]
+    logger.error(f"Draft selection failed: no valid draft number in {raw!r}")
+    return None
+
+
+async def _select_best_draft_async(drafts: list, recipient_name: str, email_description: str) -> str:
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            raw = response.json()["choices"][0]["message"]["content"].strip()
-            for char in raw:
-                if char.isdigit():
-                    idx = int(char) - 1
-                    if 0 <= idx < len(drafts):
-                        logger.info(f"Selected draft {char} of {len(drafts)}")
-                        return drafts[idx]
-        logger.error(f"Draft selection failed: {response.status_code} - {response.text}")
+        raw = (await achat_completion(_select_best_draft_request(drafts, recipient_name, email_description))).strip()
+        selected = _pick_selected_draft(raw, drafts)
+        if selected is not None:
+            return selected
+    except GroqAPIError as e:
+        logger.error(f"Draft selection failed: {e.status_code} - {e.text}")
     except Exception as e:
-        logger.error(f"Exception in _select_best_draft: {e}", exc_info=True)
+        logger.error(f"Exception in _select_best_draft_async: {e}", exc_info=True)
     return drafts[0]
 
 
-def generate_draft(recipient_name: str, email_description: str) -> str:
+_DRAFT_BASE_RULES = (
+    "Output ONLY the text of the email. "
+    "STRICT RULES:\n"
+    "1. NO PREAMBLE: Start directly with 'Hi [Name],' or 'Dear [Name],'.\n"
+    "2. NO SUBJECT LINE: Do not include a subject line or 'Subject:' header.\n"
+    "3. NO PLACEHOLDERS: Never use brackets like '[Your Name]' or '[Date]'.\n"
+    "4. SIGN-OFF: End with a professional closing like 'Best,' or 'Thanks,' but DO NOT include a name after it.\n"
+    "5. FORMATTING: Use clear paragraph breaks (\\n\\n)."
+)
+
+DRAFT_CONFIGS = [
+    # Variant 1: balanced, professional
+    (
+        "You are a professional email writing assistant. " + _DRAFT_BASE_RULES,
+        0.4
+    ),
+    # Variant 2: concise and direct
+    (
+        "You are a professional email writing assistant who prizes being clear and concise. "
+        "Write the most concise version that still fully conveys the message while still adding necessary context. " + _DRAFT_BASE_RULES,
+        0.4
+    ),
+    # Variant 3: warm and natural
+    (
+        "You are a professional email writing assistant. "
+        "Write in a warm, natural tone that sounds like a real person rather than a formal template. " + _DRAFT_BASE_RULES,
+        0.7
+    ),
+]
+
+
+async def _hedged_draft_async(recipient_name: str, email_description: str) -> str | None:
+    configs = list(DRAFT_CONFIGS)
+    delay, fallback = hedge_delay(), None
+
+    def launch():
+        prompt, temp = configs.pop(0)
+        return asyncio.create_task(_generate_single_draft_async(recipient_name, email_description, prompt, temp))
+
+    pending = {launch()}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=delay if configs else None, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                draft = task.result()
+                if _valid_draft(draft):
+                    return draft
+                fallback = fallback or draft
+            if configs and (not done or not pending):
+                logger.info("Hedging draft generation with another variant")
+                pending.add(launch())
+        return fallback
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def generate_draft(recipient_name: str, email_description: str, strategy: str = None) -> str:
+    """Blocking generate_draft_async() for scripts and tests."""
+    return run_sync(generate_draft_async, recipient_name, email_description, strategy)
+
+
+async def generate_draft_async(recipient_name: str, email_description: str, strategy: str = None) -> str:
     """
-    Generates three draft variants in parallel (balanced, concise, warm) then
-    uses the reasoning model to select the best one against a quality rubric.
+    Generates an email draft. By default (best-of-n) three variants run
+    concurrently (balanced, concise, warm) and the reasoning model selects the
+    best one against a quality rubric; `strategy` or DRAFT_STRATEGY can
+    trade that for one call ("fast") or a hedged race ("hedged").
+
+    :raises DraftFailed: if no attempt produced a draft
     """
-    logger.info(f"Generating draft email for {recipient_name}: {email_description}")
-
-    base_rules = (
-        "Output ONLY the text of the email. "
-        "STRICT RULES:\n"
-        "1. NO PREAMBLE: Start directly with 'Hi [Name],' or 'Dear [Name],'.\n"
-        "2. NO SUBJECT LINE: Do not include a subject line or 'Subject:' header.\n"
-        "3. NO PLACEHOLDERS: Never use brackets like '[Your Name]' or '[Date]'.\n"
-        "4. SIGN-OFF: End with a professional closing like 'Best,' or 'Thanks,' but DO NOT include a name after it.\n"
-        "5. FORMATTING: Use clear paragraph breaks (\\n\\n)."
-    )
-
-    draft_configs = [
-        # Variant 1: balanced, professional
-        (
-            "You are a professional email writing assistant. " + base_rules,
-            0.4
-        ),
-        # Variant 2: concise and direct
-        (
-            "You are a professional email writing assistant who prizes being clear and concise. "
-            "Write the most concise version that still fully conveys the message while still adding necessary context. " + base_rules,
-            0.4
-        ),
-        # Variant 3: warm and natural
-        (
-            "You are a professional email writing assistant. "
-            "Write in a warm, natural tone that sounds like a real person rather than a formal template. " + base_rules,
-            0.7
-        ),
-    ]
-
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = [
-            executor.submit(_generate_single_draft, recipient_name, email_description, prompt, temp)
-            for prompt, temp in draft_configs
-        ]
-        results = [f.result() for f in futures]
+    strategy = _draft_strategy(strategy)
+    logger.info(f"Generating draft email ({strategy}) for {recipient_name}: {email_description}")
+
+    if strategy == DRAFT_FAST:
+        draft = await _generate_single_draft_async(recipient_name, email_description, *DRAFT_CONFIGS[0])
+    elif strategy == DRAFT_HEDGED:
+        draft = await _hedged_draft_async(recipient_name, email_description)
+    else:
+        draft = await _best_of_n_draft(recipient_name, email_description)
+    if not draft:
+        raise DraftFailed("All draft generation attempts failed")
+    return draft
+
+
+async def _best_of_n_draft(recipient_name: str, email_description: str) -> str | None:
+    results = await asyncio.gather(*[
+        _generate_single_draft_async(recipient_name, email_description, prompt, temp)
+        for prompt, temp in DRAFT_CONFIGS
+    ])
 
     valid_drafts = [d for d in results if d is not None]
 
     if not valid_drafts:
         logger.error("All parallel draft generation attempts failed")
-        return "Error generating draft: all generation attempts failed"
+        return None
 
     if len(valid_drafts) == 1:
         logger.info("Only one draft generated successfully, skipping selection")
         return valid_drafts[0]
 
+    if not time_allows(DRAFT_SELECT_TIME):
+        logger.info("Short on time, skipping draft selection")
+        return valid_drafts[0]
+
     logger.info(f"Generated {len(valid_drafts)} drafts, selecting best via reasoning model")
-    return _select_best_draft(valid_drafts, recipient_name, email_description)
-    
+    return await _select_best_draft_async(valid_drafts, recipient_name, email_description)
 
-def generate_reply(thread_body: str, recipient_name: str, reply_description: str) -> str:
-    """
-    Generates a reply email based on the thread body and description provided.
-    """
-    logger.info(f"Generating reply email to {recipient_name}: {reply_description}")
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
 
-    data = {
+def _reply_request(thread_body: str, recipient_name: str, reply_description: str) -> dict:
+    return {
         "model": GENERATION_MODEL,
         "messages": [
             {
@@ -511,20 +959,20 @@ def generate_reply(thread_body: str, recipient_name: str, reply_description: str
         "temperature": 0.4, # Lowered for more precise instruction following
         "max_tokens": 600
     }
-    try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data)
 
-        if response.status_code == 200:
-            result = response.json()
-            reply = result["choices"][0]["message"]["content"].strip()
-            logger.info(f"Reply generated successfully (length: {len(reply)} chars)")
-            return reply
-        else:
-            error_msg = f"GROQ API error: {response.status_code} - {response.text}"
-            logger.error(error_msg)
-            return error_msg
-    except Exception as e:
-        logger.error(f"Exception while generating reply: {e}", exc_info=True)
-        return f"Error generating reply: {str(e)}"
+
+async def generate_reply_async(thread_body: str, recipient_name: str, reply_description: str) -> str:
+    """
+    Generates a reply email based on the thread body and description provided.
+
+    :raises GroqAPIError: if the completion fails, so no error text is saved as a reply
+    """
+    logger.info(f"Generating reply email to {recipient_name}: {reply_description}")
+    reply = (await achat_completion(_reply_request(thread_body, recipient_name, reply_description))).strip()
+    logger.info(f"Reply generated successfully (length: {len(reply)} chars)")
+    return reply
 
 
+def generate_reply(thread_body: str, recipient_name: str, reply_description: str) -> str:
+    """Blocking generate_reply_async() for scripts and tests."""
+    return run_sync(generate_reply_async, thread_body, recipient_name, reply_description)
@@ -0,0 +1,65 @@
+import json
+import os
+import logging
+from contextlib import contextmanager
+from app.cache import LRUCache
+from app.utils import hash_token
+
+logger = logging.getLogger(__name__)
+
+GMAIL_CLIENT_CACHE_SIZE = int(os.getenv("GMAIL_CLIENT_CACHE_SIZE", "256"))
+# Socket timeout for Gmail API calls; httplib2 otherwise waits forever.
+GMAIL_TIMEOUT = float(os.getenv("GMAIL_TIMEOUT", "10"))
+
+# Parsed once, from the static copy shipped with google-api-python-client, so no
+# request ever re-reads or re-parses the ~140KB discovery document. Loaded with
+# googleapiclient on the first Gmail call rather than at import (~300 ms of boot).
+GMAIL_DISCOVERY_DOC = None
+
+_idle_services = LRUCache(maxsize=GMAIL_CLIENT_CACHE_SIZE)
+
+
+def _discovery_doc() -> dict:
+    global GMAIL_DISCOVERY_DOC
+    if GMAIL_DISCOVERY_DOC is None:
+        from googleapiclient.discovery_cache import get_static_doc
+        GMAIL_DISCOVERY_DOC = json.loads(get_static_doc("gmail", "v1"))
+    return GMAIL_DISCOVERY_DOC
+
+
+def build_service(access_token: str):
+    """Builds a Gmail Resource for one access token from the preloaded discovery document."""
+    import httplib2
+    from googleapiclient.discovery import build_from_document
+    from google.oauth2.credentials import Credentials
+    from google_auth_httplib2 import AuthorizedHttp
+    http = AuthorizedHttp(Credentials(access_token), http=httplib2.Http(timeout=GMAIL_TIMEOUT))
+    return build_from_document(_discovery_doc(), http=http)
+
+
+@contextmanager
+def gmail_service(access_token: str):
+    """
+    Lends out a Gmail service client for `access_token`.
+
+    Idle clients are kept in a bounded LRU keyed by the same token hash that
+    main.read_root uses as the user ID, so a repeat command from the same user
+    skips client construction and reuses the kept-alive HTTP connection.
+
+    httplib2 connections are not thread-safe, so a client is checked out for
+    the duration of the block: a second concurrent command for the same token
+    simply gets a freshly built client, and whichever finishes last is kept.
+    """
+    key = hash_token(access_token or "")
+    service = _idle_services.pop(key)
+    if service is None:
+        logger.debug("Building Gmail client for user %s", key)
+        service = build_service(access_token)
+    try:
+        yield service
+    finally:
+        _idle_services.set(key, service)
+
+
+def cache_stats() -> dict:
+    return _idle_services.stats()
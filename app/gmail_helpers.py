@@ -1,44 +1,212 @@
-import base64, re
-
-def get_email_body(payload):
-    """Recursively finds the text/plain part of the email and ignores HTML/Attachments."""
-    if 'parts' in payload:
-        for part in payload['parts']:
-            if part['mimeType'] == 'text/plain':
-                data = part['body'].get('data')
-                return base64.urlsafe_b64decode(data).decode('utf-8') if data else ""
-            elif 'parts' in part: # Nested multipart
-                result = get_email_body(part)
-                if result: return result
-    else:
-        data = payload.get('body', {}).get('data')
-        return base64.urlsafe_b64decode(data).decode('utf-8') if data else ""
-    return ""
+import base64, codecs, re
+
+# Decoded bytes per character of cleaned body the caller keeps. Cleaning drops
+# whitespace, links and quoted text, so it needs several times max_length of
+# raw text, but never a whole 200KB body.
+BODY_BYTES_PER_CHAR = 8
+MIN_BODY_BYTES = 4096
+
+# HTML is mostly markup: an HTML-only body may decode this many times more
+# before conversion to text. Conversion starts on the first max_bytes of it
+# and doubles the window until the text is long enough (half of max_bytes
+# characters), since parsing dominates the cost.
+HTML_BYTES_FACTOR = 4
+
+_CHARSET = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.IGNORECASE)
+
+# Removed before parsing: they never hold readable text and are a large share
+# of marketing HTML.
+_HTML_NOISE = re.compile(r'<(script|style|head)\b.*?</\1\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_HTML_SKIP_TAGS = ["script", "style", "head", "title", "noscript", "template"]
+
+
+def body_budget(max_length: int) -> int:
+    """Bytes of text/plain worth decoding for a body cleaned to max_length characters."""
+    return max(MIN_BODY_BYTES, max_length * BODY_BYTES_PER_CHAR)
+
+
+def _header(part: dict, name: str) -> str:
+    return next((h['value'] for h in part.get('headers', []) if h['name'].lower() == name), "")
+
+
+def _is_attachment(part: dict) -> bool:
+    return bool(part.get('filename')) or _header(part, 'content-disposition').lower().startswith('attachment')
+
+
+def _find_part(payload: dict, mime_type: str) -> dict | None:
+    """First non-attachment part of `mime_type`, depth first in MIME order."""
+    if 'parts' not in payload:
+        return payload if payload.get('mimeType', mime_type) == mime_type else None
+    for part in payload['parts']:
+        if 'parts' in part:
+            found = _find_part(part, mime_type)
+            if found is not None:
+                return found
+        elif part.get('mimeType') == mime_type and not _is_attachment(part):
+            return part
+    return None
+
+
+def _decode_part(part: dict, max_bytes: int = None, default_charset: str = 'utf-8') -> str:
+    """
+    Decodes a part's base64url body in its declared charset. With max_bytes,
+    only that many bytes are decoded; a character cut off at the end is dropped
+    rather than replaced.
+    """
+    data = part.get('body', {}).get('data')
+    if not data:
+        return ""
+    truncated = max_bytes is not None and len(data) > -(-max_bytes // 3) * 4
+    if truncated:
+        data = data[:-(-max_bytes // 3) * 4]
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+    match = _CHARSET.search(_header(part, 'content-type'))
+    charset = match.group(1) if match else default_charset
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    return decoder.decode(raw, final=not truncated)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Readable text of an HTML body, one line per text node so the quoted-reply
+    patterns in clean_emails still see line starts. Gmail's quoted history
+    (blockquote, div.gmail_quote) is dropped.
+    """
+    from bs4 import BeautifulSoup  # Only HTML-only mail needs it; kept out of the cold-start import
+
+    soup = BeautifulSoup(_HTML_NOISE.sub(" ", html), "html.parser")
+    for tag in soup(_HTML_SKIP_TAGS + ["blockquote"]):
+        tag.decompose()
+    for tag in soup.select("div.gmail_quote"):
+        tag.decompose()
+    return soup.get_text("\n")
+
+
+def get_email_body(payload, max_bytes=None):
+    """
+    Text of the email's text/plain part, or of its text/html part converted to
+    text when there is no plain part. Attachments are ignored.
+
+    :param payload: The message's payload (format='full' shape)
+    :type payload: dict
+    :param max_bytes: Decode at most this many bytes of text/plain (see
+        body_budget()); HTML gets HTML_BYTES_FACTOR times as much
+    :type max_bytes: int
+    :rtype: str
+    """
+    # Parts without a Content-Type of their own inherit the message's charset.
+    match = _CHARSET.search(_header(payload, 'content-type'))
+    default_charset = match.group(1) if match else 'utf-8'
+
+    part = _find_part(payload, 'text/plain')
+    if part is not None:
+        return _decode_part(part, max_bytes, default_charset)
+
+    part = _find_part(payload, 'text/html')
+    if part is None:
+        return ""
+    if max_bytes is None:
+        return html_to_text(_decode_part(part, None, default_charset))
+
+    # Stripped before windowing so a large <style> block doesn't fill the first window.
+    html = _HTML_NOISE.sub(" ", _decode_part(part, max_bytes * HTML_BYTES_FACTOR, default_charset))
+    window = max_bytes
+    while True:
+        text = html_to_text(html[:window])
+        if window >= len(html) or len(text) >= max_bytes // 2:
+            return text
+        window *= 2
+
+
+# Quoted-reply markers, tried in this order: the first pattern that matches
+# anywhere in the body wins, even if a later one matches earlier in the text.
+REPLY_PATTERNS = [re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in (
+    r'(^|\n)On\s+.*\s+wrote:.*',          # English: On ... wrote:
+    r'(^|\n)El\s+.*\s+escribió:.*',      # Spanish: El ... escribió:
+    r'(^|\n)---*\s*Original Message\s*---*', # Common Outlook header
+    r'(^|\n)________________________________', # Visual dividers
+    r'(^|\n)From:\s*.*?\nSent:\s*.*'      # Forwarded/Inline styles
+)]
+
+# Text each reply pattern can't match without, lowercased. Checking these with
+# `in` on a lowercased copy rules most bodies out without running the regexes.
+_REPLY_REQUIRES = (("wrote:",), ("escribió:",), ("original message",), ("_" * 32,), ("from:", "sent:"))
+
+# Characters re.IGNORECASE matches to ASCII letters that str.lower() doesn't
+# map to them, so the lowercased copy never rules out a real match.
+_FOLD_FIXES = {"İ": "i", "ı": "i", "ſ": "s"}
+
+_SPACE = re.compile(r'\s')
+_LINK_PATTERNS = [re.compile(r'http\S+'), re.compile(r'www\.\S+')]
+_ADDRESS = re.compile(r'\S+@\S+')
+
+# Raw characters cleaned per step, as a multiple of max_length. Cleaning
+# only ever shortens text, so most bodies need one step.
+_CHUNK_FACTOR = 2
+_MIN_CHUNK = 256
+
+
+def _fold(text: str) -> str:
+    for special, plain in _FOLD_FIXES.items():
+        if special in text:
+            text = text.replace(special, plain)
+    return text.lower()
+
+
+def _reply_cut(email_body: str) -> int:
+    """Where the quoted reply starts, or the body length if there is none."""
+    folded = _fold(email_body)
+    for pattern, required in zip(REPLY_PATTERNS, _REPLY_REQUIRES):
+        if all(text in folded for text in required):
+            match = pattern.search(email_body)
+            if match:
+                return match.start()
+    return len(email_body)
+
+
+def _clean_words(text: str) -> str | None:
+    """Whitespace collapsed, links and addresses removed; None if there are no words at all."""
+    words = text.split()  # \s and str.split() agree on what whitespace is
+    if not words:
+        return None
+    text = " ".join(words)
+    for link_pattern in _LINK_PATTERNS:
+        text = link_pattern.sub('', text)
+    return _ADDRESS.sub('', text)
+
 
 def clean_emails(email_body, max_length=2000):
+    """
+    Cuts quoted replies, collapses whitespace, drops links and email
+    addresses, and truncates to max_length characters.
+
+    Cleans the body in chunks and stops as soon as the output passes
+    max_length, so a 100KB newsletter costs about as much as its first
+    few KB.
+    """
     # 1. TRUNCATE QUOTED TEXT
-    # This regex looks for common "On [Date], [Name] wrote:" patterns
-    # It also handles the Spanish "El [Date] escribió:" found in your logs
-    reply_patterns = [
-        r'(^|\n)On\s+.*\s+wrote:.*',          # English: On ... wrote:
-        r'(^|\n)El\s+.*\s+escribió:.*',      # Spanish: El ... escribió:
-        r'(^|\n)---*\s*Original Message\s*---*', # Common Outlook header
-        r'(^|\n)________________________________', # Visual dividers
-        r'(^|\n)From:\s*.*?\nSent:\s*.*'      # Forwarded/Inline styles
-    ]
-
-    for pattern in reply_patterns:
-        # We use re.DOTALL to ensure we catch everything after the match
-        match = re.search(pattern, email_body, re.IGNORECASE | re.MULTILINE)
-        if match:
-            email_body = email_body[:match.start()]
-            break
-
-    # 2. STANDARD CLEANING
-    email_body = re.sub(r'\s+', ' ', email_body).strip()  # Remove excessive whitespace
-    for link_pattern in [r'http\S+', r'www\.\S+']:
-        email_body = re.sub(link_pattern, '', email_body)
-    email_body = re.sub(r'\S+@\S+', '', email_body)
+    end = _reply_cut(email_body)
+
+    # 2. STANDARD CLEANING, a chunk at a time. Chunks end on whitespace and
+    # none of the patterns match across it, so cleaning them separately and
+    # joining with one space equals cleaning the whole body.
+    chunk = max_length * _CHUNK_FACTOR + _MIN_CHUNK
+    pieces, length, pos = [], -1, 0
+    while pos < end and length <= max_length:
+        stop = min(pos + chunk, end)
+        if stop < end:
+            space = _SPACE.search(email_body, stop, end)
+            stop = space.start() if space else end
+        words = _clean_words(email_body[pos:stop])
+        if words is not None:
+            pieces.append(words)
+            length += len(words) + 1
+        pos = stop
+    email_body = " ".join(pieces)
 
     if len(email_body) > max_length:
         email_body = email_body[:max_length] + " ... [truncated]"
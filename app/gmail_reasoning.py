@@ -1,22 +1,124 @@
-import os, dotenv, requests
+import os, dotenv
+import math
+import re
+import logging
 from app.gmail_services import get_unread
+from app.groq_client import achat_completion, run_sync
+from app.sender_match import SENDER_MATCH, query_tokens, sender_score
 
 dotenv.load_dotenv()
 
 ACCESS_TOKEN = os.getenv("GMAIL_ACCESS_TOKEN")
-GROQ_API_URL = os.getenv("GROQ_API_URL")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 REASONING_MODEL = os.getenv("REASONING_MODEL")
 
-def find_reply_match(unread_emails, match_recipient, match_description):
+logger = logging.getLogger(__name__)
+
+# Candidates sent to REASONING_MODEL when the local ranking isn't decisive.
+REPLY_CANDIDATES = int(os.getenv("REPLY_CANDIDATES", "3"))
+# The top candidate is picked without the LLM when it matches the recipient
+# and leads the runner-up by this much (scores are 0.0 to 1.5).
+DECISIVE_MARGIN = 0.3
+# Weight of description overlap relative to the sender match.
+TEXT_WEIGHT = 0.5
+
+# Okapi BM25 parameters, the usual defaults.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Words of a spoken reply description that say nothing about which email it answers.
+_DESCRIPTION_STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "to", "of", "in", "on", "at", "for", "with", "about", "from", "that", "this",
+    "it", "is", "are", "was", "be", "been", "will", "would", "can", "could", "i", "im", "ill", "me", "my", "we", "our",
+    "you", "your", "he", "him", "his", "she", "her", "they", "them", "their", "tell", "telling", "say", "saying",
+    "let", "know", "reply", "respond", "email", "message", "back", "yes", "no", "not", "able", "just", "so", "if",
+}
+
+
+def _terms(text: str) -> list:
+    # Plural and possessive s folded so "meetings" matches "meeting".
+    return [w[:-1] if len(w) > 3 and w.endswith("s") else w
+            for w in _WORD.findall(text.lower().replace("'", "")) if w not in _DESCRIPTION_STOPWORDS]
+
+
+def bm25_scores(query: str, documents: dict) -> dict:
     """
-    Finds the best matching email from the unread emails based on recipient and description.
+    Okapi BM25 score of each document against the query, with IDF taken over
+    the documents themselves (the handful of candidate emails).
+
+    :param query: Free text, e.g. the user's email_description
+    :type query: str
+    :param documents: {doc_id: text}
+    :type documents: dict
+    :rtype: dict
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-    }
-    data = {
+    terms = {doc_id: _terms(text) for doc_id, text in documents.items()}
+    if not terms:
+        return {}
+    average = sum(len(t) for t in terms.values()) / len(terms) or 1
+    frequency = {}
+    for doc_terms in terms.values():
+        for term in set(doc_terms):
+            frequency[term] = frequency.get(term, 0) + 1
+
+    scores = {}
+    for doc_id, doc_terms in terms.items():
+        score = 0.0
+        for term in set(_terms(query)):
+            tf = doc_terms.count(term)
+            if not tf:
+                continue
+            idf = math.log((len(terms) - frequency[term] + 0.5) / (frequency[term] + 0.5) + 1)
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc_terms) / average))
+        scores[doc_id] = score
+    return scores
+
+
+def rank_reply_candidates(unread_emails: dict, match_recipient: str, match_description: str) -> list:
+    """
+    Orders candidate emails by how well they fit the reply the user asked for:
+    sender similarity to the recipient plus BM25 overlap between the
+    description and the subject and snippet (normalised to the best overlap).
+
+    :param unread_emails: Compact emails {msg_id: {from, subject, snippet}}
+    :type unread_emails: dict
+    :param match_recipient: Who the user wants to reply to
+    :type match_recipient: str
+    :param match_description: What the reply is about
+    :type match_description: str
+    :return: [(msg_id, sender_score, score)], best first
+    :rtype: list
+    """
+    tokens = query_tokens(match_recipient or "")
+    text = bm25_scores(match_description or "", {
+        msg_id: f"{data.get('subject', '')} {data.get('snippet', '')}" for msg_id, data in unread_emails.items()
+    })
+    top_text = max(text.values(), default=0.0) or 1.0
+    ranked = []
+    for msg_id, data in unread_emails.items():
+        sender = sender_score(tokens, data.get('from', ''))
+        ranked.append((msg_id, sender, sender + TEXT_WEIGHT * text[msg_id] / top_text))
+    return sorted(ranked, key=lambda candidate: -candidate[2])
+
+
+def _local_reply_match(unread_emails: dict, match_recipient: str, match_description: str) -> tuple:
+    """(msg_id, None) when the ranking is decisive, else (None, the top candidates for the LLM)."""
+    ranked = rank_reply_candidates(unread_emails, match_recipient, match_description)
+    if ranked:
+        best_id, best_sender, best = ranked[0]
+        runner_up = ranked[1][2] if len(ranked) > 1 else 0.0
+        if best_sender >= SENDER_MATCH and best - runner_up >= DECISIVE_MARGIN:
+            logger.info(f"Reply match picked locally ({best:.2f} vs {runner_up:.2f})")
+            return best_id, None
+    top = {msg_id for msg_id, _, score in ranked[:REPLY_CANDIDATES] if score > 0}
+    if not top:
+        # Nothing to go on locally ("reply to my TA"): the LLM sees every email.
+        return None, unread_emails
+    logger.info(f"Reply match not decisive, sending {len(top)} of {len(unread_emails)} candidates to the LLM")
+    return None, {msg_id: data for msg_id, data in unread_emails.items() if msg_id in top}
+
+def _reply_match_request(unread_emails, match_recipient, match_description) -> dict:
+    return {
     "model": REASONING_MODEL,
     "messages": [
         {
@@ -44,10 +146,21 @@ def find_reply_match(unread_emails, match_recipient, match_description):
     "temperature": 0.0,
 }
 
-    response = requests.post(GROQ_API_URL, headers=headers, json=data)
-    if response.status_code == 200:
-        return response.json()['choices'][0]['message']['content'].strip()
-    else:
-        return f"Error: {response.status_code}, {response.text}"
 
-    
+async def find_reply_match_async(unread_emails, match_recipient, match_description):
+    """
+    Finds the best matching email from the unread emails based on recipient and description.
+    A clear winner from the local ranking is returned without calling the model.
+
+    :return: The matching email's ID, or 'none'
+    :raises GroqAPIError: if the model call fails (rather than returning the error as an ID)
+    """
+    match_id, candidates = _local_reply_match(unread_emails, match_recipient, match_description)
+    if match_id is not None:
+        return match_id
+    return (await achat_completion(_reply_match_request(candidates, match_recipient, match_description))).strip()
+
+
+def find_reply_match(unread_emails, match_recipient, match_description):
+    """Blocking find_reply_match_async() for scripts and tests."""
+    return run_sync(find_reply_match_async, unread_emails, match_recipient, match_description)
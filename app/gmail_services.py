@@ -1,12 +1,18 @@
 import os, dotenv
+import functools
+import asyncio
+import anyio
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from app.gmail_helpers import get_email_body, clean_emails
+from app import deadline
+from app.gmail_client import gmail_service, GMAIL_TIMEOUT
+from app.mailbox_sync import recent_messages, PRIMARY_INBOX, PRIMARY_UNREAD, ALL_MAIL
+from app.gmail_helpers import get_email_body, clean_emails, body_budget
+from app.sender_match import query_tokens, tokens_match
 import base64
 from email.message import EmailMessage
 import email.utils
 import logging
+import re
 
 dotenv.load_dotenv()
 
@@ -18,6 +24,18 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 import requests
 
+# googleapiclient is synchronous, so the async request path runs Gmail calls
+# on worker threads. The limiter caps how many run at once across all requests.
+GMAIL_THREAD_LIMIT = int(os.getenv("GMAIL_THREAD_LIMIT", "100"))
+_thread_limiter = None
+# Seconds a draft or reply upsert is given before the request deadline. A
+# write can't be taken back, so with less left it isn't started at all.
+GMAIL_WRITE_TIME = float(os.getenv("GMAIL_WRITE_TIME", "1.5"))
+
+# A sender check stops fetching once this many emails from the sender are in hand.
+SENDER_MATCH_LIMIT = int(os.getenv("SENDER_MATCH_LIMIT", "5"))
+
+
 def get_user_first_name(access_token: str) -> str:
     response = requests.get(
         "https://www.googleapis.com/oauth2/v3/userinfo",
@@ -27,91 +45,159 @@ def get_user_first_name(access_token: str) -> str:
     return response.json().get("given_name")
 
 
-def get_emails(hours_back=24, max_results=15, body_max_length=2000, access_token=ACCESS_TOKEN) -> dict:
-    logger.info(f"Fetching unread emails from last {hours_back} hours (max {max_results} results)")
+# Keys of a parsed email record, in the order they're emitted.
+EMAIL_FIELDS = ('from', 'from-email', 'date', 'subject', 'body', 'rfc-id', 'triage')
+
+# Triage verdicts. SKIP is mail the summary prompt would tell the model to
+# ignore anyway (newsletters, marketing, automated notifications), decided
+# from headers and labels alone.
+TRIAGE_KEEP = "KEEP"
+TRIAGE_SKIP = "SKIP"
+
+_NO_REPLY = re.compile(r"^(?:no-?reply|do-?not-?reply|notifications?|mailer-daemon|bounces?|news(?:letter)?|marketing)\b", re.IGNORECASE)
+_BULK_PRECEDENCE = {"bulk", "list", "junk"}
+_BULK_CATEGORIES = {"CATEGORY_PROMOTIONS", "CATEGORY_SOCIAL", "CATEGORY_UPDATES", "CATEGORY_FORUMS"}
+
+
+def triage(headers: dict, label_ids: list) -> str:
+    """
+    TRIAGE_SKIP for bulk or machine-sent mail, else TRIAGE_KEEP.
+
+    :param headers: Message headers as {name: value}
+    :type headers: dict
+    :param label_ids: The message's Gmail labels
+    :type label_ids: list
+    :rtype: str
+    """
+    if headers.get('List-Unsubscribe') or headers.get('Precedence', '').strip().lower() in _BULK_PRECEDENCE:
+        return TRIAGE_SKIP
+    if headers.get('Auto-Submitted', 'no').strip().lower() != 'no':
+        return TRIAGE_SKIP
+    if _NO_REPLY.match(email.utils.parseaddr(headers.get('From', ''))[1]):
+        return TRIAGE_SKIP
+    if _BULK_CATEGORIES & set(label_ids or ()):
+        return TRIAGE_SKIP
+    return TRIAGE_KEEP
+
+
+def _email_record(message: dict, body_max_length: int, fields: tuple) -> dict:
+    payload = message.get('payload', {})
+    headers = {}
+    for h in payload.get('headers', []):
+        headers.setdefault(h['name'], h['value'])
+
+    record = {}
+    for field in fields:
+        if field == 'from':
+            record['from'] = headers.get('From', "Unknown Sender")
+        elif field == 'from-email':
+            record['from-email'] = email.utils.parseaddr(headers.get('From', "Unknown Sender"))[1]
+        elif field == 'date':
+            record['date'] = headers.get('Date')
+        elif field == 'subject':
+            record['subject'] = headers.get('Subject', "No Subject")
+        elif field == 'body':
+            record['body'] = clean_emails(get_email_body(payload, max_bytes=body_budget(body_max_length)), max_length=body_max_length)
+        elif field == 'rfc-id':
+            record['rfc-id'] = headers.get('Message-ID')
+        elif field == 'triage':
+            record['triage'] = triage(headers, message.get('labelIds', []))
+    return record
+
+
+def iter_emails(view=PRIMARY_INBOX, after_ts=0, max_results=15, body_max_length=2000, fields=EMAIL_FIELDS, access_token=ACCESS_TOKEN):
+    """
+    Yields (message_id, record) for the newest messages matching `view`,
+    newest first. Records are parsed one at a time as the consumer asks for
+    them, so a consumer that stops early never decodes or cleans the rest.
+
+    :param view: Which search to run (PRIMARY_INBOX, PRIMARY_UNREAD, ALL_MAIL)
+    :type view: MailboxView
+    :param after_ts: Unix timestamp lower bound
+    :type after_ts: int
+    :param max_results: Maximum number of messages listed
+    :type max_results: int
+    :param body_max_length: Cleaned bodies are truncated to this many characters
+    :type body_max_length: int
+    :param fields: Which record keys to emit (a subset of EMAIL_FIELDS)
+    :type fields: tuple
+    :param access_token: The user's OAuth token
+    :type access_token: str
+    """
     try:
-        creds = Credentials(access_token)
-
-        service = build('gmail', 'v1', credentials=creds)
-
-        after_ts = int((datetime.now() - timedelta(hours=hours_back)).timestamp())
-        query = f"label:INBOX category:primary after:{after_ts}"
-
-        results = service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
-        messages = results.get('messages', [])
-
-        if not messages:
-            logger.info(f"No unread emails found from last {hours_back} hours")
-            return {}
-
-        logger.info(f"Found {len(messages)} unread messages, fetching full details")
-        emails = {}
-        for msg in messages:
-            m = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-            payload = m.get('payload', {})
-            headers = m.get('payload', {}).get('headers', [])
-
-            body = get_email_body(payload)
-            body = clean_emails(body, max_length=body_max_length)
-            from_header = next((h['value'] for h in headers if h['name'] == 'From'), "Unknown Sender")
-            from_email = email.utils.parseaddr(from_header)[1]
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
-            rfc_id = next((h['value'] for h in headers if h['name'] == 'Message-ID'), None)
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), None)
-            emails[msg['id']] = {'from': from_header, 'from-email': from_email, 'date': date, 'subject': subject, 'body': body, 'rfc-id': rfc_id}
-
-        logger.info(f"Successfully retrieved {len(emails)} email details")
-        return emails
+        with gmail_service(access_token) as service:
+            messages = recent_messages(service, access_token, view, after_ts, max_results)
+        logger.info(f"Found {len(messages)} messages for '{view.query or 'all mail'}'")
+        for msg_id, m in messages.items():
+            yield msg_id, _email_record(m, body_max_length, fields)
     except Exception as e:
-        logger.error(f"Error fetching unread emails: {e}", exc_info=True)
+        logger.error(f"Error fetching emails: {e}", exc_info=True)
         raise
 
 
+def collect_emails(records, stop=None) -> dict:
+    """
+    Drains iter_emails() into the {message_id: record} dict the generation
+    layer takes, stopping after the first record for which `stop` is true.
 
-def get_unread(hours_back=24, max_results=3, access_token = ACCESS_TOKEN) -> str:
-    logger.info(f"Fetching unread emails from last {hours_back} hours (max {max_results} results)")
+    :param records: Iterator of (message_id, record) pairs, e.g. iter_emails() or dict.items()
+    :param stop: Optional predicate on a record that ends the fetch early
+    :rtype: dict
+    """
+    emails = {}
     try:
-        creds = Credentials(access_token)
-
-        service = build('gmail', 'v1', credentials=creds)
-
-        after_ts = int((datetime.now() - timedelta(hours=hours_back)).timestamp())
-        query = f"label:INBOX category:primary is:unread after:{after_ts}"
-
-        results = service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
-        messages = results.get('messages', [])
-
-        if not messages:
-            logger.info(f"No unread emails found from last {hours_back} hours")
-            return {}
-
-        logger.info(f"Found {len(messages)} unread messages, fetching full details")
-        emails = {}
-        for msg in messages:
-            m = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-            payload = m.get('payload', {})
-            headers = m.get('payload', {}).get('headers', [])
-
-            # Clean and Truncate logic applied here
-            body = get_email_body(payload)
-            body = clean_emails(body)
-            from_header = next((h['value'] for h in headers if h['name'] == 'From'), "Unknown Sender")
-            from_email = email.utils.parseaddr(from_header)[1]
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
-            rfc_id = next((h['value'] for h in headers if h['name'] == 'Message-ID'), None)
-            emails[msg['id']] = {'from': from_header, 'from-email': from_email, 'subject': subject, 'body': body, 'rfc-id': rfc_id}
-
-        logger.info(f"Successfully retrieved {len(emails)} email details")
-        return emails
-    except Exception as e:
-        logger.error(f"Error fetching unread emails: {e}", exc_info=True)
-        raise
+        for msg_id, record in records:
+            emails[msg_id] = record
+            if stop is not None and stop(record):
+                logger.info(f"Stopped early after {len(emails)} emails")
+                break
+    finally:
+        # Closing a generator releases it now instead of whenever it's collected.
+        if hasattr(records, 'close'):
+            records.close()
+    return emails
+
+
+def until_sender_matches(sender_name: str, enough: int = SENDER_MATCH_LIMIT):
+    """
+    Early-stop predicate for collect_emails(): true once `enough` records
+    have a From header that fuzzily matches `sender_name` (sender_match). A
+    nickname the check can't see simply never stops the stream, so the LLM
+    still gets the whole window to match against.
+    """
+    tokens = query_tokens(sender_name)
+    matched = 0
 
+    def stop(record: dict) -> bool:
+        nonlocal matched
+        if tokens_match(tokens, record.get('from', '')):
+            matched += 1
+        return matched >= enough
 
+    return stop
 
 
+def _after(**delta) -> int:
+    return int((datetime.now() - timedelta(**delta)).timestamp())
+
+
+def get_emails(hours_back=24, max_results=15, body_max_length=2000, access_token=ACCESS_TOKEN, stop=None) -> dict:
+    logger.info(f"Fetching emails from last {hours_back} hours (max {max_results} results)")
+    emails = collect_emails(iter_emails(PRIMARY_INBOX, _after(hours=hours_back), max_results, body_max_length,
+                                        access_token=access_token), stop)
+    logger.info(f"Successfully retrieved {len(emails)} email details")
+    return emails
+
+
+def get_unread(hours_back=24, max_results=3, access_token = ACCESS_TOKEN) -> str:
+    logger.info(f"Fetching unread emails from last {hours_back} hours (max {max_results} results)")
+    emails = collect_emails(iter_emails(PRIMARY_UNREAD, _after(hours=hours_back), max_results,
+                                        fields=('from', 'from-email', 'subject', 'body', 'rfc-id'), access_token=access_token))
+    logger.info(f"Successfully retrieved {len(emails)} email details")
+    return emails
+
 
-def get_recent_all_emails(minutes_back=10, max_results=10, access_token=ACCESS_TOKEN) -> dict:
+def get_recent_all_emails(minutes_back=10, max_results=10, access_token=ACCESS_TOKEN, stop=None) -> dict:
     """
     Fetches all emails (across all categories, not just Primary) received in the
     last `minutes_back` minutes. Used for verification code lookup where the
@@ -121,59 +207,27 @@ def get_recent_all_emails(minutes_back=10, max_results=10, access_token=ACCESS_T
     near the top, so a tighter limit avoids wasting tokens on boilerplate footers.
     """
     logger.info(f"Fetching all emails from last {minutes_back} minutes (max {max_results} results)")
-    try:
-        creds = Credentials(access_token)
-        service = build('gmail', 'v1', credentials=creds)
-
-        after_ts = int((datetime.now() - timedelta(minutes=minutes_back)).timestamp())
-        query = f"after:{after_ts}"
-
-        results = service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
-        messages = results.get('messages', [])
-
-        if not messages:
-            logger.info(f"No emails found from last {minutes_back} minutes")
-            return {}
-
-        logger.info(f"Found {len(messages)} messages, fetching full details")
-        emails = {}
-        for msg in messages:
-            m = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-            payload = m.get('payload', {})
-            headers = m.get('payload', {}).get('headers', [])
-
-            body = get_email_body(payload)
-            body = clean_emails(body, max_length=500)
-            from_header = next((h['value'] for h in headers if h['name'] == 'From'), "Unknown Sender")
-            from_email = email.utils.parseaddr(from_header)[1]
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), "No Subject")
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), None)
-            emails[msg['id']] = {'from': from_header, 'from-email': from_email, 'date': date, 'subject': subject, 'body': body}
-
-        logger.info(f"Successfully retrieved {len(emails)} recent emails")
-        return emails
-    except Exception as e:
-        logger.error(f"Error fetching recent emails: {e}", exc_info=True)
-        raise
+    emails = collect_emails(iter_emails(ALL_MAIL, _after(minutes=minutes_back), max_results, body_max_length=500,
+                                        fields=('from', 'from-email', 'date', 'subject', 'body'), access_token=access_token), stop)
+    logger.info(f"Successfully retrieved {len(emails)} recent emails")
+    return emails
 
 
 def upsert_draft(body: str, access_token: str = ACCESS_TOKEN) -> tuple:
     logger.info(f"Creating draft (body length: {len(body)} chars)")
     try:
-        creds = Credentials(access_token)
-        service = build('gmail', 'v1', credentials=creds)
+        with gmail_service(access_token) as service:
+            message = EmailMessage()
+            message.set_content(body)
 
-        message = EmailMessage()
-        message.set_content(body)
+            # Gmail API requires base64url encoded string
+            encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
 
-        # Gmail API requires base64url encoded string
-        encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+            create_message = {'message': {'raw': encoded_message}}
+            draft = service.users().drafts().create(userId='me', body=create_message).execute()
 
-        create_message = {'message': {'raw': encoded_message}}
-        draft = service.users().drafts().create(userId='me', body=create_message).execute()
-
-        logger.info(f"Draft created successfully with ID: {draft['id']}")
-        return (True, f"Draft created successfully. ID: {draft['id']}")
+            logger.info(f"Draft created successfully with ID: {draft['id']}")
+            return (True, f"Draft created successfully. ID: {draft['id']}")
     except Exception as e:
         logger.error(f"Error creating draft: {e}", exc_info=True)
         return (False, f"Error creating draft: {str(e)}")
@@ -186,38 +240,100 @@ def upsert_reply(body: str, thread_id: str, rfc_id: str, subject: str, to_email:
     """
     logger.info(f"Creating reply to {to_email} in thread {thread_id} (body length: {len(body)} chars)")
     try:
-        creds = Credentials(access_token)
-        service = build('gmail', 'v1', credentials=creds)
-
-        # 1. Create the MIME message
-        message = EmailMessage()
-        message.set_content(body)
-
-        # 2. Add the "Stitch" Headers
-        # Ensure subject starts with Re:
-        if not subject.lower().startswith("re:"):
-            subject = f"Re: {subject}"
-
-        message['Subject'] = subject
-        message['To'] = to_email
-        message['In-Reply-To'] = rfc_id
-        message['References'] = rfc_id  # For a simple reply, these are usually the same
-
-        # 3. Encode to base64url
-        encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-
-        # 4. Create the Draft object
-        create_message = {
-            'message': {
-                'raw': encoded_message,
-                'threadId': thread_id  # This tells Gmail's DB where to put it
+        with gmail_service(access_token) as service:
+            # 1. Create the MIME message
+            message = EmailMessage()
+            message.set_content(body)
+
+            # 2. Add the "Stitch" Headers
+            # Ensure subject starts with Re:
+            if not subject.lower().startswith("re:"):
+                subject = f"Re: {subject}"
+
+            message['Subject'] = subject
+            message['To'] = to_email
+            message['In-Reply-To'] = rfc_id
+            message['References'] = rfc_id  # For a simple reply, these are usually the same
+
+            # 3. Encode to base64url
+            encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+
+            # 4. Create the Draft object
+            create_message = {
+                'message': {
+                    'raw': encoded_message,
+                    'threadId': thread_id  # This tells Gmail's DB where to put it
+                }
             }
-        }
 
-        draft = service.users().drafts().create(userId='me', body=create_message).execute()
+            draft = service.users().drafts().create(userId='me', body=create_message).execute()
 
-        logger.info(f"Reply draft created successfully with ID: {draft['id']}")
-        return (True, f"Reply draft created successfully. ID: {draft['id']}")
+            logger.info(f"Reply draft created successfully with ID: {draft['id']}")
+            return (True, f"Reply draft created successfully. ID: {draft['id']}")
     except Exception as e:
         logger.error(f"Error creating reply: {e}", exc_info=True)
-        return (False, f"Error creating reply: {str(e)}")
\ No newline at end of file
+        return (False, f"Error creating reply: {str(e)}")
+
+
+def _get_thread_limiter() -> anyio.CapacityLimiter:
+    # Created lazily: a CapacityLimiter binds to the running event loop.
+    global _thread_limiter
+    if _thread_limiter is None:
+        _thread_limiter = anyio.CapacityLimiter(GMAIL_THREAD_LIMIT)
+    return _thread_limiter
+
+
+async def _run_in_thread(func, *args, **kwargs):
+    call = functools.partial(func, *args, **kwargs)
+    current = deadline.current()
+    if current is None:
+        return await anyio.to_thread.run_sync(call, limiter=_get_thread_limiter())
+    try:
+        with anyio.fail_after(current.timeout(GMAIL_TIMEOUT)):
+            # A worker thread can't be interrupted: past the deadline the request
+            # stops waiting for it and GMAIL_TIMEOUT ends the call itself.
+            return await anyio.to_thread.run_sync(call, limiter=_get_thread_limiter(), abandon_on_cancel=True)
+    except TimeoutError as e:
+        if not current.allows(0.05):
+            current.expire(e)
+        raise
+
+
+async def _write_in_thread(func, *args, **kwargs):
+    """
+    _run_in_thread() for calls that change the mailbox. Past the deadline the
+    request still waits for a write it started, so nobody is told to retry
+    something that went through.
+    """
+    current = deadline.current()
+    if current is not None:
+        if not current.allows(GMAIL_WRITE_TIME):
+            current.expire()
+        current.committed = True
+    write = asyncio.ensure_future(anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs),
+                                                           limiter=_get_thread_limiter()))
+    try:
+        return await asyncio.shield(write)
+    except asyncio.CancelledError:
+        await write
+        raise
+
+
+async def get_emails_async(**kwargs) -> dict:
+    return await _run_in_thread(get_emails, **kwargs)
+
+
+async def get_unread_async(**kwargs) -> dict:
+    return await _run_in_thread(get_unread, **kwargs)
+
+
+async def get_recent_all_emails_async(**kwargs) -> dict:
+    return await _run_in_thread(get_recent_all_emails, **kwargs)
+
+
+async def upsert_draft_async(body: str, **kwargs) -> tuple:
+    return await _write_in_thread(upsert_draft, body, **kwargs)
+
+
+async def upsert_reply_async(body: str, thread_id: str, rfc_id: str, subject: str, to_email: str, **kwargs) -> tuple:
+    return await _write_in_thread(upsert_reply, body, thread_id, rfc_id, subject, to_email, **kwargs)
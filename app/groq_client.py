@@ -0,0 +1,200 @@
+import os
+import json
+import asyncio
+import weakref
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from app import deadline
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GROQ_API_URL = os.getenv("GROQ_API_URL")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+# Keep-alive connections held open to Groq for the blocking chat_completion(),
+# which only scripts, benchmarks and the legacy summarize_emails() use; the
+# endpoints and run_sync() go through the async client below.
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "40"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "3.05"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "20"))
+
+# The async client multiplexes requests over HTTP/2, so a handful of
+# connections carries hundreds of in-flight completions.
+GROQ_ASYNC_MAX_CONNECTIONS = int(os.getenv("GROQ_ASYNC_MAX_CONNECTIONS", "20"))
+
+
+class GroqAPIError(Exception):
+    """Raised when Groq answers with a non-200 status or an unexpected body."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Error: {status_code}, {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GROQ_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json",
+    })
+    return session
+
+
+_session = _build_session()
+# One async client per event loop: the server's, plus the short-lived loops
+# run_sync() starts for sync callers.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_client() -> "httpx.AsyncClient":
+    """
+    Created on first use so it binds to the running event loop.
+    httpx is imported here too, keeping it out of the cold-start import.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+
+        client = _async_clients[loop] = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=GROQ_ASYNC_MAX_CONNECTIONS),
+            headers={
+                "Authorization": f"Bearer {GROQ_API_KEY}",
+                "Content-Type": "application/json",
+            },
+        )
+    return client
+
+
+async def aclose() -> None:
+    """Closes the running loop's async client; called from the app lifespan."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_sync(async_function, *args, **kwargs):
+    """
+    Runs an async LLM entry point to completion from sync code (scripts,
+    tests, benchmarks) on a private event loop, closing its connections
+    afterwards. Must not be called from a running event loop.
+    """
+    import anyio
+
+    async def call():
+        try:
+            return await async_function(*args, **kwargs)
+        finally:
+            await aclose()
+
+    return anyio.run(call)
+
+
+def _parse_completion(status_code: int, text: str, body) -> str:
+    if status_code != 200:
+        raise GroqAPIError(status_code, text)
+    try:
+        return body()["choices"][0]["message"]["content"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise GroqAPIError(status_code, text)
+
+
+def _timeouts(timeout: tuple) -> tuple:
+    """(connect, read) for one call, cut to the request deadline if one is set."""
+    connect, read = timeout or (GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT)
+    read = deadline.stage_timeout(read)
+    return min(connect, read), read
+
+
+def _deadline_hit(exc: Exception):
+    """Re-raises a timeout as DeadlineExceeded when it was the request deadline that ran out."""
+    current = deadline.current()
+    if current is not None and not current.allows(0.05):
+        current.expire(exc)
+    raise exc
+
+
+def chat_completion(data: dict, timeout: tuple = None) -> str:
+    """
+    Sends one chat completion request over the shared keep-alive pool.
+
+    :param data: The chat completion payload (model, messages, temperature, ...)
+    :type data: dict
+    :param timeout: (connect, read) seconds; defaults to GROQ_CONNECT_TIMEOUT / GROQ_READ_TIMEOUT,
+        cut to whatever is left of the request deadline
+    :type timeout: tuple
+    :return: The content of the first choice, unstripped
+    :rtype: str
+    :raises GroqAPIError: on a non-200 response or a body without choices
+    :raises DeadlineExceeded: if the request deadline runs out first
+    :raises requests.RequestException: on connection failures and timeouts
+    """
+    try:
+        response = _session.post(GROQ_API_URL, json=data, timeout=_timeouts(timeout))
+    except requests.Timeout as e:
+        _deadline_hit(e)
+    return _parse_completion(response.status_code, response.text, response.json)
+
+
+async def achat_completion(data: dict, timeout: tuple = None) -> str:
+    """
+    Awaitable chat_completion() over the shared HTTP/2 async client.
+
+    :raises GroqAPIError: on a non-200 response or a body without choices
+    :raises DeadlineExceeded: if the request deadline runs out first
+    :raises httpx.HTTPError: on connection failures and timeouts
+    """
+    import anyio
+    import httpx
+
+    connect, read = _timeouts(timeout)
+    try:
+        # httpx's read timeout is per read; under a deadline the whole call is bounded too.
+        with anyio.fail_after(read if deadline.current() is not None else None):
+            response = await _get_async_client().post(
+                GROQ_API_URL, json=data, timeout=httpx.Timeout(read, connect=connect)
+            )
+    except (TimeoutError, httpx.TimeoutException) as e:
+        _deadline_hit(e)
+    return _parse_completion(response.status_code, response.text, response.json)
+
+
+async def astream_chat_completion(data: dict, timeout: tuple = None):
+    """
+    Streams a chat completion (stream=True) and yields the content deltas as
+    Groq generates them. The read timeout applies between chunks, not to the
+    whole response.
+
+    :raises GroqAPIError: on a non-200 response or a malformed chunk
+    :raises httpx.HTTPError: on connection failures and timeouts
+    """
+    import httpx
+
+    connect, read = _timeouts(timeout)
+    async with _get_async_client().stream(
+        "POST", GROQ_API_URL, json={**data, "stream": True}, timeout=httpx.Timeout(read, connect=connect)
+    ) as response:
+        if response.status_code != 200:
+            raise GroqAPIError(response.status_code, (await response.aread()).decode("utf-8", "replace"))
+        async for line in response.aiter_lines():
+            # Server-sent events: "data: {chunk}" lines, ending with "data: [DONE]".
+            if not line.startswith("data:"):
+                continue
+            chunk = line[5:].strip()
+            if chunk == "[DONE]":
+                return
+            try:
+                delta = json.loads(chunk)["choices"][0]["delta"].get("content")
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+                raise GroqAPIError(response.status_code, chunk)
+            if delta:
+                yield delta
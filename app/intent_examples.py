@@ -0,0 +1,138 @@
+"""
+Labeled voice commands used to seed the local fast-path intent classifier in
+app/intent_reasoning. Seeded from the labeled corpus in tests/reasoning_test.py
+(standard, phonetic, slang and negative cases), grouped by intent.
+"""
+
+INTENT_EXAMPLES = [
+    # gmail_summarize
+    ("Summarize my emails", "gmail_summarize"),
+    ("Give me a quick summary of my recent emails", "gmail_summarize"),
+    ("What's new in my inbox?", "gmail_summarize"),
+    ("Summer eyes my inbox", "gmail_summarize"),
+    ("What's in my in-boxer?", "gmail_summarize"),
+    ("Got any new emale?", "gmail_summarize"),
+    ("Somare eyes my mess ages", "gmail_summarize"),
+    ("Summer eyes me em ales", "gmail_summarize"),
+    ("Beef me on mine inbox", "gmail_summarize"),
+    ("Catch me upon my e-mules", "gmail_summarize"),
+    ("Check my male from the last our", "gmail_summarize"),
+    ("Reed my gnu mass edges", "gmail_summarize"),
+    ("Give me the guest of my male", "gmail_summarize"),
+    ("What's the lay test in my in blocks", "gmail_summarize"),
+    ("Check my mail for me", "gmail_summarize"),
+    ("What's up with my mail?", "gmail_summarize"),
+    ("Brief me on my messages", "gmail_summarize"),
+    ("Give me the tea on my inbox", "gmail_summarize"),
+    ("Catch me up on my mail", "gmail_summarize"),
+    ("Can you please summarize everything I haven't read yet from today?", "gmail_summarize"),
+    ("Check my unread messages and tell me what they say", "gmail_summarize"),
+    ("Look at my inbox and give me the highlights", "gmail_summarize"),
+    ("Get my latest emails", "gmail_summarize"),
+    ("Get the tea in my inbox", "gmail_summarize"),
+    ("Summarize my emails in the last hour", "gmail_summarize"),
+    ("Summarize my emails from the past 2 hours", "gmail_summarize"),
+    ("What happened in the last 3 hours", "gmail_summarize"),
+    ("Give me a summary of the past 4 hours", "gmail_summarize"),
+    ("Emails from the last 5 hours", "gmail_summarize"),
+    ("Check my mail within the last 6 hours", "gmail_summarize"),
+    ("Summarize the past 8 hours", "gmail_summarize"),
+    ("What's new from the last 10 hours", "gmail_summarize"),
+    ("Emails within the past 12 hours", "gmail_summarize"),
+    ("Summarize emails from the last 15 hours", "gmail_summarize"),
+    ("Show me emails in the past 18 hours", "gmail_summarize"),
+    ("What arrived in the last 20 hours", "gmail_summarize"),
+    ("Summarize my inbox for the past 22 hours", "gmail_summarize"),
+    ("Emails in the last 24 hours", "gmail_summarize"),
+    ("Summarize emails from the last 15 minutes", "gmail_summarize"),
+    ("What happened in the past 30 minutes", "gmail_summarize"),
+    ("Give me a summary of the last 45 minutes", "gmail_summarize"),
+    ("Check my emails within the last minute", "gmail_summarize"),
+    ("Summarize my emails from the past 2 days", "gmail_summarize"),
+    ("What was sent in the last 3 days", "gmail_summarize"),
+    ("Show me emails from the past 7 days", "gmail_summarize"),
+    ("Summarize my inbox for the last day", "gmail_summarize"),
+
+    # gmail_draft
+    ("Write an email to Dr. Keaney asking her to get lunch", "gmail_draft"),
+    ("Draft an email to my professor about the assignment", "gmail_draft"),
+    ("Compose an email to my boss telling him I can't make it", "gmail_draft"),
+    ("Send an email to Mom telling her I'll be gone", "gmail_draft"),
+    ("Draft and email to the dean", "gmail_draft"),
+    ("Send a male to Sarah", "gmail_draft"),
+    ("Right an email to Steve", "gmail_draft"),
+    ("Send them new em ale to my Mom about the weekend", "gmail_draft"),
+    ("Right a knew em ales to Dad about this weak end", "gmail_draft"),
+    ("Giraffe a new massage to profess or smyth", "gmail_draft"),
+    ("Come pose an e-nail to David", "gmail_draft"),
+    ("Shoe to note to Emma about the raw ject", "gmail_draft"),
+    ("Send anew emile to the dean", "gmail_draft"),
+    ("Start a new message to the registrar", "gmail_draft"),
+    ("Get me a new email for John", "gmail_draft"),
+    ("I need to send a fresh note to the coach", "gmail_draft"),
+    ("Make a draft for my TA", "gmail_draft"),
+    ("Shoot an email over to the team", "gmail_draft"),
+    ("Create a totally new email to the pizza place asking for a refund", "gmail_draft"),
+    ("Draft a formal letter to the scholarship committee", "gmail_draft"),
+    ("Reach out to Dave with a brand new email regarding the keys", "gmail_draft"),
+    ("Draft an email to the Registrar asking about my graduation status", "gmail_draft"),
+    ("Right a message to Mom saying I'm coming home for the weekend", "gmail_draft"),
+    ("Hit up Sarah and ask if she wants to grab coffee at the DC", "gmail_draft"),
+    ("Draft a new mail to the coach regarding the practice schedule change", "gmail_draft"),
+    ("Compose an email to my lab partner asking if they finished the data analysis", "gmail_draft"),
+
+    # gmail_reply
+    ("Reply to Connor telling him that I am available", "gmail_reply"),
+    ("Respond to Ashwin's email telling him the time works", "gmail_reply"),
+    ("Reply to Mike's email about the project update", "gmail_reply"),
+    ("Read play to Will about the frisbee game", "gmail_reply"),
+    ("Re-lie to the message from Brian", "gmail_reply"),
+    ("Reply to Ashwin's email telling him the thyme works", "gmail_reply"),
+    ("Reason pond to the shred from Sarah", "gmail_reply"),
+    ("Hit reap lie end tell him aisle bee weight", "gmail_reply"),
+    ("Send a respond to the last mass edge", "gmail_reply"),
+    ("Right back to David and say yes", "gmail_reply"),
+    ("Respond to current thread with yes", "gmail_reply"),
+    ("Answer the email from the library", "gmail_reply"),
+    ("Hit him back and say thanks", "gmail_reply"),
+    ("Go back to that thread with a 'will do'", "gmail_reply"),
+    ("I want to reply to the email I just got from my advisor and say thank you", "gmail_reply"),
+    ("Tell the person who just emailed me that I'm busy", "gmail_reply"),
+    ("Respond to the thread about the senior seminar", "gmail_reply"),
+    ("Follow up on that email from earlier", "gmail_reply"),
+    ("Reply to Professor Ryu and tell him I'll be ten minutes late to the seminar", "gmail_reply"),
+    ("Read play to the message from Brian with a big thank you", "gmail_reply"),
+    ("Hit Mike back and say that sounds like a plan", "gmail_reply"),
+    ("Reply to the financial aid office saying I sent the documents yesterday", "gmail_reply"),
+
+    # gmail_check_sender
+    ("Did Professor Kim email me?", "gmail_check_sender"),
+    ("Has my advisor reached out?", "gmail_check_sender"),
+    ("Any emails from the financial aid office?", "gmail_check_sender"),
+    ("Did my mom send me anything?", "gmail_check_sender"),
+    ("Check if the registrar emailed me", "gmail_check_sender"),
+    ("Did I hear back from Dr. Patel?", "gmail_check_sender"),
+    ("Has the dean's office contacted me?", "gmail_check_sender"),
+    ("Any messages from Coach Williams?", "gmail_check_sender"),
+
+    # gmail_verification_code
+    ("What's my verification code?", "gmail_verification_code"),
+    ("Find my OTP", "gmail_verification_code"),
+    ("Get my confirmation code from my email", "gmail_verification_code"),
+    ("What's my one-time password?", "gmail_verification_code"),
+    ("Read me my verification code", "gmail_verification_code"),
+    ("Did I get a verification code?", "gmail_verification_code"),
+    ("Check my email for an authentication code", "gmail_verification_code"),
+    ("Look for a security code in my inbox", "gmail_verification_code"),
+    ("What's my very fish aye shin code", "gmail_verification_code"),
+    ("Find my oh tee pee", "gmail_verification_code"),
+    ("Get my conform mation code", "gmail_verification_code"),
+    ("What's my won time pass word", "gmail_verification_code"),
+
+    # none
+    ("What time is it right now?", "none"),
+    ("Play some music on Spotify", "none"),
+    ("Set an alarm for 8am", "none"),
+    ("Tell me a joke", "none"),
+    ("How is the weather in Santa Barbara?", "none"),
+]
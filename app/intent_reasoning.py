@@ -1,14 +1,25 @@
-import requests
 import os
 import json
+import re
+from collections import Counter
 from dotenv import load_dotenv
+from app.cache import LRUCache
+from app.intent_examples import INTENT_EXAMPLES
+from app.groq_client import achat_completion, run_sync, GroqAPIError
 
 load_dotenv()
 
-GROQ_API_URL = os.getenv("GROQ_API_URL")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 REASONING_MODEL = os.getenv("REASONING_MODEL")
 
+# Minimum margin between the best and runner-up intent for the local classifier
+# to answer without the LLM. Raise it to trade hit rate for accuracy.
+INTENT_FASTPATH_THRESHOLD = float(os.getenv("INTENT_FASTPATH_THRESHOLD", "0.15"))
+
+# Classification and argument parsing are deterministic for a given command,
+# so repeated phrasings are answered from memory instead of another round trip.
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "2048"))
+INTENT_CACHE_TTL = float(os.getenv("INTENT_CACHE_TTL", "3600"))
+
 intent_descriptions = {
     "gmail_summarize": "Summarize unread Emails",
     "gmail_draft": "Draft an Email in a completely new email chain",
@@ -24,22 +35,189 @@ intent_arguments = {
     "gmail_reply": ["reply_recipient_name", "email_description"],
     "gmail_check_sender": ["sender_name"]}
 
-def mapIntent(command: str, intent_descriptions = intent_descriptions) -> str:
+# Intents whose arguments depend on when the command is said ("since this
+# morning", "today"), so a parse from an hour ago can't be reused.
+TIME_DEPENDENT_INTENTS = {"gmail_summarize"}
+
+PHONETIC_HINT = (
+    "Watch out for phenetic errors like 'summer eyes' which actually means 'summarize', or 'read play' which actually means 'reply'."
+)
+
+# Per-argument extraction rules, shared by parseArguments and the single-call
+# mapIntentWithArguments so the two paths never drift apart.
+ARGUMENT_RULES = (
+    "2. LOOKBACK_PERIOD_VALUE: Extract only the digit/number (e.g., '22' or '5'). \n"
+    "   - If no number is mentioned but a unit is (e.g., 'the last hour'), use '1'.\n"
+    "   - Return as an INTEGER or a numeric string.\n"
+    "3. LOOKBACK_PERIOD_UNITS: Extract the time unit (e.g., 'minutes', 'hours', 'days').\n"
+    "   - Always use the plural form: 'minutes', 'hours', or 'days'.\n"
+    "4. RECIPIENT_NAME: Extract the person or entity. Strip lead-in words like 'to' or 'send to'.\n"
+    "5. EMAIL_DESCRIPTION: Keep exact phrasing of the message. Do not summarize or change perspective.\n"
+    "6. SENDER_NAME: Extract the person, company, or organization the user is asking about. Strip lead-in phrases like 'from', 'any emails from', 'check for emails from'.\n"
+    "7. REPLY_RECIPIENT_NAME: Extract the name of the person the user wants to reply to. Strip lead-in phrases like 'to', 'reply to'.\n"
+    "8. EMPTY VALUES: Use '' for missing text. IMPORTANT: Default lookback_period_value to 12 and units to 'hours' if unspecified.\n"
+)
+
+class FastPathClassifier:
     """
-    Maps user intent to a specific action using Groq's API. 
-    
-    :param command: User command as given by the a command given through Alexa
-    :type command: str
-    :param action: A dictionary representing the action to be performed
-    :type action: dict
-    :return: The mapped action that corresponds to the user intent
-    :rtype: str
+    In-process intent classifier for unambiguous commands.
+
+    Nearest-centroid over TF-IDF weighted character n-grams of each word, so
+    Alexa mis-hearings like "summer eyes" or "em ales" still land near their
+    intent. Answers in tens of microseconds; callers fall back to the LLM when
+    the confidence (margin over the runner-up intent) is below threshold.
+
+    numpy is imported inside the methods: the classifier is built on the first
+    command, so it stays out of app.main's cold-start import.
     """
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-    }   
-    data = {
+
+    MIN_SIMILARITY = 0.2
+
+    def __init__(self, examples: list, ngram_sizes: tuple = (3, 4, 5)):
+        import numpy as np
+
+        self.ngram_sizes = ngram_sizes
+        self.intents = sorted({intent for _, intent in examples})
+
+        docs = [self._ngrams(command) for command, _ in examples]
+        self.vocabulary = {}
+        for doc in docs:
+            for gram in doc:
+                self.vocabulary.setdefault(gram, len(self.vocabulary))
+
+        doc_freq = np.zeros(len(self.vocabulary))
+        for doc in docs:
+            doc_freq[[self.vocabulary[gram] for gram in doc]] += 1
+        self.idf = np.log((1 + len(docs)) / (1 + doc_freq)) + 1
+
+        centroids = np.zeros((len(self.intents), len(self.vocabulary)))
+        for doc, (_, intent) in zip(docs, examples):
+            centroids[self.intents.index(intent)] += self._vectorize(doc)
+        self.centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+    def _ngrams(self, text: str) -> Counter:
+        grams = Counter()
+        for word in re.sub(r"[^a-z0-9]+", " ", text.lower()).split():
+            padded = f" {word} "
+            for n in self.ngram_sizes:
+                for i in range(max(1, len(padded) - n + 1)):
+                    grams[padded[i:i + n]] += 1
+        return grams
+
+    def _vectorize(self, grams: Counter) -> "np.ndarray":
+        import numpy as np
+
+        known = [(self.vocabulary[gram], count) for gram, count in grams.items() if gram in self.vocabulary]
+        vector = np.zeros(len(self.vocabulary))
+        if known:
+            indices, counts = zip(*known)
+            indices = list(indices)
+            vector[indices] = (1 + np.log(counts)) * self.idf[indices]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def classify(self, command: str) -> tuple:
+        """Returns (intent, confidence); confidence is 0.0 when nothing is close enough."""
+        import numpy as np
+
+        similarities = self.centroids @ self._vectorize(self._ngrams(command))
+        runner_up, best = np.argsort(similarities)[-2:]
+        if similarities[best] < self.MIN_SIMILARITY:
+            return "none", 0.0
+        return self.intents[best], float(similarities[best] - similarities[runner_up])
+
+
+_fastpath_classifier = None
+
+# Intents the fast path may answer. Drafts and replies write to the user's
+# mailbox, where a wrong local guess ("send my draft" -> gmail_draft) leaves
+# junk behind, so they always go to the LLM.
+FASTPATH_INTENTS = {"gmail_summarize", "gmail_verification_code", "gmail_check_sender"}
+# Mailbox actions the assistant can't do. Commands naming them share most of
+# their n-grams with supported ones ("archive my emails", "delete my code
+# email"), so the classifier can't reject them; the LLM can answer "none".
+UNSUPPORTED_ACTIONS = {"archive", "delete", "trash", "remove", "cancel", "send", "forward", "unsubscribe",
+                       "mark", "block", "star", "label", "move", "schedule", "snooze", "undo"}
+
+# Wake and hesitation words Alexa transcribes ahead of the command. They're
+# only stripped from the front: anywhere else a word like "thanks" or "okay"
+# may be what the email should say.
+LEAD_IN_WORDS = {"um", "uh", "uhm", "er", "hmm", "hey", "alexa", "ok", "okay", "so"}
+
+_intent_cache = LRUCache(maxsize=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL)
+_argument_cache = LRUCache(maxsize=INTENT_CACHE_SIZE, ttl=INTENT_CACHE_TTL)
+
+
+def normalize_command(command: str) -> str:
+    """Argument cache key: lowercase words without punctuation ("Reply to Connor, saying OK!" -> "reply to connor saying ok")."""
+    return " ".join(re.sub(r"[^a-z0-9' ]+", " ", command.lower()).replace("'", "").split())
+
+
+def intent_key(command: str) -> str:
+    """Intent cache key: normalize_command() without leading LEAD_IN_WORDS ("Um, summarize my emails" -> "summarize my emails")."""
+    words = normalize_command(command).split()
+    while words and words[0] in LEAD_IN_WORDS:
+        words.pop(0)
+    return " ".join(words)
+
+
+def _cached_intent(command: str, intent_descriptions: dict) -> str | None:
+    return _intent_cache.get((intent_key(command), tuple(intent_descriptions)))
+
+
+def _cache_intent(command: str, intent: str, intent_descriptions: dict) -> None:
+    # Only valid keys: a malformed answer should get another chance next time.
+    if intent in intent_descriptions:
+        _intent_cache.set((intent_key(command), tuple(intent_descriptions)), intent)
+
+
+def _cached_arguments(command: str, intent: str) -> dict | None:
+    if intent in TIME_DEPENDENT_INTENTS:
+        return None
+    arguments = _argument_cache.get((normalize_command(command), intent))
+    return dict(arguments) if arguments is not None else None
+
+
+def _cache_arguments(command: str, intent: str, arguments: dict) -> None:
+    if intent not in TIME_DEPENDENT_INTENTS:
+        _argument_cache.set((normalize_command(command), intent), dict(arguments))
+
+
+def intent_cache_stats() -> dict:
+    """Size, hits, misses and hit rate of the intent and argument caches."""
+    stats = {}
+    for name, cache in (("intent", _intent_cache), ("arguments", _argument_cache)):
+        entry = cache.stats()
+        lookups = entry["hits"] + entry["misses"]
+        entry["hit_rate"] = entry["hits"] / lookups if lookups else 0.0
+        stats[name] = entry
+    return stats
+
+
+def fastpath_intent(command: str, threshold: float = None) -> str | None:
+    """
+    Classifies the command locally, returning None when the LLM should decide.
+
+    "none" is never answered locally: rejecting a real command costs the user a
+    retry, while deferring costs only one model call. Neither are intents
+    outside FASTPATH_INTENTS, nor commands naming an UNSUPPORTED_ACTIONS verb.
+    """
+    global _fastpath_classifier
+    if _fastpath_classifier is None:
+        _fastpath_classifier = FastPathClassifier(INTENT_EXAMPLES)
+
+    if UNSUPPORTED_ACTIONS & set(re.findall(r"[a-z]+", command.lower())):
+        return None
+
+    threshold = INTENT_FASTPATH_THRESHOLD if threshold is None else threshold
+    intent, confidence = _fastpath_classifier.classify(command)
+    if intent not in FASTPATH_INTENTS or confidence < threshold:
+        return None
+    return intent
+
+
+def _map_intent_request(command: str, intent_descriptions: dict) -> dict:
+    return {
         "model": REASONING_MODEL,
         "messages": [
             {
@@ -48,7 +226,7 @@ def mapIntent(command: str, intent_descriptions = intent_descriptions) -> str:
                     "You are a command classifier for a student voice assistant. "
                     "Your task is to output EXACTLY one of the provided action keys and NOTHING else. "
                     "Do not include conversational text, do not include quotes, and do not explain your reasoning."
-                    "Watch out for phenetic errors like 'summer eyes' which actually means 'summarize', or 'read play' which actually means 'reply'."
+                    + PHONETIC_HINT
                 )
             },
             {
@@ -64,42 +242,61 @@ def mapIntent(command: str, intent_descriptions = intent_descriptions) -> str:
         "temperature": 0.0, # CRITICAL: Set temperature to 0 for deterministic mapping
     }
 
-    response = requests.post(GROQ_API_URL, headers=headers, json=data)
-    if response.status_code == 200:
-        result = response.json()
-        raw_output = result["choices"][0]["message"]["content"]
-        
-        # SANITIZATION: Remove quotes, whitespace, and periods
-        clean_output = raw_output.strip().replace("'", "").replace('"', "").replace(".", "")
-        
-        # If it returned a full sentence anyway, try to find the key inside it
-        for key in intent_descriptions.keys():
-            if key in clean_output:
-                return key
-                
-        return clean_output
-    else:
-        raise Exception(f"Error: {response.status_code}, {response.text}")
-    
 
-def parseArguments(command : str, intent : str) -> dict:
+def _parse_intent_output(raw_output: str, intent_descriptions: dict) -> str:
+    # SANITIZATION: Remove quotes, whitespace, and periods
+    clean_output = raw_output.strip().replace("'", "").replace('"', "").replace(".", "")
+
+    # If it returned a full sentence anyway, try to find the key inside it
+    for key in intent_descriptions.keys():
+        if key in clean_output:
+            return key
+
+    return clean_output
+
+
+async def mapIntentAsync(command: str, intent_descriptions = intent_descriptions, use_fastpath: bool = True) -> str:
     """
-    Given an command, and intent, parses the neccesssary arugments for that intent. 
+    Maps user intent to a specific action using Groq's API. 
+    Commands classified before (after intent_key) and high-confidence
+    commands from the local FastPathClassifier are answered without a model
+    call.
     
     :param command: User command as given by the a command given through Alexa
     :type command: str
-    :param intent: The mapped intent for the command (e.g "gmail_summarize")
-    :type intent: str
-    :return: The parsed arguments for the intent
-    :rtype: dict
+    :param action: A dictionary representing the action to be performed
+    :type action: dict
+    :param use_fastpath: Whether to try the local classifier before the LLM
+    :type use_fastpath: bool
+    :return: The mapped action that corresponds to the user intent
+    :rtype: str
     """
+    intent = _cached_intent(command, intent_descriptions)
+    if intent is not None:
+        return intent
+
+    if use_fastpath:
+        intent = fastpath_intent(command)
+        if intent in intent_descriptions:
+            return intent
+
+    return await _classify(command, intent_descriptions)
+
+
+def mapIntent(command: str, intent_descriptions = intent_descriptions, use_fastpath: bool = True) -> str:
+    """Blocking mapIntentAsync() for scripts and tests."""
+    return run_sync(mapIntentAsync, command, intent_descriptions, use_fastpath)
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-    }
 
-    data = {
+async def _classify(command: str, intent_descriptions: dict = intent_descriptions) -> str:
+    raw_output = await achat_completion(_map_intent_request(command, intent_descriptions))
+    intent = _parse_intent_output(raw_output, intent_descriptions)
+    _cache_intent(command, intent, intent_descriptions)
+    return intent
+
+
+def _parse_arguments_request(command: str, intent: str) -> dict:
+    return {
         "model": REASONING_MODEL,
         "messages": [
             {
@@ -108,16 +305,7 @@ def parseArguments(command : str, intent : str) -> dict:
                     "You are a strict semantic parser. You MUST output a JSON object using the exact keys provided by the user.\n\n"
                     "RULES:\n"
                     "1. KEY CASING: Use only the exact casing provided in the 'Required JSON Keys'.\n"
-                    "2. LOOKBACK_PERIOD_VALUE: Extract only the digit/number (e.g., '22' or '5'). \n"
-                    "   - If no number is mentioned but a unit is (e.g., 'the last hour'), use '1'.\n"
-                    "   - Return as an INTEGER or a numeric string.\n"
-                    "3. LOOKBACK_PERIOD_UNITS: Extract the time unit (e.g., 'minutes', 'hours', 'days').\n"
-                    "   - Always use the plural form: 'minutes', 'hours', or 'days'.\n"
-                    "4. RECIPIENT_NAME: Extract the person or entity. Strip lead-in words like 'to' or 'send to'.\n"
-                    "5. EMAIL_DESCRIPTION: Keep exact phrasing of the message. Do not summarize or change perspective.\n"
-                    "6. SENDER_NAME: Extract the person, company, or organization the user is asking about. Strip lead-in phrases like 'from', 'any emails from', 'check for emails from'.\n"
-                    "7. REPLY_RECIPIENT_NAME: Extract the name of the person the user wants to reply to. Strip lead-in phrases like 'to', 'reply to'.\n"
-                    "8. EMPTY VALUES: Use '' for missing text. IMPORTANT: Default lookback_period_value to 12 and units to 'hours' if unspecified.\n"
+                    + ARGUMENT_RULES +
                     "7. OUTPUT: Return ONLY valid JSON. No preamble, no markdown."
                 )
             },
@@ -131,16 +319,146 @@ def parseArguments(command : str, intent : str) -> dict:
                 )
             }
         ],
+        "temperature": 0.0,  # results are cached and shared, so they must be the deterministic parse
         "response_format": {"type": "json_object"} 
     }
-    response = requests.post(GROQ_API_URL, headers=headers, json=data)
-    if response.status_code == 200:
-        result = response.json()
-        # The content is returned as a STRING that looks like JSON
-        raw_content = result["choices"][0]["message"]["content"]
 
-        return dict(json.loads(raw_content))
-    else:
-        raise Exception(f"Error: {response.status_code}, {response.text}")
+
+async def parseArgumentsAsync(command: str, intent: str) -> dict:
+    """
+    Given an command, and intent, parses the neccesssary arugments for that intent. 
+    Results are cached by normalized command, except for TIME_DEPENDENT_INTENTS.
     
+    :param command: User command as given by the a command given through Alexa
+    :type command: str
+    :param intent: The mapped intent for the command (e.g "gmail_summarize")
+    :type intent: str
+    :return: The parsed arguments for the intent
+    :rtype: dict
+    """
+    arguments = _cached_arguments(command, intent)
+    if arguments is not None:
+        return arguments
+
+    # The content is returned as a STRING that looks like JSON
+    raw_content = await achat_completion(_parse_arguments_request(command, intent))
+    arguments = dict(json.loads(raw_content))
+    _cache_arguments(command, intent, arguments)
+    return arguments
+
+
+def parseArguments(command : str, intent : str) -> dict:
+    """Blocking parseArgumentsAsync() for scripts and tests."""
+    return run_sync(parseArgumentsAsync, command, intent)
+
+
+def _validate_intent_with_arguments(parsed) -> tuple:
+    """
+    Checks the single-call JSON against the intent and argument tables.
+
+    Returns (intent, arguments), with either element set to None when that
+    half of the response can't be trusted.
+    """
+    if not isinstance(parsed, dict):
+        return None, None
+
+    intent = parsed.get("intent")
+    if not isinstance(intent, str) or intent.strip() not in intent_descriptions:
+        return None, None
+    intent = intent.strip()
+
+    required = intent_arguments.get(intent, [])
+    arguments = parsed.get("arguments", {})
+    if not required:
+        return intent, {}
+    if not isinstance(arguments, dict) or any(key not in arguments for key in required):
+        return intent, None
+    if any(not isinstance(arguments[key], (str, int, float)) for key in required):
+        return intent, None
+    return intent, {key: arguments[key] for key in required}
+
+
+def _intent_with_arguments_request(command: str) -> dict:
+    return {
+        "model": REASONING_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": (
+                    "You are a command classifier and semantic parser for a student voice assistant. "
+                    "You MUST output a single JSON object of the form "
+                    '{"intent": "<action key>", "arguments": {<required keys for that action>}}.\n\n'
+                    "RULES:\n"
+                    "1. INTENT: Exactly one of the provided action keys. " + PHONETIC_HINT + "\n"
+                    "   - ARGUMENTS must contain exactly the keys listed for the chosen action (use {} if none are listed).\n"
+                    + ARGUMENT_RULES +
+                    "9. OUTPUT: Return ONLY valid JSON. No preamble, no markdown."
+                )
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Action Descriptions: {intent_descriptions}\n"
+                    f"Required Argument Keys per Action: {intent_arguments}\n"
+                    f"Command: '{command}'"
+                )
+            }
+        ],
+        "temperature": 0.0,
+        "response_format": {"type": "json_object"}
+    }
+
+
+async def mapIntentWithArgumentsAsync(command: str, on_intent=None) -> dict:
+    """
+    Classifies the command and extracts its arguments in a single Groq call.
+
+    Uses the same intent_descriptions and intent_arguments tables as mapIntent
+    and parseArguments. If the JSON response fails validation, falls back to
+    the two-step path — only for the half that failed, so a good intent with
+    malformed arguments costs one parseArguments call rather than two.
+
+    When the command was classified before or the local fast-path classifier
+    is confident, the classification call is skipped entirely and only
+    parseArguments runs (and nothing at all for intents without arguments, or
+    for arguments already cached).
+
+    :param command: User command as given by the a command given through Alexa
+    :type command: str
+    :param on_intent: Optional callback, called with the intent as soon as it
+        is decided and before any argument parsing, so the caller can start
+        work that only depends on the intent
+    :return: {"intent": <intent key>, "arguments": <dict of parsed arguments>}
+    :rtype: dict
+    """
+    intent = _cached_intent(command, intent_descriptions) or fastpath_intent(command)
+    if intent is not None:
+        if on_intent is not None:
+            on_intent(intent)
+        arguments = await parseArgumentsAsync(command, intent) if intent in intent_arguments else {}
+        return {"intent": intent, "arguments": arguments}
+
+    intent, arguments = None, None
+    try:
+        raw_content = await achat_completion(_intent_with_arguments_request(command))
+        intent, arguments = _validate_intent_with_arguments(json.loads(raw_content))
+    except (GroqAPIError, ValueError):
+        pass
+
+    if intent is None:
+        intent = await _classify(command)
+    else:
+        _cache_intent(command, intent, intent_descriptions)
+        if arguments and intent in intent_arguments:
+            _cache_arguments(command, intent, arguments)
+    if on_intent is not None:
+        on_intent(intent)
+    if arguments is None:
+        arguments = await parseArgumentsAsync(command, intent) if intent in intent_arguments else {}
+
+    return {"intent": intent, "arguments": arguments}
+
 
+def mapIntentWithArguments(command: str) -> dict:
+    """Blocking mapIntentWithArgumentsAsync() for scripts and tests."""
+    return run_sync(mapIntentWithArgumentsAsync, command)
@@ -0,0 +1,330 @@
+import os
+import time
+import logging
+import threading
+from app.cache import LRUCache
+from app.utils import hash_token
+
+logger = logging.getLogger(__name__)
+
+MAILBOX_CACHE_SIZE = int(os.getenv("MAILBOX_CACHE_SIZE", "256"))
+# A listing is kept as far back as the widest window asked of its view in
+# this many seconds; older messages are trimmed from it.
+LOOKBACK_MEMORY = int(os.getenv("MAILBOX_LOOKBACK_MEMORY", "3600"))
+
+# Gmail accepts up to 100 calls per batch but starts rate-limiting individual
+# parts well before that; 50 keeps a full page in one round trip.
+BATCH_SIZE = 50
+
+# The only headers the app reads (Content-Type for a single-part message's
+# charset; the last three for bulk-mail triage). A newsletter's full header
+# block (Received, DKIM, ARC, List-*) is often larger than its text body.
+MESSAGE_HEADERS = ["From", "Subject", "Date", "Message-ID", "Content-Type",
+                   "List-Unsubscribe", "Precedence", "Auto-Submitted"]
+
+# Partial response for a fetch: labels, date, the top-level headers and the
+# MIME tree four levels deep with each part's type, inline data and its own
+# few headers (Content-Type for the charset, Content-Disposition for
+# attachments). Sizes and attachment IDs are never read.
+_PART_FIELDS = "mimeType,headers,filename,body/data"
+MESSAGE_FIELDS = (
+    "id,threadId,labelIds,internalDate,"
+    f"payload(mimeType,headers,body/data,parts({_PART_FIELDS},parts({_PART_FIELDS},parts({_PART_FIELDS}))))"
+)
+
+
+def _batch_execute(service, requests: dict) -> dict:
+    """
+    Runs {request_id: HttpRequest} through the Gmail batch endpoint instead
+    of one round trip each. Returns {request_id: response} in the same order;
+    raises the first per-request error, matching the old serial loop which
+    failed on the first bad fetch.
+    """
+    fetched = {}
+    errors = []
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            errors.append(exception)
+        else:
+            fetched[request_id] = response
+
+    request_ids = list(requests)
+    for start in range(0, len(request_ids), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for request_id in request_ids[start:start + BATCH_SIZE]:
+            batch.add(requests[request_id], request_id=request_id)
+        batch.execute()
+        if errors:
+            raise errors[0]
+
+    return {request_id: fetched[request_id] for request_id in request_ids if request_id in fetched}
+
+
+def _fetch_messages(service, message_ids: list) -> dict:
+    """
+    Fetches messages as {message_id: message} in the shape the rest of the app
+    reads from format='full' (labelIds, internalDate, payload headers and MIME
+    parts), but only with the fields it uses.
+
+    One format='full' call per message, masked with `fields`. A field mask
+    can't pick headers by name, so the top-level block is cut down to
+    MESSAGE_HEADERS here, before it's cached. (Asking for them through a
+    second format='metadata' call would save a few bytes at twice the batch
+    parts and quota.) Responses are gzip-compressed; googleapiclient and
+    httplib2 already send Accept-Encoding: gzip and a "(gzip)" user agent.
+    """
+    # Each service.users().messages() call rebuilds the resource and all of its
+    # methods from the discovery document, so build it once for the whole batch.
+    messages = service.users().messages()
+    fetched = _batch_execute(service, {
+        msg_id: messages.get(userId='me', id=msg_id, format='full', fields=MESSAGE_FIELDS) for msg_id in message_ids
+    })
+
+    wanted = {name.lower() for name in MESSAGE_HEADERS}
+    for message in fetched.values():
+        payload = message.setdefault('payload', {})
+        payload['headers'] = [h for h in payload.get('headers', []) if h['name'].lower() in wanted]
+    return fetched
+
+
+class MailboxView:
+    """A Gmail search the app runs, plus the label test that reproduces it locally."""
+
+    def __init__(self, query: str, required: tuple = ()):
+        self.query = query
+        self.required = frozenset(required)
+
+    def matches(self, label_ids: list) -> bool:
+        # Plain Gmail searches never return Spam or Trash.
+        labels = set(label_ids)
+        return self.required <= labels and not labels & {"SPAM", "TRASH"}
+
+
+PRIMARY_INBOX = MailboxView("label:INBOX category:primary", required=("INBOX", "CATEGORY_PERSONAL"))
+PRIMARY_UNREAD = MailboxView("label:INBOX category:primary is:unread", required=("INBOX", "CATEGORY_PERSONAL", "UNREAD"))
+ALL_MAIL = MailboxView("")
+
+
+class _Listing:
+    """
+    The newest messages matching one view since `after_ts`, newest first.
+
+    `ids` is always an exact prefix of what messages.list would return, so a
+    later request with a newer cutoff and no more results than we hold can
+    be answered from it. `exhaustive` means the list call returned every
+    match, so any max_results is covered.
+    """
+
+    def __init__(self, view: MailboxView, after_ts: int, ids: list, exhaustive: bool):
+        self.view = view
+        self.after_ts = after_ts
+        self.ids = ids
+        self.exhaustive = exhaustive
+
+    def covers(self, after_ts: int, max_results: int) -> bool:
+        return after_ts >= self.after_ts and (self.exhaustive or max_results <= len(self.ids))
+
+
+def _received_ts(message: dict) -> int:
+    return int(message.get('internalDate', 0)) // 1000
+
+
+class UserMailbox:
+    """
+    One user's recently listed messages, kept current with users.history.list.
+
+    Message bodies never change in Gmail, so after the first fetch a repeat
+    command only pays for one history call, plus a batch fetch of whatever
+    arrived since. Deleted messages are dropped and label changes (read,
+    archived, moved) are applied to the cached copies in place.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.history_id = None
+        self.messages = {}
+        self.listings = {}
+        self.lookbacks = {}  # view query -> {lookback in minutes: when it was last asked for}
+
+    def recent_messages(self, service, view: MailboxView, after_ts: int, max_results: int) -> dict:
+        with self.lock:
+            if self.history_id is not None and not self._sync(service):
+                self._reset()
+
+            keep_after_ts = self._widest_after_ts(view, after_ts)
+            listing = self.listings.get(view.query)
+            if listing is None or not listing.covers(after_ts, max_results):
+                listing = self._relist(service, view, after_ts, max_results)
+            else:
+                logger.info(f"Serving '{view.query or 'all mail'}' from mailbox cache")
+                self._trim(listing, keep_after_ts)
+
+            ids = [msg_id for msg_id in listing.ids if _received_ts(self.messages[msg_id]) >= after_ts]
+            return {msg_id: self.messages[msg_id] for msg_id in ids[:max_results]}
+
+    def _reset(self):
+        self.history_id = None
+        self.messages.clear()
+        self.listings.clear()
+
+    def _relist(self, service, view: MailboxView, after_ts: int, max_results: int) -> _Listing:
+        if self.history_id is None:
+            # Taken before listing, so anything that changes mid-list is replayed by the next sync.
+            self.history_id = service.users().getProfile(userId='me').execute()['historyId']
+
+        query = f"{view.query} after:{after_ts}".strip()
+        results = service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
+        ids = [msg['id'] for msg in results.get('messages', [])]
+
+        missing = [msg_id for msg_id in ids if msg_id not in self.messages]
+        if missing:
+            logger.info(f"Fetching {len(missing)} of {len(ids)} listed messages not in mailbox cache")
+            self.messages.update(_fetch_messages(service, missing))
+
+        listing = _Listing(view, after_ts, [msg_id for msg_id in ids if msg_id in self.messages],
+                           exhaustive=len(ids) < max_results and 'nextPageToken' not in results)
+        self.listings[view.query] = listing
+        self._prune()
+        return listing
+
+    def _sync(self, service) -> bool:
+        """Applies mailbox changes since history_id. Returns False if the history has expired."""
+        from googleapiclient.errors import HttpError
+
+        history = service.users().history()
+        request = history.list(userId='me', startHistoryId=self.history_id)
+        labels, deleted = {}, set()
+        try:
+            while request is not None:
+                response = request.execute()
+                for record in response.get('history', []):
+                    for kind in ('messagesAdded', 'labelsAdded', 'labelsRemoved'):
+                        for item in record.get(kind, []):
+                            # Every history item carries the message's full label set after the change.
+                            labels[item['message']['id']] = item['message'].get('labelIds', [])
+                    for item in record.get('messagesDeleted', []):
+                        labels.pop(item['message']['id'], None)
+                        deleted.add(item['message']['id'])
+                latest = response.get('historyId', self.history_id)
+                request = history.list_next(request, response)
+        except HttpError as e:
+            if e.resp.status == 404:
+                logger.info("Gmail history expired, resyncing mailbox cache")
+                return False
+            raise
+
+        self.history_id = latest
+        if not labels and not deleted:
+            return True
+
+        for msg_id in deleted:
+            self.messages.pop(msg_id, None)
+            for listing in self.listings.values():
+                if msg_id in listing.ids:
+                    listing.ids.remove(msg_id)
+
+        wanted = [
+            msg_id for msg_id, label_ids in labels.items()
+            if msg_id not in self.messages and any(listing.view.matches(label_ids) for listing in self.listings.values())
+        ]
+        if wanted:
+            logger.info(f"Fetching {len(wanted)} new or relabelled messages since last sync")
+            self.messages.update(_fetch_messages(service, wanted))
+
+        for msg_id, label_ids in labels.items():
+            message = self.messages.get(msg_id)
+            if message is None:
+                continue
+            message['labelIds'] = label_ids
+            for listing in self.listings.values():
+                self._place(listing, msg_id)
+        self._prune()
+        return True
+
+    def _place(self, listing: _Listing, msg_id: str):
+        """Adds or removes one changed message so the listing stays an exact prefix."""
+        message = self.messages[msg_id]
+        if msg_id in listing.ids:
+            if not listing.view.matches(message['labelIds']):
+                listing.ids.remove(msg_id)
+            return
+        if not listing.view.matches(message['labelIds']) or _received_ts(message) < listing.after_ts:
+            return
+        received = int(message.get('internalDate', 0))
+        oldest = int(self.messages[listing.ids[-1]].get('internalDate', 0)) if listing.ids else None
+        if listing.exhaustive or (oldest is not None and received >= oldest):
+            listing.ids.append(msg_id)
+            listing.ids.sort(key=lambda i: -int(self.messages[i].get('internalDate', 0)))
+
+    def _widest_after_ts(self, view: MailboxView, after_ts: int) -> int:
+        """
+        The cutoff of the widest window asked of `view` recently, counting
+        this request. Summaries (12 h) and sender checks (72 h) share a view,
+        so trimming to the last request's window would refetch the wider one.
+        """
+        now = time.time()
+        lookbacks = self.lookbacks.setdefault(view.query, {})
+        lookbacks[int(-(-(now - after_ts) // 60))] = now
+        for minutes, asked in list(lookbacks.items()):
+            if now - asked > LOOKBACK_MEMORY:
+                del lookbacks[minutes]
+        return min(after_ts, int(now - max(lookbacks) * 60))
+
+    def _trim(self, listing: _Listing, after_ts: int):
+        """
+        Moves the listing's cutoff up to `after_ts` and drops what's older.
+        New messages keep being appended to an exhaustive listing, so without
+        this it would grow by every message that ever arrives.
+        """
+        if after_ts <= listing.after_ts:
+            return
+        ids = [msg_id for msg_id in listing.ids if _received_ts(self.messages[msg_id]) >= after_ts]
+        # Anything dropped was older than every match since after_ts, so what's left is all of them.
+        listing.exhaustive = listing.exhaustive or len(ids) < len(listing.ids)
+        listing.after_ts = after_ts
+        if len(ids) < len(listing.ids):
+            listing.ids = ids
+            self._prune()
+
+    def _prune(self):
+        listed = {msg_id for listing in self.listings.values() for msg_id in listing.ids}
+        for msg_id in [msg_id for msg_id in self.messages if msg_id not in listed]:
+            del self.messages[msg_id]
+
+
+_mailboxes = LRUCache(maxsize=MAILBOX_CACHE_SIZE)
+_mailboxes_lock = threading.Lock()
+
+
+def recent_messages(service, access_token: str, view: MailboxView, after_ts: int, max_results: int) -> dict:
+    """
+    The newest `max_results` messages matching `view` received after
+    `after_ts`, as {message_id: message} in format='full', newest first.
+
+    :param service: Gmail service client checked out for this user
+    :param access_token: The user's OAuth token; its hash keys the cache
+    :type access_token: str
+    :param view: Which search to run (PRIMARY_INBOX, PRIMARY_UNREAD, ALL_MAIL)
+    :type view: MailboxView
+    :param after_ts: Unix timestamp lower bound (Gmail's after:)
+    :type after_ts: int
+    :param max_results: Maximum number of messages returned
+    :type max_results: int
+    :rtype: dict
+    """
+    key = hash_token(access_token or "")
+    with _mailboxes_lock:
+        mailbox = _mailboxes.get(key)
+        if mailbox is None:
+            mailbox = UserMailbox()
+            _mailboxes.set(key, mailbox)
+    return mailbox.recent_messages(service, view, after_ts, max_results)
+
+
+def clear():
+    _mailboxes.clear()
+
+
+def cache_stats() -> dict:
+    return _mailboxes.stats()
@@ -1,21 +1,28 @@
-from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from matplotlib.patheffects import Normal
-from app.intent_reasoning import mapIntent, parseArguments
-from app.gmail_services import get_unread, get_user_first_name, upsert_draft, upsert_reply, get_emails, get_recent_all_emails
-from app.generation_layer import summarize_emails, generate_draft, generate_reply, prioritized_insights, extract_verification_code, summarize_sender_emails
-from app.gmail_reasoning import find_reply_match
-from app.demo_data import MOCK_EMAILS
-from app.utils import calculate_seconds
-from collections import defaultdict
+from app import groq_client
+from app import gmail_client
+from app.intent_reasoning import mapIntentWithArgumentsAsync, fastpath_intent, normalize_command
+from app.gmail_services import get_unread_async, upsert_draft_async, upsert_reply_async, get_emails_async, get_recent_all_emails_async, until_sender_matches, collect_emails
+from app.verification_codes import has_verification_code
+from app.generation_layer import generate_draft_async, generate_reply_async, prioritized_insights_async, extract_verification_code_async, summarize_sender_emails_async
+from app.generation_layer import prioritized_insights_stream, summarize_sender_emails_stream
+from app.gmail_reasoning import find_reply_match_async
+from app.demo_data import MOCK_EMAILS, DEMO_SAMPLE_COMMANDS
+from app.utils import calculate_seconds, hash_token
+from app.deadline import request_deadline
+from app.rate_limit import RateLimiter
+from app.cache import LRUCache
 from contextlib import asynccontextmanager
-from posthog import Posthog, new_context, identify_context
+from app.analytics import posthog_client, new_context, identify_context
 from pydantic import BaseModel
 from datetime import datetime, timezone, timedelta
-from email.utils import parsedate_to_datetime, format_datetime
-import atexit
-import hashlib
+from email.utils import format_datetime
 import os
+import asyncio
+import json
+import threading
 import time
 from dotenv import load_dotenv
 import logging
@@ -25,6 +32,15 @@ load_dotenv()
 
 ACCESS_TOKEN = os.getenv("GMAIL_ACCESS_TOKEN")
 
+# Heavy dependencies (googleapiclient, httpx, posthog, numpy, bs4) are imported on
+# first use so the dyno binds its port sooner; see app/startup_profile.py.
+# With prewarming on, a background thread loads them right after startup so
+# the first Alexa request usually doesn't pay for them either.
+STARTUP_PREWARM = os.getenv("STARTUP_PREWARM", "1") == "1"
+# Computes the demo's sample commands in the background at startup. Once
+# their responses expire, the next visitor to ask refreshes them.
+DEMO_PRECOMPUTE = os.getenv("DEMO_PRECOMPUTE", "1") == "1"
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,18 +48,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-posthog_client = Posthog(
-    project_api_key=os.getenv("POSTHOG_API_KEY"),
-    host=os.getenv("POSTHOG_HOST", "https://us.i.posthog.com"),
-    enable_exception_autocapture=True,
-)
-atexit.register(posthog_client.shutdown)
+
+def _prewarm():
+    start = time.perf_counter()
+    try:
+        import httpx  # noqa: F401 — the async Groq client itself must be created on the event loop
+        import bs4  # noqa: F401 — HTML-only emails are converted with it
+        gmail_client.build_service("prewarm")
+        posthog_client.capture  # first attribute access builds the real client
+        fastpath_intent("Summarize my emails")
+        logger.info(f"Prewarmed lazy dependencies in {(time.perf_counter() - start) * 1000:.0f} ms")
+    except Exception as e:
+        logger.warning(f"Prewarm failed, dependencies will load on first use: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if STARTUP_PREWARM:
+        threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
+    precompute = asyncio.create_task(_precompute_demo()) if DEMO_PRECOMPUTE else None
     yield
-    posthog_client.flush()
+    if precompute is not None:
+        precompute.cancel()
+    await groq_client.aclose()
+    if posthog_client.loaded:
+        posthog_client.flush()
 
 
 app = FastAPI(title="StudentOS API", lifespan=lifespan)
@@ -57,16 +86,122 @@ app.add_middleware(
 )
 
 
-intent_arguments = {
-    "gmail_summarize": ["lookback_period_units", "lookback_period_value"],
-    "gmail_draft": ["recipient_name", "email_description"],
-    "gmail_reply": ["reply_recipient_name", "email_description"],
-    "gmail_verification_code": [],
-    "gmail_check_sender": ["sender_name"]}
+# Gmail fetches that don't depend on parsed arguments, so they can start as
+# soon as the intent is known (see GmailPrefetch). The sender check and reply
+# always look back a fixed 72 hours; the verification code 10 minutes.
+_INTENT_FETCHES = {
+    "gmail_verification_code": lambda token: get_recent_all_emails_async(minutes_back=10, access_token=token, stop=has_verification_code),
+    "gmail_reply": lambda token: get_unread_async(hours_back=72, max_results=8, access_token=token),
+    "gmail_check_sender": lambda token: get_emails_async(hours_back=72, max_results=15, body_max_length=800, access_token=token),
+}
+
+# The local classifier's best guess starts a prefetch while the LLM still
+# classifies, if its margin clears this (well below the fast-path threshold:
+# a wrong guess only wastes one Gmail fetch on a worker thread).
+INTENT_PREFETCH_THRESHOLD = float(os.getenv("INTENT_PREFETCH_THRESHOLD", "0.05"))
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # Marks a dropped prefetch's error as seen so asyncio doesn't log it.
+    if not task.cancelled():
+        task.exception()
+
+
+class GmailPrefetch:
+    """
+    The Gmail fetch for one command, started before its arguments are parsed.
+
+    start() is called with the speculative intent and again with the real one;
+    a changed intent cancels the earlier fetch. executeCommand() claims the
+    task for the final intent, and anything unclaimed is cancelled. The worker
+    thread of a cancelled fetch runs to completion and its result is dropped.
+    """
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+        self.intent = None
+        self.task = None
+
+    def start(self, intent: str):
+        if intent == self.intent:
+            return
+        self.cancel()
+        fetch = _INTENT_FETCHES.get(intent)
+        if fetch is None:
+            return
+        logger.info(f"Prefetching Gmail for {intent}")
+        self.intent = intent
+        self.task = asyncio.ensure_future(fetch(self.access_token))
+        self.task.add_done_callback(_retrieve_exception)
+
+    def claim(self, intent: str) -> asyncio.Task | None:
+        """Hands over the running fetch if it was for `intent`; cancels it otherwise."""
+        if intent != self.intent:
+            self.cancel()
+            return None
+        task, self.task, self.intent = self.task, None, None
+        return task
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.task = self.intent = None
+
+
+async def _fetch_emails(intent: str, access_token: str, prefetched: asyncio.Task = None) -> dict:
+    return await (prefetched if prefetched is not None else _INTENT_FETCHES[intent](access_token))
+
+
+async def _route_command(command: str, prefetch: GmailPrefetch = None) -> tuple:
+    """Maps a command to (intent, arguments, None), or (None, None, spoken reply) when it can't be handled."""
+    if prefetch is not None:
+        guess = fastpath_intent(command, threshold=INTENT_PREFETCH_THRESHOLD)
+        if guess is not None:
+            prefetch.start(guess)
+    try:
+        # One structured call for both intent and arguments; falls back to
+        # mapIntent/parseArguments internally if the JSON doesn't validate.
+        parsed = await mapIntentWithArgumentsAsync(command, on_intent=prefetch.start if prefetch is not None else None)
+        intent, arguments = parsed["intent"], parsed["arguments"]
+        logger.info(f"Mapped intent: {intent}")
+    except Exception as e:
+        logger.error(f"Error mapping intent: {e}", exc_info=True)
+        return None, None, "Sorry, I'm having trouble reaching the server. Please try again later."
+
+    if intent == "none":
+        logger.info("Intent classified as 'none'")
+        posthog_client.capture("intent mapping failed", properties={"command_length": len(command)})
+        return None, None, "Sorry, I couldn't understand your command."
+
+    posthog_client.capture("intent mapped", properties={"intent": intent})
+    logger.info(f"Parsed arguments: {arguments}")
+    return intent, arguments, None
+
+
+# Spoken when a command can't finish inside the request deadline (app/deadline.py).
+DEADLINE_REPLY = "Sorry, that's taking longer than usual. Please try again in a moment."
+# Spoken instead once a draft or reply was being saved: it may well be there.
+DEADLINE_WRITE_REPLY = "Sorry, that took longer than usual. Check your drafts before trying again."
+
+# Commands per linked account per minute; 0 leaves /gmail unlimited.
+GMAIL_RATE_LIMIT = int(os.getenv("GMAIL_RATE_LIMIT", "0"))
+_gmail_limiter = RateLimiter("gmail", GMAIL_RATE_LIMIT, window=60) if GMAIL_RATE_LIMIT > 0 else None
+RATE_LIMIT_REPLY = "You've sent a lot of commands in the last minute. Please wait a moment and try again."
+
+
+def _gmail_rate_limited(user_id: str) -> float | None:
+    """Seconds until the user may send another command, or None if this one is admitted."""
+    if _gmail_limiter is None:
+        return None
+    allowed, retry_after = _gmail_limiter.hit(user_id)
+    if allowed:
+        return None
+    logger.warning(f"Rate limit reached for user {user_id}")
+    return retry_after
 
 
 @app.get("/gmail/{command}")
-def read_root(command: str, authorization: str = Header(None)):
+async def read_root(command: str, authorization: str = Header(None), draft_strategy: str = None):
     logger.info(f"Received command: {command}")
 
     if not authorization:
@@ -74,61 +209,189 @@ def read_root(command: str, authorization: str = Header(None)):
         return "Please link your Gmail account in the Alexa app."
 
     access_token = authorization.split(" ")[1]
-    user_id = hashlib.sha256(access_token.encode()).hexdigest()[:16]
+    user_id = hash_token(access_token)
 
-    with new_context():
+    if _gmail_rate_limited(user_id) is not None:
+        # Alexa speaks whatever comes back, so the refusal is a normal reply.
+        return RATE_LIMIT_REPLY
+
+    with new_context(), request_deadline() as deadline:
         identify_context(user_id)
         posthog_client.capture("command received", properties={"command_length": len(command)})
 
+        prefetch = GmailPrefetch(access_token)
         try:
-            intent = mapIntent(command)
-            logger.info(f"Mapped intent: {intent}")
-        except Exception as e:
-            logger.error(f"Error mapping intent: {e}", exc_info=True)
-            return "Sorry, I'm having trouble reaching the server. Please try again later."
-
-        if intent == "none":
-            logger.info("Intent classified as 'none'")
-            posthog_client.capture("intent mapping failed", properties={"command_length": len(command)})
-            return "Sorry, I couldn't understand your command."
-
-        posthog_client.capture("intent mapped", properties={"intent": intent})
+            # Every stage sizes its timeouts from the same deadline; this bounds
+            # whatever is still running when it passes.
+            reply = await asyncio.wait_for(_answer_command(command, access_token, prefetch, draft_strategy),
+                                           timeout=deadline.remaining())
+        except TimeoutError:
+            deadline.exceeded = True
+        finally:
+            prefetch.cancel()
+
+        if deadline.exceeded:
+            logger.warning(f"Command missed its {deadline.budget:.1f}s deadline: {command}")
+            posthog_client.capture("deadline exceeded")
+            return DEADLINE_WRITE_REPLY if deadline.committed else DEADLINE_REPLY
+        return reply
+
+
+async def _answer_command(command: str, access_token: str, prefetch, draft_strategy: str = None) -> str:
+    intent, arguments, reply = await _route_command(command, prefetch)
+    if reply is not None:
+        return reply
+
+    try:
+        result = await executeCommand(intent, arguments, access_token, prefetched=prefetch.claim(intent),
+                                      draft_strategy=draft_strategy)
+        logger.info(f"Command executed successfully for intent: {intent}")
+        return result
+    except Exception as e:
+        logger.error(f"Unhandled error in executeCommand for intent {intent}: {e}", exc_info=True)
+        return "Sorry, I'm having trouble reaching the server. Please try again later."
+
+
+def _sse(data: dict, event: str = None) -> str:
+    """One Server-Sent Events message."""
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+
+
+# Proxies (Heroku's router, nginx) must pass each event through as it's written.
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.get("/gmail/{command}/stream")
+async def stream_command(command: str, authorization: str = Header(None), draft_strategy: str = None):
+    """
+    Streaming /gmail/{command} for web clients. Summaries arrive as
+    `data: {"token": ...}` events while the model generates them; every
+    reply ends with an `event: done` message carrying the full response.
+    Over GMAIL_RATE_LIMIT the answer is a 429 with Retry-After instead.
+    """
+    if authorization:
+        retry_after = _gmail_rate_limited(hash_token(authorization.split(" ")[1]))
+        if retry_after is not None:
+            return JSONResponse({"response": RATE_LIMIT_REPLY}, status_code=429,
+                                headers={"Retry-After": str(max(int(retry_after + 0.5), 1))})
+    return StreamingResponse(_stream_command(command, authorization, draft_strategy), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+async def _stream_command(command: str, authorization: str, draft_strategy: str = None):
+    logger.info(f"Received streaming command: {command}")
+    if not authorization:
+        yield _sse({"response": "Please link your Gmail account in the Alexa app."}, event="done")
+        return
 
-        arguments = {}
-        if intent in intent_arguments:
-            try:
-                arguments = parseArguments(command, intent)
-                logger.info(f"Parsed arguments: {arguments}")
-            except Exception as e:
-                logger.error(f"Error parsing arguments for {intent}: {e}", exc_info=True)
-                return "There's a problem with the server. Please try again later."
+    access_token = authorization.split(" ")[1]
+    with new_context():
+        identify_context(hash_token(access_token))
+        posthog_client.capture("command received", properties={"command_length": len(command), "streaming": True})
 
+        prefetch = GmailPrefetch(access_token)
         try:
-            result = executeCommand(intent, arguments, access_token)
-            logger.info(f"Command executed successfully for intent: {intent}")
-            return result
-        except Exception as e:
-            logger.error(f"Unhandled error in executeCommand for intent {intent}: {e}", exc_info=True)
-            return "Sorry, I'm having trouble reaching the server. Please try again later."
-
-
-def executeCommand(intent: str, arguments: dict, access_token = ACCESS_TOKEN) -> str:
+            intent, arguments, reply = await _route_command(command, prefetch)
+            if reply is not None:
+                yield _sse({"response": reply}, event="done")
+                return
+
+            chunks = []
+            async for chunk in executeCommandStream(intent, arguments, access_token, prefetched=prefetch.claim(intent),
+                                                    draft_strategy=draft_strategy):
+                chunks.append(chunk)
+                yield _sse({"token": chunk})
+            yield _sse({"response": "".join(chunks)}, event="done")
+        finally:
+            prefetch.cancel()
+
+
+async def _emails_to_summarize(arguments: dict, access_token: str) -> tuple:
+    """(emails, hours_back, None) for gmail_summarize, or (None, hours_back, spoken reply) if there's nothing to summarize."""
+    hours_back = calculate_seconds(arguments["lookback_period_value"], arguments["lookback_period_units"])/3600 if "lookback_period_units" in arguments and "lookback_period_value" in arguments else 12
+    try:
+        emails = await get_emails_async(hours_back=hours_back, access_token=access_token)
+        logger.info(f"Retrieved {len(emails)} emails")
+    except Exception as e:
+        logger.error(f"Error retrieving unread emails: {e}", exc_info=True)
+        return None, hours_back, f"There's a problem with the Gmail server. I couldn't retrieve your emails. Please try again later."
+    if len(emails) == 0:
+        logger.info("No unread emails found")
+        return None, hours_back, f"Sorry, I couldn't find any emails from the last {arguments['lookback_period_value']} {arguments['lookback_period_units']}."
+    return emails, hours_back, None
+
+
+async def _emails_from_sender(sender_name: str, access_token: str, prefetched: asyncio.Task = None) -> tuple:
+    """(emails, None) for gmail_check_sender, or (None, spoken reply) if the check can't run."""
+    if not sender_name:
+        if prefetched is not None:
+            prefetched.cancel()
+        return None, "I didn't catch who you're looking for. Please try again."
+    try:
+        if prefetched is not None:
+            # Fetched before the sender was known; trim to what the early stop would have kept.
+            emails = collect_emails((await prefetched).items(), stop=until_sender_matches(sender_name))
+        else:
+            emails = await get_emails_async(hours_back=72, max_results=15, body_max_length=800, access_token=access_token,
+                                            stop=until_sender_matches(sender_name))
+        logger.info(f"Retrieved {len(emails)} emails for sender check")
+    except Exception as e:
+        logger.error(f"Error retrieving emails for sender check: {e}", exc_info=True)
+        return None, "There's a problem with the Gmail server. I couldn't retrieve your emails. Please try again later."
+    return emails, None
+
+
+async def executeCommandStream(intent: str, arguments: dict, access_token = ACCESS_TOKEN, prefetched: asyncio.Task = None,
+                               draft_strategy: str = None):
+    """
+    executeCommand() as an async generator of text chunks. Summaries and
+    sender checks are streamed as the model writes them; every other intent
+    yields its complete reply once.
+    """
+    if intent == "gmail_summarize":
+        emails, hours_back, reply = await _emails_to_summarize(arguments, access_token)
+        stream = prioritized_insights_stream(emails) if reply is None else None
+        event, properties = "email summarized", {"email_count": len(emails or {}), "hours_back": hours_back}
+    elif intent == "gmail_check_sender":
+        sender_name = arguments.get("sender_name", "")
+        emails, reply = await _emails_from_sender(sender_name, access_token, prefetched)
+        stream = summarize_sender_emails_stream(emails, sender_name) if reply is None else None
+        event, properties = "sender checked", None
+    else:
+        yield await executeCommand(intent, arguments, access_token, prefetched, draft_strategy)
+        return
+
+    if stream is None:
+        yield reply
+        return
+
+    started = False
+    try:
+        async for chunk in stream:
+            started = True
+            yield chunk
+        posthog_client.capture(event, properties=properties)
+    except Exception as e:
+        logger.error(f"Error streaming {intent}: {e}", exc_info=True)
+        if not started:
+            yield "Sorry, I'm having trouble reaching the server. Please try again later."
+
+
+async def executeCommand(intent: str, arguments: dict, access_token = ACCESS_TOKEN, prefetched: asyncio.Task = None,
+                         draft_strategy: str = None) -> str:
+    """
+    Runs a mapped command and returns the spoken reply.
+
+    :param prefetched: The GmailPrefetch task already fetching this intent's emails, if any
+    :param draft_strategy: "fast", "hedged" or "best-of-n" for gmail_draft; DRAFT_STRATEGY if None
+    """
     if intent == "gmail_summarize":
         logger.info("Executing gmail_summarize")
-        try:
-            hours_back = calculate_seconds(arguments["lookback_period_value"], arguments["lookback_period_units"])/3600 if "lookback_period_units" in arguments and "lookback_period_value" in arguments else 12
-            emails = get_emails(hours_back=hours_back, access_token=access_token)
-            logger.info(f"Retrieved {len(emails)} emails")
-            if len(emails) == 0:
-                logger.info("No unread emails found")
-                return f"Sorry, I couldn't find any emails from the last {arguments['lookback_period_value']} {arguments['lookback_period_units']}." 
-        
-        except Exception as e:
-            logger.error(f"Error retrieving unread emails: {e}", exc_info=True)
-            return f"There's a problem with the Gmail server. I couldn't retrieve your emails. Please try again later."
+        emails, hours_back, reply = await _emails_to_summarize(arguments, access_token)
+        if reply is not None:
+            return reply
 
         try:
-            summary = prioritized_insights(emails)
+            summary = await prioritized_insights_async(emails)
             logger.info("Email summary generated successfully")
             posthog_client.capture("email summarized", properties={"email_count": len(emails), "hours_back": hours_back})
             return summary
@@ -139,10 +402,10 @@ def executeCommand(intent: str, arguments: dict, access_token = ACCESS_TOKEN) ->
     elif intent == "gmail_draft":
         logger.info(f"Executing gmail_draft with arguments: {arguments}")
         try:
-            draft = generate_draft(arguments['recipient_name'], arguments['email_description'])
+            draft = await generate_draft_async(arguments['recipient_name'], arguments['email_description'], strategy=draft_strategy)
             logger.debug(f"Generated draft for {arguments['recipient_name']}")
 
-            success, result = upsert_draft(draft, access_token=access_token)
+            success, result = await upsert_draft_async(draft, access_token=access_token)
             if success:
                 logger.info(f"Draft created successfully: {result}")
                 posthog_client.capture("draft created")
@@ -157,17 +420,12 @@ def executeCommand(intent: str, arguments: dict, access_token = ACCESS_TOKEN) ->
     elif intent == "gmail_check_sender":
         logger.info(f"Executing gmail_check_sender with arguments: {arguments}")
         sender_name = arguments.get("sender_name", "")
-        if not sender_name:
-            return "I didn't catch who you're looking for. Please try again."
-        try:
-            emails = get_emails(hours_back=72, max_results=15, body_max_length=800, access_token=access_token)
-            logger.info(f"Retrieved {len(emails)} emails for sender check")
-        except Exception as e:
-            logger.error(f"Error retrieving emails for sender check: {e}", exc_info=True)
-            return "There's a problem with the Gmail server. I couldn't retrieve your emails. Please try again later."
+        emails, reply = await _emails_from_sender(sender_name, access_token, prefetched)
+        if reply is not None:
+            return reply
 
         try:
-            result = summarize_sender_emails(emails, sender_name)
+            result = await summarize_sender_emails_async(emails, sender_name)
             logger.info(f"Sender check completed for '{sender_name}'")
             posthog_client.capture("sender checked")
             return result
@@ -178,14 +436,14 @@ def executeCommand(intent: str, arguments: dict, access_token = ACCESS_TOKEN) ->
     elif intent == "gmail_verification_code":
         logger.info("Executing gmail_verification_code")
         try:
-            emails = get_recent_all_emails(minutes_back=10, access_token=access_token)
+            emails = await _fetch_emails(intent, access_token, prefetched)
             logger.info(f"Retrieved {len(emails)} recent emails for verification code search")
         except Exception as e:
             logger.error(f"Error retrieving recent emails: {e}", exc_info=True)
             return "There's a problem with the Gmail server. I couldn't retrieve your emails. Please try again later."
 
         try:
-            result = extract_verification_code(emails)
+            result = await extract_verification_code_async(emails)
             logger.info("Verification code extraction completed")
             posthog_client.capture("verification code found")
             return result
@@ -196,31 +454,31 @@ def executeCommand(intent: str, arguments: dict, access_token = ACCESS_TOKEN) ->
     elif intent == "gmail_reply":
         logger.info(f"Executing gmail_reply with arguments: {arguments}")
         try:
-            emails = get_unread(hours_back=72, max_results=8, access_token=access_token)
+            emails = await _fetch_emails(intent, access_token, prefetched)
             logger.info(f"Retrieved {len(emails)} recent emails for reply matching")
         except Exception as e:
             logger.error(f"Error retrieving emails for reply: {e}", exc_info=True)
             return f"There's a problem with the Gmail server. I couldn't retrieve your emails. Please try again later."
 
         try:
-            # Pass a compact version to find_reply_match — full bodies aren't needed to identify
+            # Pass a compact version to find_reply_match_async — full bodies aren't needed to identify
             # the right thread. A short snippet covers the disambiguation case where the same
             # sender has multiple emails with similar subjects.
             compact_emails = {
                 msg_id: {'from': data['from'], 'subject': data['subject'], 'snippet': data['body'][:200]}
                 for msg_id, data in emails.items()
             }
-            best_match_id = find_reply_match(compact_emails, arguments['reply_recipient_name'], arguments['email_description'])
+            best_match_id = await find_reply_match_async(compact_emails, arguments['reply_recipient_name'], arguments['email_description'])
             logger.debug(f"Found best match email ID: {best_match_id}")
 
             if best_match_id == 'none':
                 logger.info("No suitable email found for reply")
                 return "I couldn't find a matching email to reply to. Please try again."
 
-            reply = generate_reply(emails[best_match_id]['body'], arguments['reply_recipient_name'], arguments['email_description'])
+            reply = await generate_reply_async(emails[best_match_id]['body'], arguments['reply_recipient_name'], arguments['email_description'])
             logger.debug(f"Generated reply to {arguments['reply_recipient_name']}: {reply}")
 
-            success, result = upsert_reply(reply, best_match_id, rfc_id=emails[best_match_id]['rfc-id'], subject=emails[best_match_id]['subject'], to_email=emails[best_match_id]['from-email'], access_token=access_token)
+            success, result = await upsert_reply_async(reply, best_match_id, rfc_id=emails[best_match_id]['rfc-id'], subject=emails[best_match_id]['subject'], to_email=emails[best_match_id]['from-email'], access_token=access_token)
             if success:
                 logger.info(f"Reply created successfully: {result}")
                 posthog_client.capture("reply created")
@@ -238,21 +496,34 @@ def executeCommand(intent: str, arguments: dict, access_token = ACCESS_TOKEN) ->
 # Public, no auth. Uses MOCK_EMAILS instead of Gmail API so every
 # generation function works unchanged — only the data source differs.
 
-_demo_rate: dict[str, list[float]] = defaultdict(list)
-_DEMO_LIMIT = 10  # requests per IP per hour
+_DEMO_LIMIT = int(os.getenv("DEMO_RATE_LIMIT", "10"))  # requests per IP per hour
+_demo_limiter = RateLimiter("demo", _DEMO_LIMIT, window=3600)
+
+# MOCK_EMAILS only changes by its relative timestamps, so a demo answer holds
+# for a while: routes and responses are cached per DEMO_RESPONSE_BUCKET
+# seconds, and the dated inbox per minute.
+DEMO_RESPONSE_BUCKET = int(os.getenv("DEMO_RESPONSE_BUCKET", "900"))
+_demo_routes = LRUCache(maxsize=1024, ttl=DEMO_RESPONSE_BUCKET)
+_demo_responses = LRUCache(maxsize=256, ttl=DEMO_RESPONSE_BUCKET)
+_demo_inbox = (None, None)  # (minute, emails)
 
 
 class DemoChatRequest(BaseModel):
     command: str
+    draft_strategy: str | None = None
 
 
 def _demo_emails_with_dates() -> dict:
-    """Returns MOCK_EMAILS with 'date' fields computed relative to now."""
-    now = datetime.now(timezone.utc)
-    return {
-        mid: {**data, "date": format_datetime(now - data["offset"])}
-        for mid, data in MOCK_EMAILS.items()
-    }
+    """Returns MOCK_EMAILS with 'date' fields computed relative to the current minute."""
+    global _demo_inbox
+    minute, emails = _demo_inbox
+    if minute != int(time.time() // 60):
+        minute = int(time.time() // 60)
+        now = datetime.fromtimestamp(minute * 60, timezone.utc)
+        emails = {mid: {**data, "date": format_datetime(now - data["offset"])} for mid, data in MOCK_EMAILS.items()}
+        _demo_inbox = (minute, emails)
+    # Copies, so a caller changing an email can't change the next request's inbox.
+    return {mid: dict(data) for mid, data in emails.items()}
 
 
 @app.get("/demo/seed")
@@ -275,17 +546,176 @@ def demo_seed():
     }
 
 
+def _demo_admit(ip: str) -> dict | None:
+    """Counts a demo request against the per-IP hourly limit; returns the refusal once it's reached."""
+    allowed, retry_after = _demo_limiter.hit(ip)
+    if allowed:
+        return None
+    with new_context():
+        identify_context(ip)
+        posthog_client.capture("demo rate limit hit")
+    minutes = max(round(retry_after / 60), 1)
+    wait = "a minute" if minutes == 1 else f"{minutes} minutes"
+    return {"response": f"Demo limit reached — please try again in {wait}.", "mutation": None}
+
+
+def _demo_bucket() -> int:
+    return int(time.time() // DEMO_RESPONSE_BUCKET)
+
+
+async def _demo_parse(command: str) -> tuple:
+    """(intent, args) for a demo command, cached per bucket, time-dependent arguments included."""
+    key = (normalize_command(command), _demo_bucket())
+    route = _demo_routes.get(key)
+    if route is None:
+        parsed = await mapIntentWithArgumentsAsync(command)
+        route = (parsed["intent"], parsed["arguments"])
+        _demo_routes.set(key, route)
+    intent, args = route
+    return intent, dict(args)
+
+
+async def _demo_route(command: str) -> tuple:
+    """(intent, args, None) for a demo command, or (None, None, response) when it can't be handled."""
+    try:
+        intent, args = await _demo_parse(command)
+        logger.info(f"Demo intent: {intent}")
+    except Exception as e:
+        logger.error(f"Demo intent mapping failed: {e}", exc_info=True)
+        return None, None, {"response": "Sorry, I'm having trouble right now. Please try again.", "mutation": None}
+
+    posthog_client.capture("demo command used", properties={"intent": intent, "command_length": len(command)})
+
+    if intent == "none":
+        return None, None, {
+            "response": (
+                "Sorry, I couldn't understand that. "
+                "Try: 'Summarize my emails', 'Draft an email to Professor Chen', or 'What's my verification code?'"
+            ),
+            "mutation": None,
+        }
+
+    logger.info(f"Demo args: {args}")
+    return intent, args, None
+
+
+async def _demo_execute(intent: str, args: dict, draft_strategy: str = None) -> dict:
+    try:
+        live_emails = _demo_emails_with_dates()
+
+        if intent == "gmail_summarize":
+            hours_back = calculate_seconds(
+                args.get("lookback_period_value", 12),
+                args.get("lookback_period_units", "hours")
+            ) / 3600
+            filtered = _demo_filter_emails(live_emails, hours_back)
+            if not filtered:
+                return {
+                    "response": f"I didn't find any emails from the last {args.get('lookback_period_value', 12)} {args.get('lookback_period_units', 'hours')}.",
+                    "mutation": None,
+                }
+            return {"response": await prioritized_insights_async(filtered), "mutation": None}
+
+        elif intent == "gmail_check_sender":
+            sender = args.get("sender_name", "")
+            return {"response": await summarize_sender_emails_async(live_emails, sender), "mutation": None}
+
+        elif intent == "gmail_verification_code":
+            return {"response": await extract_verification_code_async(live_emails), "mutation": None}
+
+        elif intent == "gmail_draft":
+            recipient   = args.get("recipient_name", "")
+            description = args.get("email_description", "")
+            body        = await generate_draft_async(recipient, description, strategy=draft_strategy)
+            draft = {
+                "id":        f"d_{int(time.time())}",
+                "to":        recipient,
+                "subject":   _demo_infer_subject(recipient),
+                "body":      body,
+                "timestamp": "just now",
+            }
+            return {"response": "Draft created successfully.", "mutation": {"type": "draft_created", "draft": draft}}
+
+        elif intent == "gmail_reply":
+            recipient   = args.get("reply_recipient_name", "")
+            description = args.get("email_description", "")
+            compact = {
+                mid: {"from": d["from"], "subject": d["subject"], "snippet": d["snippet"]}
+                for mid, d in live_emails.items()
+            }
+            match_id = await find_reply_match_async(compact, recipient, description)
+            if match_id == "none" or match_id not in live_emails:
+                return {"response": "I couldn't find a matching email to reply to. Please try again.", "mutation": None}
+            body             = await generate_reply_async(live_emails[match_id]["body"], recipient, description)
+            original_subject = live_emails[match_id]["subject"]
+            subject          = original_subject if original_subject.startswith("Re:") else f"Re: {original_subject}"
+            draft = {
+                "id":        f"d_{int(time.time())}",
+                "to":        recipient,
+                "subject":   subject,
+                "body":      body,
+                "timestamp": "just now",
+            }
+            return {"response": "Reply draft created successfully.", "mutation": {"type": "draft_created", "draft": draft}}
+
+    except Exception as e:
+        logger.error(f"Demo execution failed for intent {intent!r}: {e}", exc_info=True)
+        return {"response": "Sorry, something went wrong. Please try again.", "mutation": None}
+
+
+    return {"response": "Sorry, I couldn't handle that command.", "mutation": None}
+
+
+def _demo_response_key(intent: str, args: dict, draft_strategy: str = None) -> tuple:
+    return (intent, json.dumps(args, sort_keys=True, default=str), draft_strategy, _demo_bucket())
+
+
+def _demo_cacheable(response: dict) -> bool:
+    # Failures all end up as apologies: the summaries return one themselves, and
+    # drafts, replies and reply matching raise into _demo_execute's. The next
+    # visitor should get a real try.
+    return not response["response"].startswith("Sorry")
+
+
+async def _demo_cached_execute(intent: str, args: dict, draft_strategy: str = None) -> dict:
+    """_demo_execute(), served from the response cache when this bucket already answered it."""
+    key = _demo_response_key(intent, args, draft_strategy)
+    response = _demo_responses.get(key)
+    if response is None:
+        response = await _demo_execute(intent, args, draft_strategy)
+        if _demo_cacheable(response):
+            _demo_responses.set(key, response)
+    return response
+
+
+def _demo_serve(intent: str, response: dict) -> dict:
+    """Records a served demo response; drafts get a fresh ID so the UI lists each one."""
+    mutation = response["mutation"]
+    if mutation is None or mutation["type"] != "draft_created":
+        return response
+    posthog_client.capture("demo draft created" if intent == "gmail_draft" else "demo reply created")
+    return {**response, "mutation": {**mutation, "draft": {**mutation["draft"], "id": f"d_{int(time.time())}"}}}
+
+
+async def _precompute_demo():
+    """Answers DEMO_SAMPLE_COMMANDS ahead of the first visitors."""
+    start = time.perf_counter()
+    for command in DEMO_SAMPLE_COMMANDS:
+        try:
+            intent, args = await _demo_parse(command)
+            if intent != "none":
+                await _demo_cached_execute(intent, args)
+        except Exception as e:
+            logger.warning(f"Demo precompute failed for {command!r}: {e}")
+    logger.info(f"Precomputed {len(DEMO_SAMPLE_COMMANDS)} demo commands in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
 @app.post("/demo/chat")
-def demo_chat(req: DemoChatRequest, request: Request):
-    ip  = request.client.host
-    now = time.time()
-    _demo_rate[ip] = [t for t in _demo_rate[ip] if now - t < 3600]
-    if len(_demo_rate[ip]) >= _DEMO_LIMIT:
-        with new_context():
-            identify_context(ip)
-            posthog_client.capture("demo rate limit hit")
-        return {"response": "Demo limit reached — please try again in an hour.", "mutation": None}
-    _demo_rate[ip].append(now)
+async def demo_chat(req: DemoChatRequest, request: Request):
+    ip = request.client.host
+    refusal = _demo_admit(ip)
+    if refusal is not None:
+        return refusal
 
     command = req.command.strip()
     if not command:
@@ -293,105 +723,80 @@ def demo_chat(req: DemoChatRequest, request: Request):
 
     with new_context():
         identify_context(ip)
+        intent, args, reply = await _demo_route(command)
+        if reply is not None:
+            return reply
+        return _demo_serve(intent, await _demo_cached_execute(intent, args, req.draft_strategy))
+
+
+@app.post("/demo/chat/stream")
+async def demo_chat_stream(req: DemoChatRequest, request: Request):
+    """
+    Streaming /demo/chat: `data: {"token": ...}` events while a summary is
+    generated, then `event: done` with the same {"response", "mutation"}
+    body /demo/chat returns.
+    """
+    return StreamingResponse(_demo_stream(req.command.strip(), request.client.host, req.draft_strategy),
+                             media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+async def _demo_stream(command: str, ip: str, draft_strategy: str = None):
+    refusal = _demo_admit(ip)
+    if refusal is not None:
+        yield _sse(refusal, event="done")
+        return
+    if not command:
+        yield _sse({"response": "Please type a command to try.", "mutation": None}, event="done")
+        return
 
+    with new_context():
+        identify_context(ip)
+        intent, args, reply = await _demo_route(command)
+        if reply is not None:
+            yield _sse(reply, event="done")
+            return
+
+        key = _demo_response_key(intent, args, draft_strategy)
+        cached = _demo_responses.get(key)
+        if cached is not None:
+            yield _sse(_demo_serve(intent, cached), event="done")
+            return
+
+        stream = None
+        live_emails = _demo_emails_with_dates()
+        if intent == "gmail_summarize":
+            filtered = _demo_filter_emails(live_emails, calculate_seconds(
+                args.get("lookback_period_value", 12), args.get("lookback_period_units", "hours")) / 3600)
+            if filtered:
+                stream = prioritized_insights_stream(filtered)
+        elif intent == "gmail_check_sender":
+            stream = summarize_sender_emails_stream(live_emails, args.get("sender_name", ""))
+
+        if stream is None:
+            yield _sse(_demo_serve(intent, await _demo_cached_execute(intent, args, draft_strategy)), event="done")
+            return
+
+        chunks, finished = [], False
         try:
-            intent = mapIntent(command)
-            logger.info(f"Demo intent: {intent}")
-        except Exception as e:
-            logger.error(f"Demo intent mapping failed: {e}", exc_info=True)
-            return {"response": "Sorry, I'm having trouble right now. Please try again.", "mutation": None}
-
-        posthog_client.capture("demo command used", properties={"intent": intent, "command_length": len(command)})
-
-        if intent == "none":
-            return {
-                "response": (
-                    "Sorry, I couldn't understand that. "
-                    "Try: 'Summarize my emails', 'Draft an email to Professor Chen', or 'What's my verification code?'"
-                ),
-                "mutation": None,
-            }
-
-        try:
-            args = parseArguments(command, intent) if intent in intent_arguments else {}
-            logger.info(f"Demo args: {args}")
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield _sse({"token": chunk})
+            finished = True
         except Exception as e:
-            logger.error(f"Demo argument parsing failed: {e}", exc_info=True)
-            return {"response": "I had trouble parsing that request. Please try again.", "mutation": None}
-
-        try:
-            live_emails = _demo_emails_with_dates()
-
-            if intent == "gmail_summarize":
-                hours_back = calculate_seconds(
-                    args.get("lookback_period_value", 12),
-                    args.get("lookback_period_units", "hours")
-                ) / 3600
-                filtered = _demo_filter_emails(live_emails, hours_back)
-                if not filtered:
-                    return {
-                        "response": f"I didn't find any emails from the last {args.get('lookback_period_value', 12)} {args.get('lookback_period_units', 'hours')}.",
-                        "mutation": None,
-                    }
-                return {"response": prioritized_insights(filtered), "mutation": None}
-
-            elif intent == "gmail_check_sender":
-                sender = args.get("sender_name", "")
-                return {"response": summarize_sender_emails(live_emails, sender), "mutation": None}
-
-            elif intent == "gmail_verification_code":
-                return {"response": extract_verification_code(live_emails), "mutation": None}
-
-            elif intent == "gmail_draft":
-                recipient   = args.get("recipient_name", "")
-                description = args.get("email_description", "")
-                body        = generate_draft(recipient, description)
-                draft = {
-                    "id":        f"d_{int(time.time())}",
-                    "to":        recipient,
-                    "subject":   _demo_infer_subject(recipient),
-                    "body":      body,
-                    "timestamp": "just now",
-                }
-                posthog_client.capture("demo draft created")
-                return {"response": "Draft created successfully.", "mutation": {"type": "draft_created", "draft": draft}}
-
-            elif intent == "gmail_reply":
-                recipient   = args.get("reply_recipient_name", "")
-                description = args.get("email_description", "")
-                compact = {
-                    mid: {"from": d["from"], "subject": d["subject"], "snippet": d["snippet"]}
-                    for mid, d in live_emails.items()
-                }
-                match_id = find_reply_match(compact, recipient, description)
-                if match_id == "none" or match_id not in live_emails:
-                    return {"response": "I couldn't find a matching email to reply to. Please try again.", "mutation": None}
-                body             = generate_reply(live_emails[match_id]["body"], recipient, description)
-                original_subject = live_emails[match_id]["subject"]
-                subject          = original_subject if original_subject.startswith("Re:") else f"Re: {original_subject}"
-                draft = {
-                    "id":        f"d_{int(time.time())}",
-                    "to":        recipient,
-                    "subject":   subject,
-                    "body":      body,
-                    "timestamp": "just now",
-                }
-                posthog_client.capture("demo reply created")
-                return {"response": "Reply draft created successfully.", "mutation": {"type": "draft_created", "draft": draft}}
-
-        except Exception as e:
-            logger.error(f"Demo execution failed for intent {intent!r}: {e}", exc_info=True)
-            return {"response": "Sorry, something went wrong. Please try again.", "mutation": None}
-
-    return {"response": "Sorry, I couldn't handle that command.", "mutation": None}
+            logger.error(f"Demo streaming failed for intent {intent!r}: {e}", exc_info=True)
+            if not chunks:
+                chunks = ["Sorry, something went wrong. Please try again."]
+        response = {"response": "".join(chunks), "mutation": None}
+        # A stream cut off partway still sends what arrived, but only once.
+        if finished and _demo_cacheable(response):
+            _demo_responses.set(key, response)
+        yield _sse(response, event="done")
 
 
 def _demo_filter_emails(emails: dict, hours_back: float) -> dict:
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours_back)
-    return {
-        mid: data for mid, data in emails.items()
-        if parsedate_to_datetime(data["date"]) >= cutoff
-    }
+    # Every date is now minus its offset, so the offset decides without parsing the date back.
+    cutoff = timedelta(hours=hours_back)
+    return {mid: data for mid, data in emails.items() if data["offset"] <= cutoff}
 
 
 def _demo_infer_subject(recipient_name: str) -> str:
@@ -437,4 +842,4 @@ def _demo_infer_subject(recipient_name: str) -> str:
 #print(executeCommand("gmail_summarize", {"lookback_period_units": "hours", "lookback_period_value": 48}))
 
 """ Extract Verification Code """
-print(executeCommand("gmail_verification_code", {}))       
\ No newline at end of file
+#print(asyncio.run(executeCommand("gmail_verification_code", {})))       
\ No newline at end of file
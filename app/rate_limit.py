@@ -0,0 +1,147 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Redis URL shared by every worker. Unset, each process keeps its own counts
+# and N uvicorn workers together allow N times the limit.
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# Keys tracked per process before the least recently seen are forgotten.
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+def _estimate(previous: int, current: int, elapsed: float) -> float:
+    """Sliding-window count: the previous window weighted by how much of it still overlaps the last `window` seconds."""
+    return previous * (1 - elapsed) + current
+
+
+def _retry_after(previous: int, current: int, limit: int, elapsed: float, window: float) -> float:
+    """Seconds until one more request fits, given the counts that refused it."""
+    if current < limit and previous:
+        # The previous window's share decays within this window.
+        needed = 1 - (limit - current - 1) / previous
+        return max(needed - elapsed, 0.0) * window
+    # Only once this window becomes the previous one, and decays in turn.
+    needed = 1 - (limit - 1) / current if current else 0.0
+    return (1 - elapsed) * window + max(needed, 0.0) * window
+
+
+class MemoryBackend:
+    """
+    Per-process sliding-window counters. Each key holds two counts, so a hit
+    is O(1) however busy the key is. Keys idle for two windows carry no state
+    and are evicted as other keys are hit; past `max_keys` the least recently
+    seen key is dropped.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()  # key -> [window index, previous count, current count, last seen]
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float, window: float) -> None:
+        while self._counters:
+            key, counter = next(iter(self._counters.items()))
+            if len(self._counters) <= self.max_keys and now - counter[3] < 2 * window:
+                break
+            del self._counters[key]
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> tuple:
+        index, elapsed = divmod(now / window, 1)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < index - 1:
+                counter = [index, 0, 0, now]
+            elif counter[0] == index - 1:
+                counter = [index, counter[2], 0, now]
+            counter[3] = now
+            self._counters[key] = counter
+            self._counters.move_to_end(key)
+            self._evict(now, window)
+
+            _, previous, current, _ = counter
+            if _estimate(previous, current + 1, elapsed) > limit:
+                return False, _retry_after(previous, current, limit, elapsed, window)
+            counter[2] += 1
+            return True, 0.0
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+class StoreBackend:
+    """
+    Sliding-window counters in a shared store, so every worker counts against
+    the same limit. `client` needs Redis's get/incr/decr/expire; keys expire
+    on their own two windows after they were last counted.
+
+    If the store can't be reached the request is admitted: the limiter
+    protects capacity, and failing closed would take the endpoint down with
+    the store.
+    """
+
+    def __init__(self, client, prefix: str = "rate"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key: str, limit: int, window: float, now: float) -> tuple:
+        index, elapsed = divmod(now / window, 1)
+        current_key = f"{self.prefix}:{key}:{int(index)}"
+        try:
+            # Count first, then check, so concurrent workers can't both take the last slot.
+            current = int(self.client.incr(current_key))
+            if current == 1:
+                self.client.expire(current_key, int(2 * window) + 1)
+            previous = int(self.client.get(f"{self.prefix}:{key}:{int(index) - 1}") or 0)
+            if _estimate(previous, current, elapsed) > limit:
+                self.client.decr(current_key)
+                return False, _retry_after(previous, current - 1, limit, elapsed, window)
+            return True, 0.0
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, admitting {key}: {e}")
+            return True, 0.0
+
+
+def default_backend():
+    """StoreBackend on RATE_LIMIT_REDIS_URL if it's set and redis is installed, else a MemoryBackend."""
+    if not RATE_LIMIT_REDIS_URL:
+        return MemoryBackend()
+    # Optional dependency: only deployments with several workers need it, and
+    # limiters are built at import, so a missing package must not stop the app.
+    try:
+        import redis
+    except ImportError:
+        logger.warning("RATE_LIMIT_REDIS_URL is set but redis isn't installed; rate limits are per process")
+        return MemoryBackend()
+    return StoreBackend(redis.Redis.from_url(RATE_LIMIT_REDIS_URL))
+
+
+class RateLimiter:
+    """
+    At most `limit` requests per key in any `window` seconds, estimated with
+    a sliding window counter (the current fixed window plus the overlapping
+    share of the previous one).
+    """
+
+    def __init__(self, name: str, limit: int, window: float, backend=None):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.backend = backend if backend is not None else default_backend()
+
+    def hit(self, key: str) -> tuple:
+        """
+        Counts a request for `key` if it's under the limit.
+
+        :param key: Who the request is from (an IP, a hashed token)
+        :type key: str
+        :return: (allowed, seconds until the next request would be allowed; 0.0 if allowed)
+        :rtype: tuple
+        """
+        return self.backend.hit(f"{self.name}:{key}", self.limit, self.window, time.time())
@@ -0,0 +1,135 @@
+import re
+import functools
+import email.utils
+from difflib import SequenceMatcher
+
+# Filler around a spoken sender name ("any emails from the financial aid office").
+QUERY_STOPWORDS = {"my", "the", "a", "an", "from", "of", "and", "any", "email", "emails", "mail", "message", "messages"}
+# Titles the user says but the From header often leaves out ("Professor Chen" vs "David Chen").
+HONORIFICS = {"professor", "prof", "dr", "doctor", "mr", "mrs", "ms", "miss", "dean", "coach"}
+# Header tokens that match half the inbox and say nothing about who sent it.
+SENDER_STOPWORDS = {"com", "edu", "org", "net", "gov", "io", "co", "uk", "www", "mail", "email", "gmail", "yahoo",
+                    "outlook", "hotmail", "icloud", "the", "of", "and", "no", "reply", "noreply", "info"}
+# Who someone is to the user rather than their name. These can't be matched
+# against a From header locally, so a miss goes to the LLM instead of "no email".
+DESCRIPTIVE = {"advisor", "adviser", "teacher", "instructor", "ta", "tutor", "boss", "manager", "supervisor",
+               "landlord", "roommate", "mom", "mother", "dad", "father", "sister", "brother", "grandma", "grandpa",
+               "aunt", "uncle", "wife", "husband", "girlfriend", "boyfriend", "friend", "doctor", "dentist",
+               "school", "university", "college", "department", "office", "bank", "work", "job", "team", "club"}
+
+# A query token is a clear hit when its best similarity to a header token reaches this.
+TOKEN_MATCH = 0.8
+# A sender matches when the query tokens' average best similarity reaches this.
+SENDER_MATCH = 0.6
+# Matches scoring further than this below the best one are dropped.
+SCORE_MARGIN = 0.15
+
+_WORD = re.compile(r"[a-z]+")
+
+# Spelling rules applied before soundex so a word's first sound, not its first
+# letter, leads the key ("Christine"/"Kristen", "Chen" apart from "Kim").
+_SPELLING = [(re.compile(pattern), repl) for pattern, repl in (
+    (r"^kn", "n"), (r"^wr", "r"), (r"^ps", "s"), (r"^chr", "kr"), (r"^ch", "x"), (r"^sch", "x"), (r"^sh", "x"),
+    (r"ph", "f"), (r"^c(?=[eiy])", "s"), (r"^[cq]", "k"), (r"^z", "s"),
+)]
+_SOUNDEX = {c: d for letters, d in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6"))
+            for c in letters}
+
+
+@functools.lru_cache(maxsize=4096)
+def soundex(word: str) -> str:
+    """Soundex key of a lowercase word (first sound, then up to three consonant classes)."""
+    for pattern, repl in _SPELLING:
+        word = pattern.sub(repl, word)
+    key, last = [], _SOUNDEX.get(word[:1])
+    for c in word[1:]:
+        digit = _SOUNDEX.get(c)
+        if digit is not None and digit != last:
+            key.append(digit)
+        if c not in "hw":
+            last = digit
+    return word[:1] + "".join(key[:3])
+
+
+def query_tokens(sender_name: str) -> list:
+    words = [w for w in _WORD.findall(sender_name.lower()) if w not in QUERY_STOPWORDS]
+    names = [w for w in words if w not in HONORIFICS]
+    return names or words
+
+
+@functools.lru_cache(maxsize=4096)
+def sender_tokens(from_header: str) -> frozenset:
+    """Words of a From header's display name and address (local part split on dots and dashes, plus the domain)."""
+    name, address = email.utils.parseaddr(from_header)
+    return frozenset(w for w in _WORD.findall(f"{name} {address}".lower()) if w not in SENDER_STOPWORDS)
+
+
+@functools.lru_cache(maxsize=65536)
+def token_similarity(a: str, b: str) -> float:
+    """1.0 for equal words, 0.9 for a prefix ("kim", "kimberly"), 0.85 for a phonetic match, else edit similarity."""
+    if a == b:
+        return 1.0
+    if min(len(a), len(b)) >= 3 and (a.startswith(b) or b.startswith(a)):
+        return 0.9
+    ratio = SequenceMatcher(None, a, b).ratio()
+    if min(len(a), len(b)) >= 3 and soundex(a) == soundex(b):
+        return max(ratio, 0.85)
+    return ratio
+
+
+def _best_similarities(tokens: list, from_header: str) -> list:
+    candidates = sender_tokens(from_header)
+    if not candidates:
+        return []
+    return [max(token_similarity(t, c) for c in candidates) for t in tokens]
+
+
+def sender_score(tokens: list, from_header: str) -> float:
+    """
+    How well a From header matches query_tokens(): the mean of each query
+    token's best similarity to a header word, or 0.0 unless at least one of
+    them is a clear hit.
+
+    :param tokens: query_tokens() of the name the user said
+    :type tokens: list
+    :param from_header: The email's From header
+    :type from_header: str
+    :rtype: float
+    """
+    best = _best_similarities(tokens, from_header)
+    if not best or max(best) < TOKEN_MATCH:
+        return 0.0
+    return sum(best) / len(best)
+
+
+def tokens_match(tokens: list, from_header: str) -> bool:
+    # A wrong surname ("Connor Smith") still finds Connor Walsh.
+    return sender_score(tokens, from_header) >= SENDER_MATCH
+
+
+def sender_matches(sender_name: str, from_header: str) -> bool:
+    return tokens_match(query_tokens(sender_name), from_header)
+
+
+def match_sender(sender_name: str, emails: dict) -> dict | None:
+    """
+    The emails whose sender fuzzily matches the name the user said. When
+    several senders match, only those scoring close to the best are kept, so
+    "Megan" finds Megan Lee and not also a sound-alike.
+
+    :param sender_name: The sender as transcribed (may be partial or misspelled)
+    :type sender_name: str
+    :param emails: Emails keyed by message ID, each with a 'from' header
+    :type emails: dict
+    :return: Matching emails, {} if none match, or None if nothing matched and
+        the name describes a relationship ("my advisor") the LLM should resolve
+    :rtype: dict | None
+    """
+    tokens = query_tokens(sender_name)
+    scores = {msg_id: sender_score(tokens, data.get('from', '')) for msg_id, data in emails.items()}
+    best = max(scores.values(), default=0.0)
+    if best < SENDER_MATCH:
+        if not tokens or DESCRIPTIVE & set(tokens) or set(tokens) <= HONORIFICS:
+            return None
+        return {}
+    return {msg_id: data for msg_id, data in emails.items() if scores[msg_id] >= max(SENDER_MATCH, best - SCORE_MARGIN)}
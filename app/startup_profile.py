@@ -0,0 +1,81 @@
+"""
+Import-time profile of the app's cold start.
+
+Runs `import app.main` in a fresh interpreter with `-X importtime` and reports
+the cost per top-level package, so a new eager import shows up before it
+reaches the dyno. Run from the repo root:
+
+    python -m app.startup_profile [module] [--top N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+# Heavy dependencies that must stay lazily imported: each is loaded on the
+# first request that needs it, not while the dyno is booting.
+LAZY_MODULES = ("matplotlib", "numpy", "googleapiclient", "httpx", "posthog", "bs4")
+
+# Wall-clock budget for `import app.main` in a fresh interpreter.
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1000"))
+
+
+def _run(code: str, *flags) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True, text=True, check=True, cwd=os.getcwd(),
+    )
+
+
+def measure_import(module: str = "app.main", runs: int = 3) -> float:
+    """Best-of-`runs` wall time in ms to import `module` in a fresh interpreter."""
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    return min(float(_run(code).stdout.strip().splitlines()[-1]) for _ in range(runs))
+
+
+def loaded_modules(module: str = "app.main") -> set:
+    """Top-level packages in sys.modules right after importing `module`."""
+    code = f"import sys\nimport {module}\nprint(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})))\n"
+    return set(_run(code).stdout.split())
+
+
+def import_profile(module: str = "app.main") -> dict:
+    """{top-level package: self time in ms} from `python -X importtime`."""
+    costs = defaultdict(float)
+    for line in _run(f"import {module}", "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        costs[name.strip().split(".")[0]] += int(self_us) / 1000
+    return dict(costs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    costs = import_profile(args.module)
+    total = sum(costs.values())
+    print(f"{'package':<28} | {'self (ms)':>9} | {'share':>6}")
+    for name, cost in sorted(costs.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<28} | {cost:>9.1f} | {cost / total:>6.1%}")
+    print(f"{'total (importtime)':<28} | {total:>9.1f}")
+
+    wall = measure_import(args.module)
+    status = "within" if wall <= STARTUP_IMPORT_BUDGET_MS else "OVER"
+    print(f"\nimport {args.module}: {wall:.0f} ms wall, {status} the {STARTUP_IMPORT_BUDGET_MS:.0f} ms budget")
+    eager = sorted(set(LAZY_MODULES) & loaded_modules(args.module))
+    if eager:
+        print(f"Eagerly imported heavy modules: {', '.join(eager)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import hashlib
+
+
 def calculate_seconds(value, unit):
     try:
         val = int(value)
@@ -8,4 +11,9 @@ def calculate_seconds(value, unit):
         }
         return val * multipliers.get(unit.lower(), 3600)
     except (ValueError, TypeError):
-        return 86400
\ No newline at end of file
+        return 86400
+
+
+def hash_token(access_token: str) -> str:
+    """Stable, non-reversible user key derived from an OAuth access token."""
+    return hashlib.sha256(access_token.encode()).hexdigest()[:16]
@@ -0,0 +1,140 @@
+import re
+import email.utils
+
+# Words that sit next to a one-time code in practically every OTP email.
+# Broad enough to find the emails worth scanning; on their own, "confirm",
+# "security" or "pin" also label order numbers, addresses and card endings.
+CODE_KEYWORDS = re.compile(
+    r"\b(?:verification|verify|confirmation|confirm|security|authentication|login|log-in|sign-in|"
+    r"one[- ]time|passcode|password|otp|2fa|pin|code)\b",
+    re.IGNORECASE,
+)
+# A candidate is only answered locally with one of these next to it.
+OTP_KEYWORDS = re.compile(r"\b(?:code|otp|passcode|verification|one[- ]time)\b", re.IGNORECASE)
+
+# 4-8 digit codes, optionally split by a space or hyphen ("847 291", "847-291"),
+# and 6-8 character uppercase alphanumerics with at least one digit ("G7K2QX").
+# A "G-" style service prefix is allowed and dropped.
+CODE_CANDIDATE = re.compile(
+    r"(?<![\w$#.,/:@-])(?:[A-Z]-)?"
+    r"(?P<code>\d{3,4}[ -]\d{3,4}|\d{4,8}|(?=[A-Z0-9]*\d)(?=[A-Z0-9]*[A-Z])[A-Z0-9]{6,8})"
+    r"(?![\w%:/@]|[.,]\d)"
+)
+
+# Numbers that look like codes but aren't. Prices, times and decimals are
+# already excluded by the candidate pattern's lookarounds; this catches
+# order/account/phone numbers, card endings and addresses by the label in
+# front of them.
+NOT_A_CODE = re.compile(
+    r"(?:(?:order|invoice|account|acct|ticket|case|ref(?:erence)?|tracking|phone|call|text|ending(?: in)?|room|"
+    r"suite|zip(?: code)?|postal code|address|flight|booking)\W{0,3}(?:number|no|#)?"
+    r"|confirmation\W{0,3}(?:number|no|#))\W{0,3}$",
+    re.IGNORECASE,
+)
+# Marketing codes share the word "code" with OTPs ("Your discount code:
+# 482913"). Any of these near a candidate leaves it to the LLM.
+PROMO = re.compile(
+    r"\b(?:discount|promo(?:tion(?:al)?)?|coupon|voucher|offer|deal|sale|savings?|gift card|reward|referral)\b|%\s*off\b",
+    re.IGNORECASE,
+)
+YEAR = re.compile(r"(?:19|20)\d{2}")
+
+KEYWORD_WINDOW = 40   # characters around a candidate searched for a keyword
+BODY_HEAD = 300       # codes almost always appear in the first lines of the body
+
+# A candidate needs a nearby keyword plus more signals (subject line, top of
+# body, all-digit shape) to be trusted without the LLM.
+HIGH_CONFIDENCE = 5
+
+
+def _score(text: str, match: re.Match, in_subject: bool) -> int:
+    code = match.group("code")
+    before = text[max(0, match.start() - KEYWORD_WINDOW):match.start()]
+    after = text[match.end():match.end() + KEYWORD_WINDOW]
+
+    if NOT_A_CODE.search(before) or (len(code) == 4 and YEAR.fullmatch(code)):
+        return 0
+    if PROMO.search(before) or PROMO.search(after):
+        return 0
+    if not OTP_KEYWORDS.search(before) and not OTP_KEYWORDS.search(after):
+        return 0
+
+    score = 0
+    if CODE_KEYWORDS.search(before):
+        score += 3
+    elif CODE_KEYWORDS.search(after):
+        score += 2
+    if in_subject:
+        score += 2
+    elif match.start() < BODY_HEAD:
+        score += 1
+    if code.replace(" ", "").replace("-", "").isdigit():
+        score += 1
+    return score
+
+
+def _sender_name(from_header: str) -> str:
+    name, address = email.utils.parseaddr(from_header)
+    name = name.strip().strip('"')
+    if name:
+        return name
+    domain = address.rpartition("@")[2].split(".")
+    return domain[-2].capitalize() if len(domain) >= 2 else "your email"
+
+
+def _email_codes(email_data: dict) -> dict:
+    """High-confidence codes in one email as {code: score}."""
+    subject = email_data.get("subject") or ""
+    body = email_data.get("body") or ""
+    if not CODE_KEYWORDS.search(subject) and not CODE_KEYWORDS.search(body[:BODY_HEAD * 2]):
+        return {}
+    codes = {}
+    for text, in_subject in ((subject, True), (body, False)):
+        for match in CODE_CANDIDATE.finditer(text):
+            score = _score(text, match, in_subject)
+            if score < HIGH_CONFIDENCE:
+                continue
+            code = re.sub(r"[ -]", "", match.group("code"))
+            codes[code] = max(score, codes.get(code, 0))
+    return codes
+
+
+def has_verification_code(email_data: dict) -> bool:
+    """
+    True if the email holds a high-confidence code. Used as the early-stop
+    test when streaming emails newest first: once the newest OTP email is in
+    hand, older mail can't change the answer the user wants.
+    """
+    return bool(_email_codes(email_data))
+
+
+def find_verification_code(emails: dict) -> dict | None:
+    """
+    Looks for exactly one high-confidence one-time code across the emails.
+
+    :param emails: Emails from get_recent_all_emails(), keyed by message ID (from, subject, body)
+    :type emails: dict
+    :return: {"code", "sender", "score"} when a single code clearly stands out, else None
+    :rtype: dict | None
+    """
+    best = {}
+    for email_data in emails.values():
+        for code, score in _email_codes(email_data).items():
+            current = best.get(code)
+            if current is None or score > current["score"]:
+                best[code] = {
+                    "code": code,
+                    "sender": _sender_name(email_data.get("from", "")),
+                    "score": score,
+                }
+
+    # Several distinct codes (two services, or a code next to a reference
+    # number) are left to the LLM, which can weigh recency and context.
+    if len(best) != 1:
+        return None
+    return next(iter(best.values()))
+
+
+def spoken_code(code: str, sender: str) -> str:
+    """Voice-ready sentence with one character per word so Alexa reads them individually."""
+    return f"Your verification code from {sender} is {' '.join(code)}."
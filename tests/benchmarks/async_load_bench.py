@@ -0,0 +1,138 @@
+"""
+Throughput of /gmail/{command} under concurrent load: the old sync handler
+(run on Starlette's 40-thread pool, like any `def` endpoint) versus the
+async handler, against local stand-ins for Groq and Gmail. The sync path
+talks HTTP/1.1 to Groq through the requests pool; the async path talks
+HTTP/2 through httpx, as each does against the real API.
+
+Every request is "Summarize my emails from the last 12 hours", which costs
+one Groq call for the arguments, one Gmail list + batch fetch, and one Groq
+call for the summary.
+
+Run from the repo root:
+    python -m tests.benchmarks.async_load_bench
+"""
+import json
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import anyio
+
+from googleapiclient.discovery_cache import get_static_doc
+
+from app import gmail_client, groq_client, main
+from app.gmail_services import get_emails
+from app.generation_layer import prioritized_insights
+from app.intent_reasoning import mapIntentWithArguments
+from tests.benchmarks.fake_gmail import FakeGmailServer, make_message
+from tests.benchmarks.fake_groq import FakeGroqH2Server, FakeGroqServer
+
+COMMAND = "Summarize my emails from the last 12 hours"
+CONCURRENCY = [50, 200, 500]
+GROQ_LATENCY = 0.25   # seconds per completion
+GMAIL_LATENCY = 0.04  # seconds per Gmail round trip
+STARLETTE_THREADS = 40
+USERS = 20            # distinct access tokens, so Gmail clients are reused like in production
+
+
+def respond(payload: dict) -> str:
+    if payload.get("response_format", {}).get("type") == "json_object":
+        arguments = {"lookback_period_value": 12, "lookback_period_units": "hours"}
+        return json.dumps({"intent": "gmail_summarize", "arguments": arguments, **arguments})
+    return "You have five new emails. Connor asked about lunch on Friday."
+
+
+def legacy_handler(command: str, access_token: str) -> str:
+    """The pre-async request path: every call blocks its worker thread."""
+    parsed = mapIntentWithArguments(command)
+    hours_back = int(parsed["arguments"]["lookback_period_value"])
+    return prioritized_insights(get_emails(hours_back=hours_back, access_token=access_token))
+
+
+async def run_sync(concurrency: int) -> list:
+    limiter = anyio.CapacityLimiter(STARLETTE_THREADS)
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        await anyio.to_thread.run_sync(legacy_handler, COMMAND, f"token-{i % USERS}", limiter=limiter)
+        latencies.append(time.perf_counter() - start)
+
+    async with anyio.create_task_group() as tg:
+        for i in range(concurrency):
+            tg.start_soon(one, i)
+    return latencies
+
+
+async def run_async(concurrency: int) -> list:
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        await main.read_root(COMMAND, authorization=f"Bearer token-{i % USERS}")
+        latencies.append(time.perf_counter() - start)
+
+    async with anyio.create_task_group() as tg:
+        for i in range(concurrency):
+            tg.start_soon(one, i)
+    await groq_client.aclose()
+    return latencies
+
+
+def _serve(factory, conn):
+    with factory() as server:
+        conn.send((server.url if hasattr(server, "url") else server.root_url, getattr(server, "cert_file", None)))
+        conn.recv()
+
+
+@contextmanager
+def in_subprocess(factory):
+    """
+    Runs a stand-in server in its own process. In-process, hundreds of
+    server threads compete with the event loop for the GIL and the numbers
+    measure that contention instead of the handlers.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.get_context("fork").Process(target=_serve, args=(factory, child), daemon=True)
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        parent.send("stop")
+        process.join()
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main_bench():
+    mailbox = [make_message(i, f"Body of message {i}. " * 20, minutes_ago=30 + i) for i in range(5)]
+    discovery = json.loads(get_static_doc("gmail", "v1"))
+    with in_subprocess(lambda: FakeGroqServer(responder=respond, latency=GROQ_LATENCY, tls=True)) as (groq_h1_url, h1_cert), \
+            in_subprocess(lambda: FakeGroqH2Server(responder=respond, latency=GROQ_LATENCY)) as (groq_h2_url, h2_cert), \
+            in_subprocess(lambda: FakeGmailServer(mailbox, latency=GMAIL_LATENCY)) as (gmail_root, _), \
+            mock.patch.object(gmail_client, "GMAIL_DISCOVERY_DOC", {**discovery, "rootUrl": gmail_root}), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        # Trust the stand-ins' self-signed certificates (requests and httpx both read these).
+        os.environ["REQUESTS_CA_BUNDLE"] = h1_cert
+        os.environ["SSL_CERT_FILE"] = h2_cert
+        runners = (("sync", run_sync, groq_h1_url), ("async", run_async, groq_h2_url))
+        print(f"Groq latency {GROQ_LATENCY * 1000:.0f} ms, Gmail round trip {GMAIL_LATENCY * 1000:.0f} ms")
+        print(f"{'handler':>8} | {'requests':>8} | {'wall (s)':>8} | {'req/s':>7} | {'p50 (ms)':>8} | {'p95 (ms)':>8}")
+        for concurrency in CONCURRENCY:
+            for name, runner, groq_url in runners:
+                start = time.perf_counter()
+                with mock.patch.object(groq_client, "GROQ_API_URL", groq_url):
+                    latencies = anyio.run(runner, concurrency)
+                wall = time.perf_counter() - start
+                print(f"{name:>8} | {concurrency:>8} | {wall:>8.2f} | {concurrency / wall:>7.1f} | "
+                      f"{percentile(latencies, 0.5) * 1000:>8.0f} | {percentile(latencies, 0.95) * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main_bench()
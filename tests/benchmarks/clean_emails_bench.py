@@ -0,0 +1,73 @@
+"""
+Throughput of clean_emails() (emails/s and MB/s) against the pre-rewrite
+regex cleaner, on synthetic and real-world-shaped bodies, at the body
+limits the app uses (2000 for summaries, 800 for sender checks, 500 for
+verification codes).
+
+Run from the repo root:
+    python -m tests.benchmarks.clean_emails_bench
+"""
+import glob
+import random
+import string
+import time
+
+from app.demo_data import MOCK_EMAILS
+from app.gmail_helpers import clean_emails
+from tests.clean_emails_test import legacy_clean_emails
+
+MIN_SECONDS = 0.5
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(count))
+
+
+def corpora() -> dict:
+    rng = random.Random(15)
+    personal = [data["body"] for data in MOCK_EMAILS.values()]
+    mock_batches = []
+    for path in sorted(glob.glob("tests/mock_data/*.txt")):
+        with open(path) as f:
+            mock_batches.append(f.read())
+    newsletter = "\n".join(
+        f"{_words(rng, 40)} https://news.example.com/t/{rng.getrandbits(64):x} {_words(rng, 30)}\n"
+        for _ in range(250)
+    )
+    newsletter_unicode = newsletter.replace(" the ", " — ").replace("\n", " ’ \U0001F4E3\n")
+    thread = _words(rng, 60) + "\n\n" + "\n".join(
+        f"On Mon, Mar {i}, 2026 at 9:{i:02d} AM Person {i} <p{i}@example.com> wrote:\n> " + _words(rng, 120)
+        for i in range(1, 25)
+    )
+    return {
+        "personal (demo inbox)": personal,
+        "forwarded (mock_data)": mock_batches,
+        "newsletter 100KB": [newsletter[:100_000]],
+        "newsletter 100KB, non-ASCII": [newsletter_unicode[:100_000]],
+        "reply thread 20KB": [thread[:20_000]],
+    }
+
+
+def throughput(fn, bodies: list, max_length: int) -> tuple:
+    size = sum(len(body.encode("utf-8")) for body in bodies)
+    runs, start = 0, time.perf_counter()
+    while True:
+        for body in bodies:
+            fn(body, max_length=max_length)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return runs * len(bodies) / elapsed, runs * size / elapsed / 1e6
+
+
+def main():
+    print(f"{'corpus':>28} | {'limit':>5} | {'legacy emails/s':>15} | {'legacy MB/s':>11} | {'emails/s':>9} | {'MB/s':>7} | {'speedup':>7}")
+    for name, bodies in corpora().items():
+        for max_length in (2000, 800, 500):
+            old_rate, old_mb = throughput(legacy_clean_emails, bodies, max_length)
+            new_rate, new_mb = throughput(clean_emails, bodies, max_length)
+            print(f"{name:>28} | {max_length:>5} | {old_rate:>15.0f} | {old_mb:>11.1f} | {new_rate:>9.0f} | {new_mb:>7.1f} | {new_rate / old_rate:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
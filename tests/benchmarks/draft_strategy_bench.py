@@ -0,0 +1,88 @@
+"""
+Latency of generate_draft_async under each DRAFT_STRATEGY against a local
+HTTP/2 Groq stand-in whose completion times are drawn from a lognormal
+distribution: most calls near the median, with a long tail like a shared
+inference endpoint under load. A few drafts break the prompt's rules
+("[Your Name]"), which the hedged strategy treats as a failed attempt.
+
+Reports p50/p95 per draft and completions per draft, i.e. what each
+strategy costs in model calls.
+
+Run from the repo root:
+    python -m tests.benchmarks.draft_strategy_bench
+"""
+import math
+import os
+import random
+import time
+from unittest import mock
+
+import anyio
+
+from app import generation_layer, groq_client
+from tests.benchmarks.async_load_bench import in_subprocess, percentile
+from tests.benchmarks.fake_groq import FakeGroqH2Server
+
+DRAFT_MEDIAN = 0.5      # seconds per draft completion (median)
+SELECT_MEDIAN = 0.35    # seconds for the reasoning model's pick
+SIGMA = 0.6             # lognormal spread: p95 is about 2.7x the median
+ARTIFACT_RATE = 0.05    # drafts that come back with a placeholder
+DRAFTS = 100
+CONCURRENCY = 10
+
+DRAFT = "Hi Dr. Keaney,\n\nWould you like to get lunch at the DC this Friday?\n\nBest,"
+
+
+def latency(payload: dict, rng=random.Random(3)) -> float:
+    selecting = "evaluating email drafts" in payload["messages"][0]["content"]
+    median = SELECT_MEDIAN if selecting else DRAFT_MEDIAN
+    return median * math.exp(rng.gauss(0, SIGMA))
+
+
+def respond(payload: dict, rng=random.Random(5)) -> str:
+    if "evaluating email drafts" in payload["messages"][0]["content"]:
+        return "2"
+    return DRAFT.replace("Best,", "Best,\n[Your Name]") if rng.random() < ARTIFACT_RATE else DRAFT
+
+
+async def run(strategy: str) -> list:
+    latencies = []
+    limiter = anyio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with limiter:
+            start = time.perf_counter()
+            await generation_layer.generate_draft_async("Dr. Keaney", "asking her to get lunch on Friday", strategy=strategy)
+            latencies.append(time.perf_counter() - start)
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(DRAFTS):
+            tg.start_soon(one)
+    await groq_client.aclose()
+    return latencies
+
+
+def main():
+    with in_subprocess(lambda: FakeGroqH2Server(responder=respond, latency=latency)) as (groq_url, cert), \
+            mock.patch.object(groq_client, "GROQ_API_URL", groq_url):
+        os.environ["SSL_CERT_FILE"] = cert
+        print(f"Draft completion median {DRAFT_MEDIAN * 1000:.0f} ms, selection {SELECT_MEDIAN * 1000:.0f} ms, "
+              f"lognormal sigma {SIGMA}; {DRAFTS} drafts per strategy")
+        print(f"{'strategy':>10} | {'p50 (ms)':>8} | {'p95 (ms)':>8} | {'calls/draft':>11} | {'hedge after (ms)':>16}")
+        for strategy in (generation_layer.DRAFT_BEST_OF_N, generation_layer.DRAFT_FAST, generation_layer.DRAFT_HEDGED):
+            # Each strategy's own single-draft latencies train the hedge delay.
+            calls = [0]
+            original = groq_client.achat_completion
+
+            async def counted(data, *args, **kwargs):
+                calls[0] += 1
+                return await original(data, *args, **kwargs)
+
+            with mock.patch.object(generation_layer, "achat_completion", counted):
+                latencies = anyio.run(run, strategy)
+            print(f"{strategy:>10} | {percentile(latencies, 0.5) * 1000:>8.0f} | {percentile(latencies, 0.95) * 1000:>8.0f} | "
+                  f"{calls[0] / DRAFTS:>11.2f} | {generation_layer.hedge_delay() * 1000:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
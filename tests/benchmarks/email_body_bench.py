@@ -0,0 +1,110 @@
+"""
+Body extraction cost per message, before and after the byte budget and the
+HTML fallback, on deeply nested multipart fixtures shaped like real mail:
+multipart/mixed > related > alternative with inline images and attachments
+around the text parts. Times include clean_emails() at the app's limits.
+
+Run from the repo root:
+    python -m tests.benchmarks.email_body_bench
+"""
+import base64
+import random
+import string
+import time
+
+from app.gmail_helpers import body_budget, clean_emails, get_email_body, html_to_text
+
+MIN_SECONDS = 0.5
+
+
+def legacy_get_email_body(payload):
+    """get_email_body() before the budget and HTML fallback, for comparison."""
+    if 'parts' in payload:
+        for part in payload['parts']:
+            if part['mimeType'] == 'text/plain':
+                data = part.get('body', {}).get('data')
+                return base64.urlsafe_b64decode(data).decode('utf-8') if data else ""
+            elif 'parts' in part:
+                result = legacy_get_email_body(part)
+                if result: return result
+    else:
+        data = payload.get('body', {}).get('data')
+        return base64.urlsafe_b64decode(data).decode('utf-8') if data else ""
+    return ""
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(count))
+
+
+def _part(mime_type: str, content: bytes, charset: str = "utf-8", attachment: str = None) -> dict:
+    headers = [{"name": "Content-Type", "value": f"{mime_type}; charset={charset}"}]
+    if attachment:
+        headers.append({"name": "Content-Disposition", "value": f'attachment; filename="{attachment}"'})
+    return {"mimeType": mime_type, "filename": attachment or "", "headers": headers,
+            "body": {"data": base64.urlsafe_b64encode(content).decode()}}
+
+
+def _multipart(mime_type: str, *parts) -> dict:
+    return {"mimeType": mime_type, "headers": [], "parts": list(parts)}
+
+
+def _html(rng: random.Random, blocks: int) -> str:
+    style = "<style>" + "".join(f".c{i}{{padding:{i}px;font-family:Arial}}" for i in range(300)) + "</style>"
+    rows = "".join(
+        f'<tr><td class="c{i % 300}"><a href="https://x.example.com/{rng.getrandbits(64):x}">{_words(rng, 10)}</a>'
+        f'<p>{_words(rng, 50)}</p><img src="cid:img{i}"></td></tr>' for i in range(blocks)
+    )
+    return f"<html><head>{style}</head><body><table>{rows}</table></body></html>"
+
+
+def fixtures() -> dict:
+    rng = random.Random(16)
+    image = _part("image/png", rng.randbytes(40_000), attachment=None)
+    pdf = _part("application/pdf", rng.randbytes(150_000), attachment="syllabus.pdf")
+    text = "\n\n".join(_words(rng, 80) for _ in range(400)).encode()  # ~200KB
+    html_small, html_large = _html(rng, 80).encode(), _html(rng, 500).encode()
+    return {
+        "personal, single part 2KB": _part("text/plain", _words(rng, 300).encode()),
+        "nested plain 200KB + attachments": _multipart(
+            "multipart/mixed",
+            _multipart("multipart/related",
+                       _multipart("multipart/alternative", _part("text/plain", text), _part("text/html", html_small)),
+                       image),
+            pdf),
+        "nested HTML-only 60KB": _multipart(
+            "multipart/mixed", _multipart("multipart/related", _multipart("multipart/alternative", _part("text/html", html_small)), image)),
+        "nested HTML-only 300KB": _multipart(
+            "multipart/mixed", _multipart("multipart/related", _multipart("multipart/alternative", _part("text/html", html_large)), image), pdf),
+        "latin-1 plain 50KB": _multipart("multipart/alternative", _part("text/plain", ("Café " * 10_000).encode("latin-1"), "iso-8859-1")),
+    }
+
+
+def per_message(fn) -> float:
+    runs, start = 0, time.perf_counter()
+    while time.perf_counter() - start < MIN_SECONDS:
+        fn()
+        runs += 1
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    print(f"{'fixture':>34} | {'limit':>5} | {'legacy (us)':>11} | {'legacy chars':>12} | {'new (us)':>9} | {'new chars':>9}")
+    for name, payload in fixtures().items():
+        for max_length in (2000, 500):
+            def legacy():
+                try:
+                    return clean_emails(legacy_get_email_body(payload), max_length=max_length)
+                except UnicodeDecodeError:
+                    return "<UnicodeDecodeError>"
+
+            def new():
+                return clean_emails(get_email_body(payload, max_bytes=body_budget(max_length)), max_length=max_length)
+
+            print(f"{name:>34} | {max_length:>5} | {per_message(legacy):>11.0f} | {len(legacy()):>12} | "
+                  f"{per_message(new):>9.0f} | {len(new()):>9}")
+
+
+if __name__ == "__main__":
+    html_to_text("<p>warm</p>")  # bs4 import isn't part of the per-message cost
+    main()
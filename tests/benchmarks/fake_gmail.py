@@ -0,0 +1,307 @@
+"""
+A local stand-in for the Gmail REST API, used by the benchmarks in this folder.
+
+Serves the handful of endpoints app/gmail_services touches (messages.list,
+messages.get, getProfile, history.list and the multipart batch endpoint)
+over plain HTTP on 127.0.0.1, with a configurable per-round-trip delay so the
+numbers resemble a real network instead of loopback. add_message,
+delete_message and modify_labels change the mailbox and record history the
+way Gmail does.
+"""
+import base64
+import gzip
+import json
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from google.oauth2.credentials import Credentials
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def make_message(index: int, body: str, sender: str = "Connor Walsh <connorw@gmail.com>",
+                 subject: str = None, minutes_ago: int = None, html: str = None,
+                 extra_headers: list = None) -> dict:
+    """
+    Builds a Gmail API message resource in format='full' shape. `extra_headers`
+    ({"name", "value"} dicts) go after the ones the app reads, like the
+    Received/DKIM/List-* block of a real newsletter.
+    """
+    sent = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago if minutes_ago is not None else index * 7)
+    headers = [
+        {"name": "From", "value": sender},
+        {"name": "To", "value": "student@university.edu"},
+        {"name": "Subject", "value": subject or f"Message {index}"},
+        {"name": "Date", "value": format_datetime(sent)},
+        {"name": "Message-ID", "value": f"<msg{index}@example.com>"},
+    ] + list(extra_headers or [])
+    parts = [{"partId": "0", "mimeType": "text/plain", "filename": "",
+              "headers": [{"name": "Content-Type", "value": "text/plain; charset=UTF-8"}],
+              "body": {"size": len(body), "data": _b64(body)}}]
+    if html is not None:
+        parts.append({"partId": "1", "mimeType": "text/html", "filename": "",
+                      "headers": [{"name": "Content-Type", "value": "text/html; charset=UTF-8"}],
+                      "body": {"size": len(html), "data": _b64(html)}})
+    return {
+        "id": f"m{index:04d}",
+        "threadId": f"t{index:04d}",
+        "labelIds": ["INBOX", "UNREAD", "CATEGORY_PERSONAL"],
+        "snippet": body[:100],
+        "historyId": str(1000 + index),
+        "internalDate": str(int(sent.timestamp() * 1000)),
+        "sizeEstimate": len(body) + len(html or ""),
+        "payload": {"partId": "", "mimeType": "multipart/alternative", "filename": "",
+                    "headers": headers, "body": {"size": 0}, "parts": parts},
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    # The stdlib default backlog of 5 resets connections under load benchmarks.
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def _matches_query(message: dict, query: str) -> bool:
+    """The subset of Gmail search syntax app/gmail_services uses."""
+    labels = set(message["labelIds"])
+    if labels & {"SPAM", "TRASH"}:
+        return False
+    required = {"label:INBOX": "INBOX", "category:primary": "CATEGORY_PERSONAL", "is:unread": "UNREAD"}
+    for term, label in required.items():
+        if term in query and label not in labels:
+            return False
+    after = re.search(r"after:(\d+)", query)
+    return not after or int(message["internalDate"]) // 1000 >= int(after.group(1))
+
+
+def _parse_fields(spec: str) -> dict:
+    """Parses a partial-response mask ("id,payload(headers,parts(body/data))") into a key tree."""
+    pos = 0
+
+    def parse_list() -> dict:
+        nonlocal pos
+        node = {}
+        while pos < len(spec) and spec[pos] != ")":
+            start = pos
+            while pos < len(spec) and spec[pos] not in ",()":
+                pos += 1
+            *parents, name = spec[start:pos].strip().split("/")
+            target = node
+            for key in parents:
+                target = target.setdefault(key, {})
+            leaf = target.setdefault(name, {})
+            if pos < len(spec) and spec[pos] == "(":
+                pos += 1
+                leaf.update(parse_list())
+                pos += 1
+            if pos < len(spec) and spec[pos] == ",":
+                pos += 1
+        return node
+
+    return parse_list()
+
+
+def _mask(value, tree: dict):
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_mask(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _mask(value[key], sub) for key, sub in tree.items() if key in value}
+    return value
+
+
+def _metadata_view(message: dict, header_names: list) -> dict:
+    """format='metadata': no MIME parts, and only the requested headers when metadataHeaders is given."""
+    wanted = {name.lower() for name in header_names}
+    headers = [h for h in message["payload"]["headers"] if not wanted or h["name"].lower() in wanted]
+    view = {key: value for key, value in message.items() if key != "payload"}
+    view["payload"] = {"mimeType": message["payload"]["mimeType"], "headers": headers}
+    return view
+
+
+class FakeGmailServer:
+    """
+    Threaded HTTP server holding an in-memory mailbox.
+
+    `latency` is slept once per HTTP round trip (not per batched sub-request),
+    which is what makes batching visible in the benchmark.
+    """
+
+    def __init__(self, messages: list, latency: float = 0.04, compress: bool = True):
+        self.messages = {m["id"]: m for m in messages}
+        self.latency = latency
+        self.compress = compress  # honour Accept-Encoding: gzip, as Gmail does
+        self.history_id = 1000 + len(messages)
+        self.history = []
+        self.history_floor = self.history_id  # oldest startHistoryId still answerable
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._httpd = _Server(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.round_trips = 0
+            self.bytes_sent = 0
+
+    # ── mailbox changes ──────────────────────────────────────────────────────
+
+    def _record(self, kind: str, message: dict, labels: list = None):
+        self.history_id += 1
+        message["historyId"] = str(self.history_id)
+        item = {"message": {"id": message["id"], "threadId": message["threadId"], "labelIds": list(message["labelIds"])}}
+        if labels is not None:
+            item["labelIds"] = labels
+        self.history.append({"id": str(self.history_id), kind: [item]})
+
+    def add_message(self, message: dict):
+        with self._lock:
+            self.messages[message["id"]] = message
+            self._record("messagesAdded", message)
+
+    def delete_message(self, message_id: str):
+        with self._lock:
+            self._record("messagesDeleted", self.messages.pop(message_id))
+
+    def modify_labels(self, message_id: str, add: list = (), remove: list = ()):
+        with self._lock:
+            message = self.messages[message_id]
+            message["labelIds"] = [l for l in message["labelIds"] if l not in remove] + list(add)
+            if add:
+                self._record("labelsAdded", message, list(add))
+            if remove:
+                self._record("labelsRemoved", message, list(remove))
+
+    def expire_history(self):
+        """Drops retained history, like Gmail does after about a week."""
+        with self._lock:
+            self.history = []
+            self.history_floor = self.history_id
+
+    def build_service(self, access_token: str = "fake-token"):
+        """A googleapiclient Resource pointed at this server instead of googleapis.com."""
+        return build_from_document(self.discovery_document(), credentials=Credentials(access_token))
+
+    def discovery_document(self) -> dict:
+        doc = json.loads(get_static_doc("gmail", "v1"))
+        doc["rootUrl"] = self.root_url
+        return doc
+
+    # ── request routing ──────────────────────────────────────────────────────
+
+    def route(self, method: str, target: str, body: bytes = b"") -> tuple:
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        path = url.path.rstrip("/")
+        prefix = "/gmail/v1/users/me/messages"
+        if method == "GET" and path == "/gmail/v1/users/me/profile":
+            return 200, {"emailAddress": "student@university.edu", "historyId": str(self.history_id)}
+        if method == "GET" and path == "/gmail/v1/users/me/history":
+            start = int(params["startHistoryId"][0])
+            if start < self.history_floor:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            records = [record for record in self.history if int(record["id"]) > start]
+            return 200, {"history": records, "historyId": str(self.history_id)}
+        if method == "GET" and path == prefix:
+            limit = int(params.get("maxResults", ["100"])[0])
+            query = params.get("q", [""])[0]
+            matching = [m for m in self.messages.values() if _matches_query(m, query)]
+            listed = sorted(matching, key=lambda m: -int(m["internalDate"]))[:limit]
+            return 200, {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in listed],
+                         "resultSizeEstimate": len(listed)}
+        if method == "GET" and path.startswith(prefix + "/"):
+            msg = self.messages.get(path[len(prefix) + 1:])
+            if msg is None:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if params.get("format", ["full"])[0] == "metadata":
+                msg = _metadata_view(msg, params.get("metadataHeaders", []))
+            if "fields" in params:
+                msg = _mask(msg, _parse_fields(params["fields"][0]))
+            return 200, msg
+        return 404, {"error": {"code": 404, "message": f"No route for {method} {path}"}}
+
+    def route_batch(self, content_type: str, body: bytes) -> tuple:
+        envelope = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = "batch_fake_gmail"
+        chunks = []
+        for part in envelope.get_payload():
+            content_id = part["Content-ID"].strip("<>")
+            inner = part.get_payload()
+            request_line = inner.split("\n", 1)[0].strip()
+            method, target, _ = request_line.split(" ", 2)
+            status, payload = self.route(method, target)
+            chunks.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(chunks).encode("utf-8")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, content_type: str, payload: bytes):
+                self.send_response(status)
+                if server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    payload = gzip.compress(payload, compresslevel=6)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                with server._lock:
+                    server.round_trips += 1
+                    server.bytes_sent += len(payload)
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                status, payload = server.route("GET", self.path)
+                self._send(status, "application/json; charset=UTF-8", json.dumps(payload).encode("utf-8"))
+
+            def do_POST(self):
+                time.sleep(server.latency)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if urlsplit(self.path).path == "/batch":
+                    content_type, payload = server.route_batch(self.headers["Content-Type"], body)
+                    self._send(200, content_type, payload)
+                else:
+                    status, payload = server.route("POST", self.path, body)
+                    self._send(status, "application/json; charset=UTF-8", json.dumps(payload).encode("utf-8"))
+
+        return Handler
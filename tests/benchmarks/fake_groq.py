@@ -0,0 +1,236 @@
+"""
+A local stand-in for Groq's OpenAI-compatible chat completions endpoint,
+used by the benchmarks in this folder.
+
+Optionally serves HTTPS with a throwaway self-signed certificate (generated
+with the openssl CLI) so TLS handshake costs show up in the numbers, and
+counts accepted TCP connections so connection reuse can be checked directly.
+FakeGroqH2Server is the HTTP/2 variant, for benchmarks of the async client.
+"""
+import asyncio
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import h2.config
+import h2.connection
+import h2.events
+import h2.settings
+
+
+def _self_signed_cert(directory: str) -> tuple:
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def completion_body(content: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+    }
+
+
+
+class _Server(ThreadingHTTPServer):
+    # The stdlib default backlog of 5 resets connections under load benchmarks.
+    request_queue_size = 1024
+    daemon_threads = True
+
+class FakeGroqServer:
+    """
+    Threaded chat-completions server.
+
+    `responder(payload) -> str` produces the completion text, and
+    `latency(payload) -> float` the seconds to sleep before answering
+    (a constant by default; benchmarks pass samplers for realistic tails).
+    """
+
+    def __init__(self, responder=None, latency=0.0, tls: bool = False):
+        self.responder = responder or (lambda payload: "gmail_summarize")
+        self.latency = latency if callable(latency) else (lambda payload, _l=latency: _l)
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._tmpdir = None
+        self.cert_file = None
+        self._httpd = _Server(("127.0.0.1", 0), self._handler_class())
+        if tls and shutil.which("openssl"):
+            self._tmpdir = tempfile.mkdtemp()
+            self.cert_file, key_file = _self_signed_cert(self._tmpdir)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.cert_file, key_file)
+            self._httpd.socket = context.wrap_socket(self._httpd.socket, server_side=True)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address
+        scheme = "https" if self.cert_file else "http"
+        return f"{scheme}://{host}:{port}/openai/v1/chat/completions"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def reset_counters(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = 0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency(payload))
+                body = json.dumps(completion_body(server.responder(payload))).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def stream_chunk(content: str) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    }
+
+
+class FakeGroqH2Server:
+    """
+    Chat-completions server speaking HTTP/2 over TLS (ALPN "h2"), like Groq's
+    edge. Streams on a connection are answered concurrently, so one socket
+    carries many in-flight completions. Requires the openssl CLI.
+
+    `latency` is the time to the first token and `token_interval` the time
+    per word after it. A request with "stream": true gets each word as a
+    server-sent event as it's "generated"; otherwise the whole body is sent
+    once generation finishes.
+    """
+
+    MAX_CONCURRENT_STREAMS = 1000
+
+    def __init__(self, responder=None, latency=0.0, token_interval: float = 0.0):
+        self.responder = responder or (lambda payload: "gmail_summarize")
+        self.latency = latency if callable(latency) else (lambda payload, _l=latency: _l)
+        self.token_interval = token_interval
+        self.connections = 0
+        self.requests = 0
+        self._tmpdir = tempfile.mkdtemp()
+        self.cert_file, key_file = _self_signed_cert(self._tmpdir)
+        self._context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self._context.load_cert_chain(self.cert_file, key_file)
+        self._context.set_alpn_protocols(["h2"])
+        self._loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"https://{host}:{port}/openai/v1/chat/completions"
+
+    def __enter__(self):
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._serve, "127.0.0.1", 0, ssl=self._context, backlog=1024)
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._server.close()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def reset_counters(self):
+        self.connections = 0
+        self.requests = 0
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        conn.update_settings({h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: self.MAX_CONCURRENT_STREAMS})
+        writer.write(conn.data_to_send())
+        bodies = {}
+        try:
+            while data := await reader.read(65535):
+                for event in conn.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        bodies[event.stream_id] = b""
+                    elif isinstance(event, h2.events.DataReceived):
+                        bodies[event.stream_id] += event.data
+                        conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        asyncio.create_task(self._respond(conn, writer, event.stream_id, bodies.pop(event.stream_id)))
+                writer.write(conn.data_to_send())
+        except (ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, conn, writer, stream_id: int, raw: bytes):
+        payload = json.loads(raw or b"{}")
+        self.requests += 1
+        await asyncio.sleep(self.latency(payload))
+        content = self.responder(payload)
+        words = content.split(" ")
+        if payload.get("stream"):
+            conn.send_headers(stream_id, [(":status", "200"), ("content-type", "text/event-stream")])
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(self.token_interval)
+                event = f"data: {json.dumps(stream_chunk(word if i == 0 else ' ' + word))}\n\n"
+                conn.send_data(stream_id, event.encode("utf-8"))
+                writer.write(conn.data_to_send())
+            conn.send_data(stream_id, b"data: [DONE]\n\n", end_stream=True)
+            writer.write(conn.data_to_send())
+            return
+        await asyncio.sleep(self.token_interval * (len(words) - 1))
+        body = json.dumps(completion_body(content)).encode("utf-8")
+        conn.send_headers(stream_id, [
+            (":status", "200"),
+            ("content-type", "application/json"),
+            ("content-length", str(len(body))),
+        ])
+        conn.send_data(stream_id, body, end_stream=True)
+        writer.write(conn.data_to_send())
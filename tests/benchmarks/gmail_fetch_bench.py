@@ -0,0 +1,60 @@
+"""
+Latency of get_emails() against a local fake Gmail server as max_results grows:
+the old one-get-per-message loop, the batched fetch on a cold mailbox cache,
+and a repeat command on an unchanged inbox (one history.list call).
+
+Run from the repo root:
+    python -m tests.benchmarks.gmail_fetch_bench
+"""
+import time
+from unittest import mock
+
+from app import gmail_client, gmail_services, mailbox_sync
+from tests.benchmarks.fake_gmail import FakeGmailServer, make_message
+
+ROUND_TRIP = 0.04  # seconds slept per HTTP round trip by the fake server
+SIZES = [1, 5, 10, 15, 25, 50]
+REPEATS = 3
+
+
+def serial_fetch(service, max_results: int) -> int:
+    """The pre-batching access pattern: list, then one messages().get() per ID."""
+    listed = service.users().messages().list(userId='me', q='', maxResults=max_results).execute()
+    for msg in listed.get('messages', []):
+        service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+    return len(listed.get('messages', []))
+
+
+def timed(fn, setup=lambda: None) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    mailbox = [make_message(i, f"Body of message {i}. " * 40) for i in range(max(SIZES))]
+    with FakeGmailServer(mailbox, latency=ROUND_TRIP) as server:
+        service = server.build_service()
+        print(f"Simulated round trip: {ROUND_TRIP * 1000:.0f} ms")
+        print(f"{'max_results':>11} | {'serial (ms)':>11} | {'batched (ms)':>12} | {'repeat (ms)':>11} | {'round trips':>19}")
+        for size in SIZES:
+            serial = timed(lambda: serial_fetch(service, size))
+            fetch = lambda: gmail_services.get_emails(hours_back=24, max_results=size, access_token="fake")
+            with mock.patch.object(gmail_client, "GMAIL_DISCOVERY_DOC", server.discovery_document()):
+                server.reset_counters()
+                batched = timed(fetch, setup=mailbox_sync.clear)
+                cold_trips = server.round_trips // REPEATS
+                fetch()
+                server.reset_counters()
+                repeat = timed(fetch)
+                repeat_trips = server.round_trips // REPEATS
+            print(f"{size:>11} | {serial * 1000:>11.1f} | {batched * 1000:>12.1f} | {repeat * 1000:>11.1f} | "
+                  f"{size + 1:>4} -> {cold_trips} -> {repeat_trips}")
+
+
+if __name__ == "__main__":
+    main()
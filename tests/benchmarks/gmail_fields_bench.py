@@ -0,0 +1,87 @@
+"""
+Bytes on the wire and client CPU per get_emails() for newsletter-style mail:
+format='full' for every message versus the field-masked fetch in
+app/mailbox_sync (metadata headers + masked body), with and without gzip.
+
+Each message has a ~6 KB text part, a ~60 KB HTML alternative and a ~40
+header block (Received, DKIM, ARC, List-*) the way marketing mail does.
+
+Run from the repo root:
+    python -m tests.benchmarks.gmail_fields_bench
+"""
+import random
+import string
+import time
+from unittest import mock
+
+from app import gmail_client, gmail_services, mailbox_sync
+from tests.benchmarks.fake_gmail import FakeGmailServer, make_message
+
+MESSAGES = 15
+REPEATS = 5
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(count))
+
+
+def newsletter(index: int, rng: random.Random) -> dict:
+    text = "\n\n".join(_words(rng, 90) for _ in range(10))
+    blocks = "".join(
+        f'<tr><td style="padding:12px;font-family:Arial,sans-serif;color:#333">'
+        f'<a href="https://news.example.com/t/{rng.getrandbits(64):x}">{_words(rng, 12)}</a>'
+        f'<p>{_words(rng, 60)}</p><img src="https://cdn.example.com/{rng.getrandbits(64):x}.png" width="600"></td></tr>'
+        for _ in range(40)
+    )
+    html = f"<html><body><table width='100%'>{blocks}</table></body></html>"
+    headers = (
+        [{"name": "Received", "value": f"from mail{i}.example.com ({rng.getrandbits(32):x}) by mx.google.com with ESMTPS id {rng.getrandbits(96):x}"} for i in range(12)]
+        + [{"name": "ARC-Seal", "value": "i=1; a=rsa-sha256; t=1700000000; cv=none; d=google.com; s=arc-20160816; b=" + "".join(rng.choices(string.ascii_letters, k=340))}]
+        + [{"name": "DKIM-Signature", "value": "v=1; a=rsa-sha256; c=relaxed/relaxed; d=news.example.com; b=" + "".join(rng.choices(string.ascii_letters, k=340))}]
+        + [{"name": f"X-Campaign-{i}", "value": f"{rng.getrandbits(128):x}"} for i in range(24)]
+        + [{"name": "List-Unsubscribe", "value": f"<https://news.example.com/u/{rng.getrandbits(128):x}>"}]
+    )
+    return make_message(index, text, sender="Campus Weekly <news@example.com>", html=html, extra_headers=headers)
+
+
+def full_fetch(service, ids: list) -> dict:
+    """The pre-mask access pattern: format='full' for every message in one batch."""
+    messages = service.users().messages()
+    return mailbox_sync._batch_execute(service, {i: messages.get(userId='me', id=i, format='full') for i in ids})
+
+
+def measure(server, fn) -> tuple:
+    """(bytes per call, client CPU ms per call). Server threads aren't counted by thread_time."""
+    server.reset_counters()
+    cpu = 0.0
+    for _ in range(REPEATS):
+        mailbox_sync.clear()
+        start = time.thread_time()
+        fn()
+        cpu += time.thread_time() - start
+    return server.bytes_sent / REPEATS, cpu / REPEATS * 1000
+
+
+def main():
+    rng = random.Random(7)
+    corpus = [newsletter(i, rng) for i in range(MESSAGES)]
+    ids = [m["id"] for m in corpus]
+    print(f"{MESSAGES} newsletters, {sum(len(str(m)) for m in corpus) // MESSAGES // 1024} KB each as format='full' JSON")
+    print(f"{'fetch':>8} | {'gzip':>4} | {'bytes / command':>15} | {'client CPU (ms)':>15}")
+    for compress in (False, True):
+        with FakeGmailServer(corpus, latency=0, compress=compress) as server, \
+                mock.patch.object(gmail_client, "GMAIL_DISCOVERY_DOC", server.discovery_document()):
+            gmail_client._idle_services.clear()  # clients are bound to the previous server's port
+            service = server.build_service()
+            rows = (
+                ("full", lambda: full_fetch(service, ids)),
+                ("masked", lambda: mailbox_sync._fetch_messages(service, ids)),
+                ("command", lambda: gmail_services.get_emails(hours_back=48, max_results=MESSAGES, access_token="fake")),
+            )
+            for name, fn in rows:
+                sent, cpu = measure(server, fn)
+                print(f"{name:>8} | {'on' if compress else 'off':>4} | {sent / 1024:>12.1f} KB | {cpu:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Connection cost of bare requests.post() per LLM call versus the shared
+keep-alive pool in app/groq_client, against a local HTTPS stand-in for Groq.
+
+Run from the repo root:
+    python -m tests.benchmarks.groq_pool_bench
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+
+from app import groq_client
+from tests.benchmarks.fake_groq import FakeGroqServer
+
+CALLS = 200
+CONCURRENCY = [1, 4]
+PAYLOAD = {"model": "fake", "messages": [{"role": "user", "content": "Summarize my emails"}], "temperature": 0.0}
+
+
+def bare_post(url: str) -> str:
+    response = requests.post(url, headers={"Content-Type": "application/json"}, json=PAYLOAD)
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def run(fn, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: fn(), range(CALLS)))
+    return time.perf_counter() - start
+
+
+def main():
+    with FakeGroqServer(tls=True) as server:
+        if server.cert_file:
+            # requests prefers the CA bundle env vars over Session.verify, so trust the stand-in there.
+            os.environ["REQUESTS_CA_BUNDLE"] = server.cert_file
+        print(f"Stand-in: {server.url} ({'TLS' if server.cert_file else 'plain HTTP, openssl not found'})")
+        print(f"{'client':>12} | {'threads':>7} | {'per call (ms)':>13} | {'new connections':>15}")
+        for concurrency in CONCURRENCY:
+            server.reset_counters()
+            elapsed = run(lambda: bare_post(server.url), concurrency)
+            print(f"{'bare post':>12} | {concurrency:>7} | {elapsed / CALLS * 1000 * concurrency:>13.2f} | {server.connections:>15}")
+
+            server.reset_counters()
+            with mock.patch.object(groq_client, "GROQ_API_URL", server.url):
+                elapsed = run(lambda: groq_client.chat_completion(PAYLOAD), concurrency)
+            print(f"{'pooled':>12} | {concurrency:>7} | {elapsed / CALLS * 1000 * concurrency:>13.2f} | {server.connections:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Hit rate, accuracy and latency of the local fast-path intent classifier,
+measured against the labeled corpus in tests/reasoning_test.py.
+
+The classifier's seed set (app/intent_examples.py) contains these same
+commands, so each one is scored leave-one-out: the classifier is rebuilt
+without the held-out command before classifying it.
+
+Run from the repo root:
+    python -m tests.benchmarks.intent_fastpath_report
+"""
+import time
+
+from app.intent_examples import INTENT_EXAMPLES
+from app.intent_reasoning import FastPathClassifier, INTENT_FASTPATH_THRESHOLD
+from tests import reasoning_test
+
+THRESHOLDS = [0.05, 0.10, 0.15, 0.20, 0.25]
+
+
+def labeled_corpus() -> list:
+    mark = next(m for m in reasoning_test.test_command_mapping.pytestmark if m.name == "parametrize")
+    return list(mark.args[1])
+
+
+def main():
+    corpus = labeled_corpus()
+    scored = []
+    latencies = []
+    for command, expected in corpus:
+        held_out = [(c, i) for c, i in INTENT_EXAMPLES if c.lower() != command.lower()]
+        classifier = FastPathClassifier(held_out)
+        start = time.perf_counter()
+        intent, confidence = classifier.classify(command)
+        latencies.append(time.perf_counter() - start)
+        scored.append((intent, confidence, expected))
+
+    print(f"Corpus: {len(corpus)} labeled commands (leave-one-out)")
+    print(f"Mean classify latency: {sum(latencies) / len(latencies) * 1e6:.0f} us")
+    print(f"{'threshold':>9} | {'hit rate':>8} | {'accuracy on hits':>16} | {'LLM calls saved':>15}")
+    for threshold in THRESHOLDS:
+        # Mirrors fastpath_intent(): "none" is never answered locally.
+        hits = [(i, e) for i, c, e in scored if i != "none" and c >= threshold]
+        correct = sum(i == e for i, e in hits)
+        marker = "  <- default" if abs(threshold - INTENT_FASTPATH_THRESHOLD) < 1e-9 else ""
+        print(f"{threshold:>9.2f} | {len(hits) / len(corpus):>8.1%} | "
+              f"{(correct / len(hits) if hits else 0):>16.1%} | {len(hits):>15}{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Latency of /gmail/{command} with and without the Gmail prefetch that
+overlaps the fetch with intent classification and argument parsing.
+
+Groq and Gmail are the local stand-ins. The mailbox cache is cleared
+before each request so every fetch is a cold list + batch, as on the
+first command of a session; the result cache is cleared so every
+request calls the model.
+
+Run from the repo root:
+    python -m tests.benchmarks.prefetch_bench
+"""
+import json
+import os
+import statistics
+import time
+from unittest import mock
+
+import anyio
+
+from googleapiclient.discovery_cache import get_static_doc
+
+from app import generation_layer, gmail_client, groq_client, mailbox_sync, main
+from tests.benchmarks.async_load_bench import in_subprocess
+from tests.benchmarks.fake_gmail import FakeGmailServer, make_message
+from tests.benchmarks.fake_groq import FakeGroqH2Server
+
+GROQ_LATENCY = 0.25
+GMAIL_LATENCY = 0.04
+RUNS = 10
+COMMANDS = ["Did Connor email me today", "Any emails from Professor Chen"]
+
+
+def respond(payload: dict) -> str:
+    if payload.get("response_format", {}).get("type") == "json_object":
+        arguments = {"sender_name": "Connor"}
+        return json.dumps({"intent": "gmail_check_sender", "arguments": arguments, **arguments})
+    return "Yes, Connor emailed you this morning about lunch on Friday."
+
+
+async def timed(command: str) -> float:
+    samples = []
+    for _ in range(RUNS):
+        mailbox_sync.clear()
+        generation_layer._result_cache.clear()
+        start = time.perf_counter()
+        await main.read_root(command, authorization="Bearer token-a")
+        samples.append(time.perf_counter() - start)
+    await groq_client.aclose()
+    return statistics.median(samples)
+
+
+def main_bench():
+    mailbox = [make_message(i, f"Body of message {i}. " * 20, minutes_ago=30 + i) for i in range(10)]
+    discovery = json.loads(get_static_doc("gmail", "v1"))
+    with in_subprocess(lambda: FakeGroqH2Server(responder=respond, latency=GROQ_LATENCY)) as (groq_url, cert), \
+            FakeGmailServer(mailbox, latency=GMAIL_LATENCY) as gmail, \
+            mock.patch.object(gmail_client, "GMAIL_DISCOVERY_DOC", {**discovery, "rootUrl": gmail.root_url}), \
+            mock.patch.object(groq_client, "GROQ_API_URL", groq_url), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        os.environ["SSL_CERT_FILE"] = cert
+        print(f"Groq {GROQ_LATENCY * 1000:.0f} ms per call, Gmail {GMAIL_LATENCY * 1000:.0f} ms per round trip; median of {RUNS}")
+        print(f"{'command':>32} | {'sequential (ms)':>15} | {'prefetch (ms)':>13}")
+        for command in COMMANDS:
+            with mock.patch.object(main.GmailPrefetch, "start", lambda self, intent: None):
+                sequential = anyio.run(timed, command)
+            overlapped = anyio.run(timed, command)
+            print(f"{command:>32} | {sequential * 1000:>15.0f} | {overlapped * 1000:>13.0f}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,87 @@
+"""
+How many gmail_reply commands the local reply ranker (gmail_reasoning)
+settles without REASONING_MODEL, how often those local picks are right, and
+how many candidates the rest send to the model (previously all of them).
+
+Inboxes hold 8 unread emails from generated senders. In a third of them
+the recipient sent two emails on different topics, and the description
+names one of the topics, the way a user would ("reply to Megan about the
+lab report").
+
+Run from the repo root:
+    python -m tests.benchmarks.reply_match_bench
+"""
+import random
+import time
+
+from app.demo_data import MOCK_EMAILS
+from app.gmail_reasoning import _local_reply_match
+from tests.benchmarks.sender_match_bench import FIRST, LAST, SOUND_ALIKES, _sender
+
+TOPICS = [
+    ("Lab report draft", "Can you look over my lab report draft before Thursday?", "saying I'll review the lab report tonight"),
+    ("Lunch on Friday?", "Want to grab lunch on Friday after class?", "telling them Friday lunch works"),
+    ("Soccer game moved", "The intramural soccer game moved to Sunday at 3.", "saying Sunday's soccer game is fine"),
+    ("Group project slides", "I finished the intro slides for the group project.", "thanking them for the project slides"),
+    ("Apartment lease", "The landlord needs the lease signed by Monday.", "saying I'll sign the lease Monday"),
+    ("Concert tickets", "I got two extra concert tickets for Saturday.", "asking if the concert tickets are still free"),
+    ("Study session", "Study session tonight at 7 in the library?", "telling them I'll be at the study session"),
+    ("Internship referral", "Happy to refer you for the internship at my company.", "thanking them for the internship referral"),
+]
+INBOX_SIZE = 8
+TRIALS = 500
+DEMO = [("Connor", "telling him I'll be at the study session", "e2"),
+        ("Professor Chen", "asking for an extension on problem set 3", "e1"),
+        ("mom", "saying I'll call this weekend", "e6"),
+        ("the financial aid office", "accepting my aid package", "e4")]
+
+
+def synthetic_cases(seed: int = 11) -> list:
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(TRIALS):
+        firsts = rng.sample(FIRST, INBOX_SIZE)
+        people = [(first, rng.choice(LAST)) for first in firsts]
+        senders = [_sender(first, last, rng) for first, last in people]
+        topics = rng.sample(TOPICS, INBOX_SIZE)
+        inbox = {f"m{i}": {"from": senders[i], "subject": topics[i][0], "snippet": topics[i][1]} for i in range(INBOX_SIZE)}
+        target = rng.randrange(INBOX_SIZE)
+        if rng.random() < 1 / 3:
+            # The recipient also sent the email before it in the inbox, on another topic.
+            other = (target + 1) % INBOX_SIZE
+            inbox[f"m{other}"]["from"] = senders[target]
+        first = people[target][0]
+        recipient = rng.choice([first, SOUND_ALIKES.get(first, first), f"{first} {people[target][1]}"])
+        cases.append((inbox, recipient, topics[target][2], f"m{target}"))
+    return cases
+
+
+def evaluate(cases: list) -> dict:
+    local = right = sent = 0
+    latencies = []
+    for inbox, recipient, description, expected in cases:
+        start = time.perf_counter()
+        match_id, candidates = _local_reply_match(inbox, recipient, description)
+        latencies.append(time.perf_counter() - start)
+        if match_id is not None:
+            local += 1
+            right += match_id == expected
+        else:
+            sent += len(candidates)
+    latencies.sort()
+    return {"cases": len(cases), "local": local, "right": right,
+            "sent": sent / max(len(cases) - local, 1), "p95": latencies[int(len(latencies) * 0.95)] * 1e6}
+
+
+def main():
+    compact = {mid: {"from": d["from"], "subject": d["subject"], "snippet": d["snippet"]} for mid, d in MOCK_EMAILS.items()}
+    demo = [(compact, recipient, description, expected) for recipient, description, expected in DEMO]
+    print(f"{'set':>10} | {'cases':>5} | {'no LLM':>6} | {'local right':>11} | {'sent to LLM':>11} | {'p95 (us)':>8}")
+    for name, cases in (("demo", demo), ("synthetic", synthetic_cases())):
+        r = evaluate(cases)
+        print(f"{name:>10} | {r['cases']:>5} | {r['local'] / r['cases']:>6.0%} | {r['right']:>5}/{r['local']:<5} | "
+              f"{r['sent']:>4.1f} of {len(cases[0][0]):<3} | {r['p95']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
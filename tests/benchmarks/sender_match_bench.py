@@ -0,0 +1,119 @@
+"""
+Accuracy and latency of the local sender matcher (app.sender_match) that
+decides which emails a gmail_check_sender request sends to the LLM.
+
+Two sets:
+  - demo: the demo_data inbox with the phrasings users say to Alexa.
+  - synthetic: 15-email inboxes of generated senders, queried with the
+    target's name as Alexa tends to transcribe it (first name only, surname
+    with a title, misspellings and sound-alikes), plus queries for people
+    not in the inbox.
+
+A query is correct when the matched set is exactly the target's emails (or
+empty for an absent sender). "LLM" counts relationship names the matcher
+hands to the model unresolved.
+
+Run from the repo root:
+    python -m tests.benchmarks.sender_match_bench
+"""
+import random
+import time
+
+from app.demo_data import MOCK_EMAILS
+from app.sender_match import match_sender
+
+DEMO_QUERIES = [
+    ("Connor", {"e2"}), ("Conner", {"e2"}), ("Connor Walsh", {"e2"}), ("Conor Welsh", {"e2"}),
+    ("Professor Chen", {"e1"}), ("professor chin", {"e1"}), ("David Chen", {"e1"}), ("Dr. Chen", {"e1"}),
+    ("the financial aid office", {"e4"}), ("financial aid", {"e4"}), ("Amazon", {"e5"}), ("amazon.com", {"e5"}),
+    ("Google", {"e3"}), ("mom", {"e6"}), ("the CS club", {"e7"}), ("CS Club", {"e7"}),
+    ("Sarah", set()), ("Professor Martinez", set()), ("Netflix", set()), ("Jessica Park", set()),
+]
+
+FIRST = ["Connor", "Katherine", "Steven", "Sarah", "Jonathan", "Aaron", "Megan", "Brian", "Rachel", "Michael",
+         "Olivia", "Ethan", "Sophia", "Daniel", "Emily", "Marcus", "Hannah", "Tyler", "Priya", "Wei"]
+LAST = ["Walsh", "Chen", "Nguyen", "Thompson", "Garcia", "Patel", "Kowalski", "O'Brien", "Schmidt", "Rodriguez",
+        "Kim", "Johnson", "Martinez", "Fitzgerald", "Singh", "Murphy", "Anderson", "Lee", "Baker", "Hughes"]
+# How speech-to-text spells the same name.
+SOUND_ALIKES = {"Connor": "Conner", "Katherine": "Catherine", "Steven": "Stephen", "Sarah": "Sara",
+                "Jonathan": "Johnathan", "Aaron": "Aron", "Megan": "Meghan", "Brian": "Bryan", "Rachel": "Rachael",
+                "Michael": "Micheal", "Walsh": "Welsh", "Chen": "Chin", "Nguyen": "Newyen", "Thompson": "Thomson",
+                "Kowalski": "Kovalski", "O'Brien": "O Brian", "Schmidt": "Smith", "Fitzgerald": "Fitzgerold",
+                "Murphy": "Murphey", "Hughes": "Hews"}
+DOMAINS = ["gmail.com", "university.edu", "yahoo.com", "outlook.com"]
+INBOX_SIZE = 15
+TRIALS = 400
+
+
+def _sender(first: str, last: str, rng: random.Random) -> str:
+    domain = rng.choice(DOMAINS)
+    local = rng.choice([f"{first}.{last}", f"{first[0]}{last}", f"{first}{rng.randint(1, 99)}"]).lower().replace("'", "")
+    return f"{first} {last} <{local}@{domain}>"
+
+
+def _variants(first: str, last: str, rng: random.Random) -> list:
+    return [
+        first,
+        f"{first} {last}",
+        f"Professor {last}",
+        SOUND_ALIKES.get(first, first),
+        f"{SOUND_ALIKES.get(first, first)} {SOUND_ALIKES.get(last, last)}",
+    ]
+
+
+def synthetic_cases(seed: int = 7) -> list:
+    rng = random.Random(seed)
+    people = [(f, l) for f in FIRST for l in LAST]
+    cases = []
+    for _ in range(TRIALS):
+        chosen = rng.sample(people, INBOX_SIZE + 1)
+        # Inboxes never hold two people with the same first name, or "Connor" would be ambiguous by design.
+        firsts = {}
+        for first, last in chosen:
+            firsts.setdefault(first, last)
+        chosen = list(firsts.items())
+        absent, present = chosen[0], chosen[1:INBOX_SIZE]
+        inbox = {f"s{i}": {"from": _sender(first, last, rng)} for i, (first, last) in enumerate(present)}
+        target = rng.randrange(len(present))
+        first, last = present[target]
+        if any(l == last for f, l in present if (f, l) != (first, last)):
+            continue
+        query = rng.choice(_variants(first, last, rng))
+        cases.append((query, inbox, {f"s{target}"}))
+        if absent[1] not in {l for _, l in present}:
+            cases.append((f"{absent[0]} {absent[1]}", inbox, set()))
+    return cases
+
+
+def evaluate(cases: list) -> dict:
+    correct = to_llm = false_hits = misses = 0
+    latencies = []
+    for query, inbox, expected in cases:
+        start = time.perf_counter()
+        matched = match_sender(query, inbox)
+        latencies.append(time.perf_counter() - start)
+        if matched is None:
+            to_llm += 1
+            continue
+        matched = set(matched)
+        correct += matched == expected
+        false_hits += bool(matched - expected)
+        misses += bool(expected - matched)
+    latencies.sort()
+    return {
+        "cases": len(cases), "correct": correct, "llm": to_llm, "false_hits": false_hits, "misses": misses,
+        "p50": latencies[len(latencies) // 2] * 1e6, "p95": latencies[int(len(latencies) * 0.95)] * 1e6,
+    }
+
+
+def main():
+    demo = [(query, MOCK_EMAILS, expected) for query, expected in DEMO_QUERIES]
+    print(f"{'set':>10} | {'cases':>5} | {'accuracy':>8} | {'LLM':>4} | {'false hit':>9} | {'miss':>5} | {'p50 (us)':>8} | {'p95 (us)':>8}")
+    for name, cases in (("demo", demo), ("synthetic", synthetic_cases())):
+        r = evaluate(cases)
+        print(f"{name:>10} | {r['cases']:>5} | {r['correct'] / r['cases']:>8.1%} | {r['llm']:>4} | {r['false_hits']:>9} | "
+              f"{r['misses']:>5} | {r['p50']:>8.0f} | {r['p95']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Time to first byte of the streaming endpoints against the time to the
+full response of the existing ones, for the two replies that are model
+generated text: an inbox summary and a sender check.
+
+Groq is a local HTTP/2 stand-in that takes GROQ_TTFT to the first token
+and TOKEN_INTERVAL per word after that, streamed or not. Gmail is the
+local stand-in with GMAIL_LATENCY per round trip. The result cache is
+cleared before every request so each one really calls the model.
+
+Run from the repo root:
+    python -m tests.benchmarks.streaming_ttfb_bench
+"""
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import anyio
+
+from googleapiclient.discovery_cache import get_static_doc
+
+from app import generation_layer, gmail_client, groq_client, main
+from tests.benchmarks.async_load_bench import in_subprocess
+from tests.benchmarks.fake_gmail import FakeGmailServer, make_message
+from tests.benchmarks.fake_groq import FakeGroqH2Server
+
+GROQ_TTFT = 0.25        # seconds to the first token
+TOKEN_INTERVAL = 0.012  # seconds per word, roughly 80 words/s
+GMAIL_LATENCY = 0.04
+RUNS = 10
+
+SUMMARY = ("Connor asked whether you can make lunch on Friday at noon, and he needs an answer by tomorrow "
+           "so he can book a table. Separately, Professor Chen moved the midterm review session to Thursday "
+           "afternoon in the library and asked everyone to bring questions from the last two problem sets. "
+           "Finally, the registrar confirmed that your enrollment verification letter is ready to download.")
+SENDER = "Yes, Connor emailed you this morning asking whether you can make lunch on Friday at noon."
+
+
+def respond(payload: dict) -> str:
+    if payload.get("response_format", {}).get("type") == "json_object":
+        prompt = payload["messages"][-1]["content"]
+        if "Connor" in prompt:
+            arguments = {"sender_name": "Connor"}
+            return json.dumps({"intent": "gmail_check_sender", "arguments": arguments, **arguments})
+        arguments = {"lookback_period_value": 12, "lookback_period_units": "hours"}
+        return json.dumps({"intent": "gmail_summarize", "arguments": arguments, **arguments})
+    return SENDER if "Who I'm looking for" in payload["messages"][-1]["content"] else SUMMARY
+
+
+async def full_response(command: str) -> tuple:
+    start = time.perf_counter()
+    await main.read_root(command, authorization="Bearer token-a")
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def streamed(command: str) -> tuple:
+    start = time.perf_counter()
+    first = None
+    response = await main.stream_command(command, authorization="Bearer token-a")
+    async for event in response.body_iterator:
+        if first is None and event.startswith("data:"):
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def demo_full(command: str) -> tuple:
+    start = time.perf_counter()
+    await main.demo_chat(main.DemoChatRequest(command=command), SimpleNamespace(client=SimpleNamespace(host="bench")))
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def demo_streamed(command: str) -> tuple:
+    start = time.perf_counter()
+    first = None
+    response = await main.demo_chat_stream(main.DemoChatRequest(command=command), SimpleNamespace(client=SimpleNamespace(host="bench")))
+    async for event in response.body_iterator:
+        if first is None and event.startswith("data:"):
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def measure(runner, command: str) -> tuple:
+    firsts, totals = [], []
+    for _ in range(RUNS):
+        generation_layer._result_cache.clear()
+        main._demo_rate.clear()
+        first, total = await runner(command)
+        firsts.append(first)
+        totals.append(total)
+    await groq_client.aclose()
+    return statistics.median(firsts), statistics.median(totals)
+
+
+def main_bench():
+    mailbox = [make_message(i, f"Body of message {i}. " * 20, minutes_ago=30 + i) for i in range(5)]
+    discovery = json.loads(get_static_doc("gmail", "v1"))
+    factory = lambda: FakeGroqH2Server(responder=respond, latency=GROQ_TTFT, token_interval=TOKEN_INTERVAL)
+    with in_subprocess(factory) as (groq_url, cert), \
+            FakeGmailServer(mailbox, latency=GMAIL_LATENCY) as gmail, \
+            mock.patch.object(gmail_client, "GMAIL_DISCOVERY_DOC", {**discovery, "rootUrl": gmail.root_url}), \
+            mock.patch.object(groq_client, "GROQ_API_URL", groq_url), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        os.environ["SSL_CERT_FILE"] = cert
+        print(f"Groq first token {GROQ_TTFT * 1000:.0f} ms, {TOKEN_INTERVAL * 1000:.0f} ms/word; "
+              f"Gmail round trip {GMAIL_LATENCY * 1000:.0f} ms; median of {RUNS}")
+        print(f"{'endpoint':>24} | {'reply':>8} | {'first byte (ms)':>15} | {'full reply (ms)':>15}")
+        rows = (
+            ("/gmail/{command}", full_response), ("/gmail/{command}/stream", streamed),
+            ("/demo/chat", demo_full), ("/demo/chat/stream", demo_streamed),
+        )
+        for reply, command in (("summary", "Summarize my emails from the last 12 hours"),
+                               ("sender", "Did Connor email me")):
+            for name, runner in rows:
+                first, total = anyio.run(measure, runner, command)
+                print(f"{name:>24} | {reply:>8} | {first * 1000:>15.0f} | {total * 1000:>15.0f}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,92 @@
+import glob
+import random
+import re
+import sys
+from unittest import mock
+from app import gmail_helpers
+from app.demo_data import MOCK_EMAILS
+from app.gmail_helpers import clean_emails
+
+
+def legacy_clean_emails(email_body, max_length=2000):
+    """clean_emails() before the single-pass rewrite, kept as the reference."""
+    reply_patterns = [
+        r'(^|\n)On\s+.*\s+wrote:.*',
+        r'(^|\n)El\s+.*\s+escribió:.*',
+        r'(^|\n)---*\s*Original Message\s*---*',
+        r'(^|\n)________________________________',
+        r'(^|\n)From:\s*.*?\nSent:\s*.*'
+    ]
+    for pattern in reply_patterns:
+        match = re.search(pattern, email_body, re.IGNORECASE | re.MULTILINE)
+        if match:
+            email_body = email_body[:match.start()]
+            break
+    email_body = re.sub(r'\s+', ' ', email_body).strip()
+    for link_pattern in [r'http\S+', r'www\.\S+']:
+        email_body = re.sub(link_pattern, '', email_body)
+    email_body = re.sub(r'\S+@\S+', '', email_body)
+    if len(email_body) > max_length:
+        email_body = email_body[:max_length] + " ... [truncated]"
+    return email_body
+
+
+EDGE_CASES = [
+    "",
+    "   \n\t ",
+    "Thanks!\n\nOn Mon, Mar 2, 2026 at 9:00 AM Connor <c@x.com> wrote:\n> lunch?",
+    "Gracias\nEl lun, 2 mar 2026, Ana escribió:\n> hola",
+    "See below\n-----Original Message-----\nFrom: someone",
+    "Body\n________________________________\nFrom: A\nSent: today",
+    "Top\nFrom: Someone\nSent: Monday\nTo: me",
+    # A later pattern matching earlier in the text still loses to an earlier pattern.
+    "Intro\n-----Original Message-----\nMiddle\nOn Monday Bob wrote:\nquoted",
+    "ON FRIDAY\nSOMEONE WROTE: quoted",
+    "On\n\nwrote: nothing in between",
+    "Visit https://x.com/a?b=c or www.example.com/path and http://",
+    "www.http://a xhttp ahttpb www. www.a wwwx.y",
+    "mail me@example.com or @handle or a@ or @b or a@@ or x@y@z",
+    "prefixhttp://link.com/a@b suffix",
+    "tabs\tand\r\nnewlines and unicode　spaces",
+    "Smart quotes ’ and emoji \U0001F389 stay",
+    "DOTLESS ı and İstanbul Orıgınal Message ſent:",
+    "word " * 600,
+    "x" * 2500,
+    ("a " * 999) + "bb",
+    ("a " * 999) + "http://x b",
+]
+
+
+def _corpus() -> list:
+    bodies = list(EDGE_CASES)
+    for path in sorted(glob.glob("tests/mock_data/*.txt")):
+        with open(path) as f:
+            bodies.append(f.read())
+    bodies += [data["body"] for data in MOCK_EMAILS.values()]
+    rng = random.Random(15)
+    pieces = ["On", "wrote:", "El", "escribió:", "---", "Original Message", "_" * 32, "From:", "Sent:",
+              "http://a.b/c", "www.x.y", "www.", "http", "a@b.c", "@x", "word", "ſ", "ı", "\n", " ", "\t", " "]
+    for _ in range(500):
+        bodies.append("".join(rng.choice(pieces) + rng.choice(["", " ", "\n"]) for _ in range(rng.randint(0, 40))))
+    return bodies
+
+
+def test_matches_legacy_cleaner_on_corpus():
+    for body in _corpus():
+        for max_length in (2000, 500, 40, 3, 0):
+            assert clean_emails(body, max_length=max_length) == legacy_clean_emails(body, max_length=max_length), repr(body)
+
+
+def test_chunk_boundaries_do_not_change_output():
+    with mock.patch.object(gmail_helpers, "_CHUNK_FACTOR", 0), mock.patch.object(gmail_helpers, "_MIN_CHUNK", 7):
+        for body in _corpus():
+            assert clean_emails(body, max_length=60) == legacy_clean_emails(body, max_length=60), repr(body)
+
+
+def test_fold_fixes_cover_every_ignorecase_equivalent():
+    letters = "".join(sorted(set("".join(text for required in gmail_helpers._REPLY_REQUIRES for text in required))))
+    pattern = re.compile("[" + re.escape(letters) + "]", re.IGNORECASE)
+    for cp in range(sys.maxunicode + 1):
+        c = chr(cp)
+        if pattern.fullmatch(c) and c.lower() not in letters:
+            assert c in gmail_helpers._FOLD_FIXES, hex(cp)
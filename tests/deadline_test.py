@@ -0,0 +1,100 @@
+import time
+import anyio
+import pytest
+from unittest import mock
+from app import deadline, generation_layer, gmail_services, groq_client, main
+from app.deadline import DeadlineExceeded, request_deadline, stage_timeout
+
+
+def test_stage_timeouts_shrink_to_the_deadline():
+    assert stage_timeout(20) == 20
+    with request_deadline(0.2) as current:
+        assert stage_timeout(20) <= 0.2
+        time.sleep(0.25)
+        with pytest.raises(DeadlineExceeded):
+            stage_timeout(20)
+    assert current.exceeded
+
+
+def test_slow_groq_call_is_cut_at_the_deadline():
+    class SlowClient:
+        async def post(self, *args, **kwargs):
+            await anyio.sleep(5)
+
+    async def call():
+        with request_deadline(0.2) as current:
+            with pytest.raises(DeadlineExceeded):
+                await groq_client.achat_completion({"messages": []})
+            return current.exceeded
+
+    start = time.perf_counter()
+    with mock.patch.object(groq_client, "_get_async_client", return_value=SlowClient()):
+        assert anyio.run(call)
+    assert time.perf_counter() - start < 1
+
+
+def test_late_command_gets_spoken_fallback():
+    async def route(command, on_intent=None):
+        return {"intent": "gmail_check_sender", "arguments": {"sender_name": "Connor"}}
+
+    async def fetch(token):
+        return {"m1": {"from": "Connor <c@example.com>", "subject": "Lunch", "body": "Friday?"}}
+
+    async def summarize(emails, sender_name):
+        await anyio.sleep(5)
+
+    start = time.perf_counter()
+    with mock.patch.object(deadline, "REQUEST_DEADLINE", 0.3), \
+            mock.patch.dict(main._INTENT_FETCHES, {"gmail_check_sender": fetch}), \
+            mock.patch.object(main, "mapIntentWithArgumentsAsync", route), \
+            mock.patch.object(main, "summarize_sender_emails_async", summarize), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        reply = anyio.run(main.read_root, "Did Connor email me", "Bearer token-a")
+    assert reply == main.DEADLINE_REPLY
+    assert time.perf_counter() - start < 1
+
+
+def test_draft_selection_is_skipped_when_short_on_time():
+    calls = []
+
+    async def completion(data):
+        calls.append(data["model"])
+        return "Hi Sam,"
+
+    async def draft():
+        with request_deadline(1.0):
+            return await generation_layer.generate_draft_async("Sam", "lunch", generation_layer.DRAFT_BEST_OF_N)
+
+    with mock.patch.object(generation_layer, "achat_completion", completion), \
+            mock.patch.object(generation_layer, "BEST_OF_N_TIME", 0.5):
+        assert anyio.run(draft) == "Hi Sam,"
+    assert len(calls) == len(generation_layer.DRAFT_CONFIGS)
+
+
+def _late_draft(write_time: float) -> tuple:
+    written = []
+
+    async def route(command, on_intent=None):
+        return {"intent": "gmail_draft", "arguments": {"recipient_name": "Sam", "email_description": "lunch"}}
+
+    def upsert(body, access_token=None):
+        time.sleep(0.4)
+        written.append(body)
+        return True, "Draft created"
+
+    with mock.patch.object(deadline, "REQUEST_DEADLINE", 0.3), \
+            mock.patch.object(gmail_services, "GMAIL_WRITE_TIME", write_time), \
+            mock.patch.object(gmail_services, "upsert_draft", upsert), \
+            mock.patch.object(main, "mapIntentWithArgumentsAsync", route), \
+            mock.patch.object(main, "generate_draft_async", mock.AsyncMock(return_value="Hi Sam,")), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        reply = anyio.run(main.read_root, "Draft an email to Sam about lunch", "Bearer token-a")
+    return reply, written
+
+
+def test_draft_is_not_started_without_time_to_save_it():
+    assert _late_draft(write_time=1.0) == (main.DEADLINE_REPLY, [])
+
+
+def test_started_draft_is_not_followed_by_a_retry_prompt():
+    assert _late_draft(write_time=0.0) == (main.DEADLINE_WRITE_REPLY, ["Hi Sam,"])
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+from unittest import mock
+import anyio
+import pytest
+from app import main, generation_layer
+from app.groq_client import GroqAPIError
+from app.rate_limit import MemoryBackend
+
+
+def _clear():
+    main._demo_routes.clear()
+    main._demo_responses.clear()
+    main._demo_limiter.backend = MemoryBackend()
+
+
+def _chat(command):
+    request = SimpleNamespace(client=SimpleNamespace(host="127.0.0.1"))
+    return anyio.run(main.demo_chat, main.DemoChatRequest(command=command), request)
+
+
+def test_repeated_demo_command_makes_no_model_calls():
+    _clear()
+    parsed = {"intent": "gmail_summarize", "arguments": {"lookback_period_units": "hours", "lookback_period_value": 12}}
+    route = mock.AsyncMock(return_value=parsed)
+    summary = mock.AsyncMock(return_value="Connor asked about tonight.")
+    with mock.patch.object(main, "mapIntentWithArgumentsAsync", route), \
+            mock.patch.object(main, "prioritized_insights_async", summary), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        first = _chat("Summarize my emails")
+        second = _chat("summarize my emails.")
+    assert first == second == {"response": "Connor asked about tonight.", "mutation": None}
+    assert route.await_count == 1 and summary.await_count == 1
+
+
+def test_failed_response_is_not_cached():
+    _clear()
+    parsed = {"intent": "gmail_verification_code", "arguments": {}}
+    extract = mock.AsyncMock(side_effect=["Sorry, I'm having trouble right now.", "Your code is 847291."])
+    with mock.patch.object(main, "mapIntentWithArgumentsAsync", mock.AsyncMock(return_value=parsed)), \
+            mock.patch.object(main, "extract_verification_code_async", extract), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        _chat("What's my code?")
+        assert _chat("What's my code?")["response"] == "Your code is 847291."
+
+
+@pytest.mark.parametrize("command, parsed", [
+    ("Draft an email to Sam about lunch", {"intent": "gmail_draft", "arguments": {"recipient_name": "Sam", "email_description": "lunch"}}),
+    ("Reply to Connor saying yes", {"intent": "gmail_reply", "arguments": {"reply_recipient_name": "Connor", "email_description": "saying yes"}}),
+])
+def test_rate_limited_draft_or_reply_is_not_cached(command, parsed):
+    _clear()
+    limited = mock.AsyncMock(side_effect=GroqAPIError(429, "rate limited"))
+    with mock.patch.object(main, "mapIntentWithArgumentsAsync", mock.AsyncMock(return_value=parsed)), \
+            mock.patch.object(generation_layer, "achat_completion", limited), \
+            mock.patch.object(main, "find_reply_match_async", limited), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        response = _chat(command)
+    assert response == {"response": "Sorry, something went wrong. Please try again.", "mutation": None}
+    assert len(main._demo_responses) == 0
+
+
+def test_precompute_answers_sample_commands():
+    _clear()
+    route = mock.AsyncMock(return_value={"intent": "gmail_verification_code", "arguments": {}})
+    with mock.patch.object(main, "mapIntentWithArgumentsAsync", route), \
+            mock.patch.object(main, "extract_verification_code_async", mock.AsyncMock(return_value="Your code is 847291.")):
+        anyio.run(main._precompute_demo)
+    assert len(main._demo_routes) == len(main.DEMO_SAMPLE_COMMANDS)
+    assert len(main._demo_responses) == 1
+
+
+def test_dated_inbox_is_reused_within_a_minute():
+    first = main._demo_emails_with_dates()
+    first["e1"]["date"] = "changed"
+    second = main._demo_emails_with_dates()
+    assert second["e1"]["date"] != "changed"
+    assert set(main._demo_filter_emails(second, 1)) == {"e3", "e2"}
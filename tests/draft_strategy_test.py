@@ -0,0 +1,45 @@
+import asyncio
+from unittest import mock
+import anyio
+from app import generation_layer
+from app.generation_layer import DRAFT_FAST, DRAFT_HEDGED, generate_draft, generate_draft_async
+
+
+def _slow_completion(delays: dict, calls: list):
+    async def completion(data):
+        system_prompt = data["messages"][0]["content"]
+        variant = next(i for i, (prompt, _) in enumerate(generation_layer.DRAFT_CONFIGS) if prompt == system_prompt)
+        calls.append(variant)
+        await asyncio.sleep(delays[variant][0])
+        return delays[variant][1]
+    return completion
+
+
+def test_fast_makes_one_call():
+    with mock.patch.object(generation_layer, "achat_completion", mock.AsyncMock(return_value=" Hi Sam,\n\nBest,")) as completion:
+        assert generate_draft("Sam", "lunch", strategy=DRAFT_FAST) == "Hi Sam,\n\nBest,"
+    assert completion.call_count == 1
+
+
+def test_hedged_starts_backup_when_primary_is_slow():
+    calls = []
+    delays = {0: (1.0, "Hi Sam, slow."), 1: (0.01, "Hi Sam, quick."), 2: (0.01, "Hi Sam, warm.")}
+    with mock.patch.object(generation_layer, "achat_completion", _slow_completion(delays, calls)), \
+            mock.patch.object(generation_layer, "HEDGE_DELAY", 0.05), \
+            mock.patch.object(generation_layer, "_draft_latencies", []):
+        draft = anyio.run(generate_draft_async, "Sam", "lunch", DRAFT_HEDGED)
+    assert draft == "Hi Sam, quick."
+    assert calls == [0, 1]
+
+
+def test_hedged_skips_drafts_with_placeholders():
+    calls = []
+    delays = {0: (0.0, "Hi [Name],"), 1: (0.0, "Hi Sam,"), 2: (0.0, "Hello Sam,")}
+    with mock.patch.object(generation_layer, "achat_completion", _slow_completion(delays, calls)), \
+            mock.patch.object(generation_layer, "_draft_latencies", []):
+        assert anyio.run(generate_draft_async, "Sam", "lunch", DRAFT_HEDGED) == "Hi Sam,"
+    assert calls == [0, 1]
+
+
+def test_unknown_strategy_keeps_best_of_n():
+    assert generation_layer._draft_strategy("fastest") == generation_layer.DRAFT_BEST_OF_N
@@ -0,0 +1,34 @@
+import base64
+from app.gmail_helpers import body_budget, clean_emails, get_email_body
+
+
+def _part(mime_type: str, text: str, charset: str = "utf-8", **extra) -> dict:
+    headers = [{"name": "Content-Type", "value": f'{mime_type}; charset="{charset}"'}] + extra.pop("headers", [])
+    data = base64.urlsafe_b64encode(text.encode(charset)).decode()
+    return {"mimeType": mime_type, "headers": headers, "body": {"data": data}, **extra}
+
+
+def _multipart(mime_type: str, *parts) -> dict:
+    return {"mimeType": mime_type, "parts": list(parts)}
+
+
+def test_html_only_message_is_converted():
+    html = _part("text/html", "<html><head><style>p{color:red}</style></head><body><p>Your <b>midterm</b> moved to Friday.</p>"
+                              "<div class='gmail_quote'>On Monday Ana wrote:<blockquote>old text</blockquote></div></body></html>")
+    assert clean_emails(get_email_body(_multipart("multipart/alternative", html))) == "Your midterm moved to Friday."
+
+
+def test_nested_plain_part_wins_and_attachments_are_skipped():
+    attachment = _part("text/plain", "attachment text", headers=[{"name": "Content-Disposition", "value": "attachment"}], filename="notes.txt")
+    payload = _multipart("multipart/mixed", attachment,
+                         _multipart("multipart/related", _multipart("multipart/alternative",
+                                                                    _part("text/plain", "Café at noon?", charset="iso-8859-1"),
+                                                                    _part("text/html", "<p>ignored</p>"))))
+    assert get_email_body(payload) == "Café at noon?"
+
+
+def test_budget_bounds_decoding_without_splitting_characters():
+    payload = _part("text/plain", "é" * 50_000)
+    body = get_email_body(payload, max_bytes=body_budget(500))
+    assert set(body) == {"é"} and body_budget(500) <= len(body.encode()) < body_budget(500) + 3
+    assert get_email_body(payload) == "é" * 50_000
@@ -0,0 +1,28 @@
+from app import gmail_client
+from app.cache import LRUCache
+
+
+def test_repeat_token_reuses_service():
+    gmail_client._idle_services.clear()
+    with gmail_client.gmail_service("token-a") as first:
+        pass
+    with gmail_client.gmail_service("token-a") as second:
+        pass
+    assert second is first
+    assert gmail_client.cache_stats()["hits"] == 1
+
+
+def test_concurrent_leases_for_same_token_get_distinct_services():
+    gmail_client._idle_services.clear()
+    with gmail_client.gmail_service("token-b") as outer:
+        with gmail_client.gmail_service("token-b") as inner:
+            assert inner is not outer
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache and "b" not in cache
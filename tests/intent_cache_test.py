@@ -0,0 +1,63 @@
+import json
+from unittest import mock
+from app import intent_reasoning
+from app.intent_reasoning import normalize_command, intent_key
+
+
+def _clear():
+    intent_reasoning._intent_cache.clear()
+    intent_reasoning._argument_cache.clear()
+
+
+def test_keys_strip_case_punctuation_and_lead_in():
+    assert intent_key("Um, Reply to Connor!") == intent_key("reply to connor")
+    assert normalize_command("What's my code?") == "whats my code"
+    assert normalize_command("Reply to Connor, please!") == "reply to connor please"
+
+
+def test_filler_word_content_is_not_shared():
+    _clear()
+    responses = [json.dumps({"recipient_name": "Bob", "email_description": word}) for word in ("thanks", "okay")]
+    with mock.patch.object(intent_reasoning, "achat_completion", new_callable=mock.AsyncMock, side_effect=responses) as completion:
+        first = intent_reasoning.parseArguments("Draft an email to Bob saying thanks", "gmail_draft")
+        second = intent_reasoning.parseArguments("Draft an email to Bob saying okay", "gmail_draft")
+    assert (first["email_description"], second["email_description"]) == ("thanks", "okay")
+    assert completion.call_count == 2
+
+
+def test_repeated_phrasing_skips_round_trips():
+    _clear()
+    parsed = json.dumps({"intent": "gmail_check_sender", "arguments": {"sender_name": "Professor Chen"}})
+    with mock.patch.object(intent_reasoning, "fastpath_intent", return_value=None), \
+            mock.patch.object(intent_reasoning, "achat_completion", new_callable=mock.AsyncMock, return_value=parsed) as completion:
+        first = intent_reasoning.mapIntentWithArguments("Did Professor Chen email me?")
+        second = intent_reasoning.mapIntentWithArguments("did professor chen email me")
+    assert first == second == {"intent": "gmail_check_sender", "arguments": {"sender_name": "Professor Chen"}}
+    assert completion.call_count == 1
+    stats = intent_reasoning.intent_cache_stats()
+    assert stats["intent"]["hits"] == 1 and stats["arguments"]["hits"] == 1
+
+
+def test_time_dependent_arguments_are_parsed_again():
+    _clear()
+    arguments = json.dumps({"lookback_period_units": "hours", "lookback_period_value": 3})
+    with mock.patch.object(intent_reasoning, "achat_completion", new_callable=mock.AsyncMock, return_value=arguments) as completion:
+        intent_reasoning.parseArguments("Summarize my emails since this morning", "gmail_summarize")
+        intent_reasoning.parseArguments("Summarize my emails since this morning", "gmail_summarize")
+    assert completion.call_count == 2
+
+
+def test_invalid_intent_is_not_cached():
+    _clear()
+    with mock.patch.object(intent_reasoning, "achat_completion", new_callable=mock.AsyncMock, side_effect=["I think gmail", "gmail_draft"]) as completion:
+        intent_reasoning.mapIntent("write something", use_fastpath=False)
+        assert intent_reasoning.mapIntent("write something", use_fastpath=False) == "gmail_draft"
+        assert intent_reasoning.mapIntent("Write something.", use_fastpath=False) == "gmail_draft"
+    assert completion.call_count == 2
+
+
+def test_cached_requests_are_deterministic():
+    requests = [intent_reasoning._map_intent_request("reply to connor", intent_reasoning.intent_descriptions),
+                intent_reasoning._parse_arguments_request("reply to connor", "gmail_reply"),
+                intent_reasoning._intent_with_arguments_request("reply to connor")]
+    assert [request.get("temperature") for request in requests] == [0.0, 0.0, 0.0]
@@ -0,0 +1,26 @@
+import pytest
+from app.intent_reasoning import fastpath_intent
+
+
+@pytest.mark.parametrize("command, expected_intent", [
+    ("Summarize my emails", "gmail_summarize"),
+    ("Summer eyes my inbox", "gmail_summarize"),
+    ("What's my verification code?", "gmail_verification_code"),
+    ("Find my OTP", "gmail_verification_code"),
+])
+def test_unambiguous_commands_answered_locally(command, expected_intent):
+    assert fastpath_intent(command) == expected_intent
+
+
+@pytest.mark.parametrize("command", [
+    "Tell me a joke",
+    "Set an alarm for 8am",
+    "Reach out to the person from earlier",
+    "Cancel my draft",
+    "Send my draft",
+    "Archive my emails",
+    "Delete my verification code email",
+    "Draft an email to Professor Chen about the midterm",
+])
+def test_unclear_commands_defer_to_llm(command):
+    assert fastpath_intent(command) is None
@@ -0,0 +1,101 @@
+import time
+import pytest
+from unittest import mock
+from app import gmail_client, mailbox_sync
+from app import gmail_services
+from app.utils import hash_token
+from app.gmail_services import get_emails, get_recent_all_emails, get_unread, until_sender_matches
+from app.verification_codes import has_verification_code
+from tests.benchmarks.fake_gmail import FakeGmailServer, make_message
+
+
+@pytest.fixture
+def server():
+    mailbox_sync.clear()
+    gmail_client._idle_services.clear()
+    with FakeGmailServer([make_message(i, f"Body of message {i}.") for i in range(5)], latency=0) as server:
+        with mock.patch.object(gmail_client, "GMAIL_DISCOVERY_DOC", server.discovery_document()):
+            yield server
+    gmail_client._idle_services.clear()
+
+
+def test_repeat_on_unchanged_inbox_costs_one_history_call(server):
+    first = get_emails(hours_back=24, max_results=15, access_token="token-a")
+    server.reset_counters()
+    second = get_emails(hours_back=24, max_results=15, access_token="token-a")
+    assert second == first
+    assert server.round_trips == 1
+
+
+def test_new_message_is_fetched_alone(server):
+    get_emails(hours_back=24, max_results=15, access_token="token-a")
+    server.add_message(make_message(9, "Lunch on Friday?", minutes_ago=0))
+    server.reset_counters()
+    emails = get_emails(hours_back=24, max_results=15, access_token="token-a")
+    assert list(emails)[0] == "m0009"
+    assert len(emails) == 6
+    assert server.round_trips == 2  # history.list + one batch holding the new message
+
+
+def test_deletes_and_label_changes_are_applied(server):
+    get_unread(hours_back=24, max_results=5, access_token="token-a")
+    server.delete_message("m0001")
+    server.modify_labels("m0002", remove=["UNREAD"])
+    emails = get_unread(hours_back=24, max_results=5, access_token="token-a")
+    assert set(emails) == {"m0000", "m0003", "m0004"}
+
+
+def test_expired_history_resyncs(server):
+    get_emails(hours_back=24, max_results=15, access_token="token-a")
+    server.expire_history()
+    server.add_message(make_message(9, "Lunch on Friday?", minutes_ago=0))
+    emails = get_emails(hours_back=24, max_results=15, access_token="token-a")
+    assert "m0009" in emails
+
+
+def test_masked_fetch_keeps_what_the_app_reads(server):
+    noisy = make_message(7, "Quarterly update inside.", html="<p>" + "x" * 5000 + "</p>",
+                         extra_headers=[{"name": "Received", "value": "from mx.example.com"}] * 20)
+    server.add_message(noisy)
+    service = server.build_service()
+    full = service.users().messages().get(userId='me', id="m0007", format='full').execute()
+    masked = mailbox_sync._fetch_messages(service, ["m0007"])["m0007"]
+    assert [h['name'] for h in masked['payload']['headers']] == ["From", "Subject", "Date", "Message-ID"]  # make_message has no top-level Content-Type
+    assert masked['labelIds'] == full['labelIds'] and masked['internalDate'] == full['internalDate']
+    assert get_emails(hours_back=24, max_results=15, access_token="token-a")["m0007"]["body"] == "Quarterly update inside."
+
+
+def test_streaming_stops_at_newest_code(server):
+    server.add_message(make_message(8, "Your verification code is 482913.", subject="Sign-in code", minutes_ago=1))
+    server.add_message(make_message(9, "Your verification code is 771204.", subject="Sign-in code", minutes_ago=3))
+    with mock.patch.object(gmail_services, "get_email_body", wraps=gmail_services.get_email_body) as decode:
+        emails = get_recent_all_emails(minutes_back=10, access_token="token-a", stop=has_verification_code)
+    assert list(emails) == ["m0000", "m0008"]
+    assert decode.call_count == 2
+
+
+def test_sender_check_stops_after_enough_matches(server):
+    emails = get_emails(hours_back=24, max_results=15, access_token="token-a", stop=until_sender_matches("Connor", enough=2))
+    assert list(emails) == ["m0000", "m0001"]
+    assert set(get_unread(hours_back=24, max_results=5, access_token="token-a")["m0002"]) == {"from", "from-email", "subject", "body", "rfc-id"}
+
+
+def test_exhaustive_listing_drops_messages_older_than_the_window(server):
+    service, now = server.build_service(), int(time.time())
+    mailbox_sync.recent_messages(service, "token-a", mailbox_sync.ALL_MAIL, now - 10 * 60, 25)
+    server.add_message(make_message(9, "Your verification code is 482913.", minutes_ago=0))
+    with mock.patch.object(mailbox_sync.time, "time", return_value=now + 5 * 60):
+        emails = mailbox_sync.recent_messages(service, "token-a", mailbox_sync.ALL_MAIL, now - 5 * 60, 25)
+    assert list(emails) == ["m0009", "m0000"]
+    mailbox = mailbox_sync._mailboxes.get(hash_token("token-a"))
+    assert mailbox.listings[mailbox_sync.ALL_MAIL.query].ids == ["m0009", "m0000"]
+    assert "m0001" not in mailbox.messages
+
+
+def test_narrow_window_keeps_the_wider_one_sharing_its_view(server):
+    server.add_message(make_message(8, "Notes from last week's section.", minutes_ago=24 * 60))
+    get_emails(hours_back=72, max_results=15, access_token="token-a")
+    get_emails(hours_back=12, max_results=15, access_token="token-a")
+    server.reset_counters()
+    assert len(get_emails(hours_back=72, max_results=15, access_token="token-a")) == 6
+    assert server.round_trips == 1
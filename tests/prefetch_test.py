@@ -0,0 +1,48 @@
+import anyio
+from unittest import mock
+from app import main
+
+
+def _run_command(command: str, guess: str, intent: str, arguments: dict):
+    events = []
+
+    def fetcher(name):
+        async def fetch(token):
+            events.append(f"{name} fetch started")
+            await anyio.sleep(0.05)
+            events.append(f"{name} fetch done")
+            return {"m1": {"from": "Connor <c@example.com>", "subject": "Lunch", "body": "Friday?"}}
+        return fetch
+
+    async def route(command, on_intent=None):
+        on_intent(intent)
+        await anyio.sleep(0.05)  # argument parsing
+        events.append("arguments parsed")
+        return {"intent": intent, "arguments": arguments}
+
+    async def summarize(emails, sender_name):
+        events.append(f"summarized {len(emails)}")
+        return "Connor asked about lunch."
+
+    fetches = {name: fetcher(name) for name in main._INTENT_FETCHES}
+    with mock.patch.dict(main._INTENT_FETCHES, fetches), \
+            mock.patch.object(main, "fastpath_intent", return_value=guess), \
+            mock.patch.object(main, "mapIntentWithArgumentsAsync", route), \
+            mock.patch.object(main, "summarize_sender_emails_async", summarize), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        reply = anyio.run(main.read_root, command, "Bearer token-a")
+    return reply, events
+
+
+def test_fetch_overlaps_argument_parsing():
+    reply, events = _run_command("Did Connor email me", "gmail_check_sender", "gmail_check_sender", {"sender_name": "Connor"})
+    assert reply == "Connor asked about lunch."
+    assert events == ["gmail_check_sender fetch started", "arguments parsed", "gmail_check_sender fetch done", "summarized 1"]
+
+
+def test_wrong_guess_is_dropped():
+    reply, events = _run_command("Did Connor email me", "gmail_reply", "gmail_check_sender", {"sender_name": "Connor"})
+    assert reply == "Connor asked about lunch."
+    # The speculative reply fetch is cancelled once the intent is known and the sender fetch starts instead.
+    assert "gmail_reply fetch done" not in events
+    assert events[-2:] == ["gmail_check_sender fetch done", "summarized 1"]
@@ -0,0 +1,70 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from app import generation_layer
+from app.generation_layer import estimate_tokens, pack_emails
+from app.demo_data import MOCK_EMAILS
+
+
+def _email(sender, subject, body, hours_ago=1):
+    sent = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+    return {"from": sender, "subject": subject, "body": body, "date": format_datetime(sent)}
+
+
+def _big_inbox(n=30):
+    inbox = {f"n{i}": _email("Weekly Digest <newsletter@deals.example.com>", "This week's top picks",
+                              "Save big on everything. " * 200, hours_ago=2 + i) for i in range(n)}
+    inbox["p1"] = _email("Connor Smith <connor@ucsb.edu>", "Re: lunch on Friday?",
+                         "Are we still on for lunch on Friday? " * 40, hours_ago=1)
+    return inbox
+
+
+def test_small_inbox_is_unchanged():
+    inbox = {mid: {**data, "date": "Mon, 2 Mar 2026 09:00:00 +0000"} for mid, data in MOCK_EMAILS.items()}
+    packed, tokens = pack_emails(inbox, 3000)
+    assert packed is inbox
+    assert tokens > 0
+
+
+def test_budget_is_respected_and_order_kept():
+    inbox = _big_inbox()
+    packed, tokens = pack_emails(inbox, 3000)
+    assert tokens <= 3000
+    assert list(packed) == [mid for mid in inbox if mid in packed]
+    prompt = generation_layer._prioritized_insights_request(inbox)["messages"][1]["content"]
+    assert estimate_tokens(prompt) < 3000 + 400  # plus the temporal notes and "Today is" line
+
+
+def test_important_email_keeps_more_body():
+    packed, _ = pack_emails(_big_inbox(), 2500)
+    assert all(data["body"].endswith("[truncated]") for data in packed.values())
+    assert len(packed["p1"]["body"]) > 3 * max(len(data["body"]) for mid, data in packed.items() if mid != "p1")
+    packed, _ = pack_emails(_big_inbox(5), 2500)
+    assert packed["p1"]["body"] == _big_inbox()["p1"]["body"]
+
+
+def test_headers_overflow_drops_lowest_priority():
+    packed, tokens = pack_emails(_big_inbox(), 300)
+    assert "p1" in packed and len(packed) < 31
+    assert tokens <= 300
+
+
+def test_sender_priority_favours_matching_from():
+    inbox = _big_inbox()
+    with mock.patch.object(generation_layer, "SENDER_PROMPT_TOKENS", 1000):
+        prompt = generation_layer._summarize_sender_emails_request(inbox, "Connor")["messages"][1]["content"]
+    bodies = [block.partition("Body: ")[2] for block in prompt.split("---\n")]
+    connor = next(body for block, body in zip(prompt.split("---\n"), bodies) if "Connor Smith" in block)
+    assert len(connor) > 2 * max(len(body) for block, body in zip(prompt.split("---\n"), bodies) if "Digest" in block)
+
+
+def test_packing_is_stable_within_the_hour():
+    inbox = _big_inbox()
+    start = datetime.now(timezone.utc).replace(minute=5, second=0, microsecond=0)
+
+    def packed_at(now):
+        with mock.patch.object(generation_layer, "datetime", wraps=datetime) as clock:
+            clock.now.return_value = now
+            return pack_emails(inbox, 2500)[0]
+
+    assert packed_at(start) == packed_at(start + timedelta(minutes=50))
@@ -0,0 +1,91 @@
+import threading
+from unittest import mock
+import anyio
+from app import main
+from app.rate_limit import RateLimiter, MemoryBackend, StoreBackend, default_backend
+
+
+class StandInStore:
+    """The subset of Redis StoreBackend uses, shared by every 'worker' in a test."""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + 1
+            return self.values[key]
+
+    def decr(self, key):
+        with self._lock:
+            self.values[key] -= 1
+            return self.values[key]
+
+    def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+    def expire(self, key, seconds):
+        self.expiry[key] = seconds
+
+
+def _at(seconds):
+    return mock.patch("app.rate_limit.time.time", return_value=seconds)
+
+
+def test_limit_holds_across_the_window_boundary():
+    limiter = RateLimiter("t", limit=10, window=3600, backend=MemoryBackend())
+    with _at(3600 * 10 + 3000):
+        assert all(limiter.hit("1.2.3.4")[0] for _ in range(10))
+        allowed, retry_after = limiter.hit("1.2.3.4")
+        assert not allowed and retry_after > 0
+        assert limiter.hit("5.6.7.8")[0]
+    # A fixed window would reset here; the sliding estimate still counts most of the burst.
+    with _at(3600 * 11 + 60):
+        assert not limiter.hit("1.2.3.4")[0]
+    with _at(3600 * 10 + 3000 + retry_after + 1):
+        assert limiter.hit("1.2.3.4")[0]
+
+
+def test_idle_keys_are_evicted():
+    backend = MemoryBackend(max_keys=1000)
+    limiter = RateLimiter("t", limit=10, window=60, backend=backend)
+    with _at(0):
+        for i in range(500):
+            limiter.hit(f"ip-{i}")
+    with _at(121):
+        limiter.hit("late")
+    assert len(backend) == 1
+
+
+def test_shared_store_limits_all_workers_together():
+    store = StandInStore()
+    workers = [RateLimiter("demo", limit=10, window=3600, backend=StoreBackend(store)) for _ in range(3)]
+    with _at(100):
+        admitted = sum(workers[i % 3].hit("1.2.3.4")[0] for i in range(30))
+    assert admitted == 10
+    assert set(store.expiry.values()) == {7201}
+
+
+def test_unreachable_store_admits():
+    store = mock.MagicMock()
+    store.incr.side_effect = ConnectionError("refused")
+    assert RateLimiter("t", limit=1, window=60, backend=StoreBackend(store)).hit("k") == (True, 0.0)
+
+
+def test_redis_url_without_redis_falls_back_to_memory():
+    with mock.patch("app.rate_limit.RATE_LIMIT_REDIS_URL", "redis://localhost:6379"), \
+            mock.patch.dict("sys.modules", {"redis": None}):
+        assert isinstance(default_backend(), MemoryBackend)
+
+
+def test_streaming_endpoint_is_limited_too():
+    limiter = RateLimiter("gmail", limit=1, window=60, backend=MemoryBackend())
+    with mock.patch.object(main, "_gmail_limiter", limiter), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        anyio.run(main.stream_command, "summarize my emails", "Bearer token")
+        refused = anyio.run(main.stream_command, "summarize my emails", "Bearer token")
+    assert refused.status_code == 429
+    assert int(refused.headers["Retry-After"]) >= 1
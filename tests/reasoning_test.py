@@ -1,5 +1,5 @@
 import pytest
-from app.intent_reasoning import mapIntent, parseArguments
+from app.intent_reasoning import mapIntent, parseArguments, mapIntentWithArguments
 from app.utils import calculate_seconds
 import time
 
@@ -233,3 +233,34 @@ def test_parse_arguments_lookback_period(command, intent, expected_seconds):
         result["lookback_period_units"]
     )
     assert actual_seconds == expected_seconds
+
+
+
+
+@pytest.mark.parametrize("command, expected_intent, expected_seconds", [
+    ("Summarize my emails", "gmail_summarize", 43200),
+    ("Summer eyes my emails from the past 2 days", "gmail_summarize", 172800),
+    ("What happened in the last 3 hours", "gmail_summarize", 10800),
+])
+def test_map_intent_with_arguments_lookback(command, expected_intent, expected_seconds):
+    result = mapIntentWithArguments(command)
+    time.sleep(2)
+    assert result["intent"] == expected_intent
+    assert calculate_seconds(
+        result["arguments"]["lookback_period_value"],
+        result["arguments"]["lookback_period_units"]
+    ) == expected_seconds
+
+
+@pytest.mark.parametrize("command, expected_intent", [
+    ("Write an email to Dr. Keaney asking her to get lunch", "gmail_draft"),
+    ("Reply to Connor telling him that I am available", "gmail_reply"),
+    ("Did Professor Kim email me?", "gmail_check_sender"),
+    ("What's my verification code?", "gmail_verification_code"),
+    ("Play some music on Spotify", "none"),
+])
+def test_map_intent_with_arguments_keys(command, expected_intent):
+    result = mapIntentWithArguments(command)
+    time.sleep(2)
+    assert result["intent"] == expected_intent
+    assert sorted(result["arguments"]) == sorted(intent_arguments.get(expected_intent, []))
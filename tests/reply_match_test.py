@@ -0,0 +1,42 @@
+from unittest import mock
+from app import gmail_reasoning
+from app.demo_data import MOCK_EMAILS
+from app.gmail_reasoning import bm25_scores, find_reply_match
+
+
+def _compact(emails):
+    return {mid: {"from": d["from"], "subject": d["subject"], "snippet": d["snippet"]} for mid, d in emails.items()}
+
+
+def test_bm25_prefers_overlapping_document():
+    scores = bm25_scores("moving the lunch meeting to Friday", {
+        "a": "Lunch on Friday? Want to grab lunch after class?",
+        "b": "Problem set 3 is due this Friday",
+        "c": "Your order has shipped",
+    })
+    assert scores["a"] > scores["b"] > scores["c"] == 0
+
+
+def test_single_sender_is_picked_without_llm():
+    with mock.patch.object(gmail_reasoning, "achat_completion", new_callable=mock.AsyncMock) as completion:
+        assert find_reply_match(_compact(MOCK_EMAILS), "Conner", "telling him I'll be at the study session") == "e2"
+    completion.assert_not_called()
+
+
+def test_same_sender_is_split_by_description():
+    emails = {
+        "a": {"from": "Connor Walsh <connorw@gmail.com>", "subject": "Lunch on Friday?", "snippet": "Want to get lunch Friday?"},
+        "b": {"from": "Connor Walsh <connorw@gmail.com>", "subject": "Intramural soccer", "snippet": "Game moved to Sunday."},
+    }
+    with mock.patch.object(gmail_reasoning, "achat_completion", new_callable=mock.AsyncMock) as completion:
+        assert find_reply_match(emails, "Connor", "saying the soccer game on Sunday works") == "b"
+    completion.assert_not_called()
+
+
+def test_ambiguous_match_sends_top_candidates():
+    emails = {f"m{i}": {"from": f"Person {i} <p{i}@gmail.com>", "subject": "Club meeting", "snippet": "See you there."}
+              for i in range(8)}
+    with mock.patch.object(gmail_reasoning, "achat_completion", new_callable=mock.AsyncMock, return_value="m1") as completion:
+        assert find_reply_match(emails, "the club president", "about the club meeting") == "m1"
+    prompt = completion.call_args.args[0]["messages"][1]["content"]
+    assert prompt.count("Person") == gmail_reasoning.REPLY_CANDIDATES
@@ -0,0 +1,39 @@
+from unittest import mock
+from app import generation_layer
+from app.cache import LRUCache
+from app.demo_data import MOCK_EMAILS
+
+
+def _inbox():
+    return {mid: {**data, "date": "Mon, 2 Mar 2026 09:00:00 +0000"} for mid, data in MOCK_EMAILS.items()}
+
+
+def test_unchanged_inbox_skips_llm():
+    generation_layer._result_cache.clear()
+    with mock.patch.object(generation_layer, "achat_completion", new_callable=mock.AsyncMock, return_value=" Summary. ") as completion:
+        first = generation_layer.prioritized_insights(_inbox())
+        second = generation_layer.prioritized_insights(_inbox())
+    assert first == second == "Summary."
+    assert completion.call_count == 1
+    assert generation_layer.result_cache_stats()["hits"] == 1
+
+
+def test_changed_inbox_or_sender_misses():
+    generation_layer._result_cache.clear()
+    changed = _inbox()
+    changed["e1"] = {**changed["e1"], "body": "A different body."}
+    with mock.patch.object(generation_layer, "achat_completion", new_callable=mock.AsyncMock, return_value="Summary.") as completion:
+        generation_layer.prioritized_insights(_inbox())
+        generation_layer.prioritized_insights(changed)
+        generation_layer.summarize_sender_emails(_inbox(), "Mom")
+        generation_layer.summarize_sender_emails(_inbox(), "Professor Chen")
+    assert completion.call_count == 4
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(maxsize=2, ttl=60)
+    with mock.patch("app.cache.time.monotonic", return_value=0):
+        cache.set("a", 1)
+    with mock.patch("app.cache.time.monotonic", return_value=61):
+        assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,38 @@
+from unittest import mock
+from app import generation_layer
+from app.demo_data import MOCK_EMAILS
+from app.sender_match import match_sender, soundex
+from app.generation_layer import summarize_sender_emails
+
+
+def test_loose_transcriptions_match():
+    for query, expected in [("Conner", {"e2"}), ("professor chin", {"e1"}), ("Dr. Chen", {"e1"}),
+                            ("the financial aid office", {"e4"}), ("amazon", {"e5"}), ("mom", {"e6"})]:
+        assert set(match_sender(query, MOCK_EMAILS)) == expected, query
+
+
+def test_phonetic_key_uses_first_sound():
+    assert soundex("kristen") == soundex("christine")
+    assert soundex("stephen") == soundex("steven")
+    assert soundex("kim") != soundex("chen")
+
+
+def test_closest_sender_wins():
+    inbox = {"a": {"from": "Megan Lee <megan@gmail.com>"}, "b": {"from": "Rachel Nguyen <rnguyen@gmail.com>"}}
+    assert set(match_sender("Megan", inbox)) == {"a"}
+
+
+def test_relationship_names_are_left_to_the_llm():
+    assert match_sender("my advisor", MOCK_EMAILS) is None
+    assert match_sender("Jessica Park", MOCK_EMAILS) == {}
+
+
+def test_only_matches_reach_the_llm():
+    generation_layer._result_cache.clear()
+    with mock.patch.object(generation_layer, "achat_completion", new_callable=mock.AsyncMock, return_value="Connor asked about tonight.") as completion:
+        summarize_sender_emails(MOCK_EMAILS, "Connor")
+        reply = summarize_sender_emails(MOCK_EMAILS, "Jessica Park")
+    assert completion.call_count == 1
+    prompt = completion.call_args.args[0]["messages"][1]["content"]
+    assert "[Email 1]" in prompt and "[Email 2]" not in prompt
+    assert reply == "I didn't find any recent emails from Jessica Park."
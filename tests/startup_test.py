@@ -0,0 +1,29 @@
+from app.startup_profile import LAZY_MODULES, STARTUP_IMPORT_BUDGET_MS, loaded_modules, measure_import
+
+
+def test_import_app_main_within_budget():
+    assert measure_import("app.main") <= STARTUP_IMPORT_BUDGET_MS
+
+
+def test_heavy_dependencies_stay_lazy():
+    assert not set(LAZY_MODULES) & loaded_modules("app.main")
+
+
+def test_posthog_client_is_built_once_under_concurrent_first_use():
+    import threading
+    import time
+    from unittest import mock
+    from app.analytics import LazyPosthog
+
+    def slow_posthog(**kwargs):
+        time.sleep(0.05)
+        return mock.Mock()
+
+    lazy = LazyPosthog()
+    with mock.patch("posthog.Posthog", side_effect=slow_posthog) as build, mock.patch("atexit.register"):
+        threads = [threading.Thread(target=lambda: lazy.capture) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert build.call_count == 1
@@ -0,0 +1,68 @@
+import json
+import anyio
+from unittest import mock
+from app.rate_limit import MemoryBackend
+from app import generation_layer, main
+from app.groq_client import GroqAPIError
+from app.demo_data import MOCK_EMAILS
+
+
+def _inbox():
+    return {mid: {**data, "date": "Mon, 2 Mar 2026 09:00:00 +0000"} for mid, data in MOCK_EMAILS.items()}
+
+
+async def _tokens(data):
+    for token in [" Connor", " asked", " about", " lunch."]:
+        yield token
+
+
+async def _cut_off(data):
+    for token in [" Connor", " asked"]:
+        yield token
+    raise GroqAPIError(503, "connection reset")
+
+
+async def _drain(agen) -> list:
+    return [chunk async for chunk in agen]
+
+
+def _events(raw: list) -> list:
+    return [json.loads(line[len("data: "):]) for event in raw for line in event.splitlines() if line.startswith("data: ")]
+
+
+def test_streamed_summary_is_cached_for_the_plain_endpoint():
+    generation_layer._result_cache.clear()
+    with mock.patch.object(generation_layer, "astream_chat_completion", _tokens):
+        chunks = anyio.run(_drain, generation_layer.prioritized_insights_stream(_inbox()))
+    assert "".join(chunks) == "Connor asked about lunch."
+    with mock.patch.object(generation_layer, "achat_completion") as completion:
+        assert anyio.run(generation_layer.prioritized_insights_async, _inbox()) == "Connor asked about lunch."
+    completion.assert_not_called()
+
+
+def test_demo_stream_sends_tokens_then_done():
+    generation_layer._result_cache.clear()
+    main._demo_limiter.backend = MemoryBackend()
+    main._demo_routes.clear()
+    main._demo_responses.clear()
+    parsed = {"intent": "gmail_check_sender", "arguments": {"sender_name": "Connor"}}
+    with mock.patch.object(main, "mapIntentWithArgumentsAsync", mock.AsyncMock(return_value=parsed)), \
+            mock.patch.object(generation_layer, "astream_chat_completion", _tokens), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        events = _events(anyio.run(_drain, main._demo_stream("Did Connor email me", "127.0.0.1")))
+    assert [e["token"] for e in events[:-1]] == ["Connor", " asked", " about", " lunch."]
+    assert events[-1] == {"response": "Connor asked about lunch.", "mutation": None}
+
+
+def test_demo_stream_cut_off_partway_is_not_cached():
+    generation_layer._result_cache.clear()
+    main._demo_limiter.backend = MemoryBackend()
+    main._demo_routes.clear()
+    main._demo_responses.clear()
+    parsed = {"intent": "gmail_check_sender", "arguments": {"sender_name": "Connor"}}
+    with mock.patch.object(main, "mapIntentWithArgumentsAsync", mock.AsyncMock(return_value=parsed)), \
+            mock.patch.object(generation_layer, "astream_chat_completion", _cut_off), \
+            mock.patch.object(main, "posthog_client", mock.MagicMock()):
+        events = _events(anyio.run(_drain, main._demo_stream("Did Connor email me", "127.0.0.1")))
+    assert events[-1] == {"response": "Connor asked", "mutation": None}
+    assert len(main._demo_responses) == 0
@@ -0,0 +1,57 @@
+from unittest import mock
+from app import generation_layer, gmail_client, mailbox_sync
+from app.gmail_services import TRIAGE_KEEP, TRIAGE_SKIP, get_emails, triage
+from app.generation_layer import estimate_tokens, prioritized_insights
+from tests.benchmarks.fake_gmail import FakeGmailServer, make_message
+
+PERSONAL = ["INBOX", "CATEGORY_PERSONAL"]
+
+
+def test_header_signals():
+    assert triage({"From": "Connor Walsh <connorw@gmail.com>"}, PERSONAL) == TRIAGE_KEEP
+    assert triage({"From": "Deals <deals@shop.com>", "List-Unsubscribe": "<mailto:u@shop.com>"}, PERSONAL) == TRIAGE_SKIP
+    assert triage({"From": "List <l@lists.edu>", "Precedence": "bulk"}, PERSONAL) == TRIAGE_SKIP
+    assert triage({"From": "Canvas <canvas@ucsb.edu>", "Auto-Submitted": "auto-generated"}, PERSONAL) == TRIAGE_SKIP
+    assert triage({"From": "Canvas <canvas@ucsb.edu>", "Auto-Submitted": "no"}, PERSONAL) == TRIAGE_KEEP
+    assert triage({"From": "GitHub <noreply@github.com>"}, PERSONAL) == TRIAGE_SKIP
+    assert triage({"From": "Newsroom <newsroom@ucsb.edu>"}, PERSONAL) == TRIAGE_KEEP
+    assert triage({"From": "Shop <hello@shop.com>"}, ["INBOX", "CATEGORY_PROMOTIONS"]) == TRIAGE_SKIP
+
+
+def _inbox(skip_count):
+    inbox = {f"n{i}": {"from": f"Store {i} <deals@store{i}.com>", "subject": "Big sale", "body": "Save big. " * 150,
+                       "date": "Mon, 2 Mar 2026 09:00:00 +0000", "triage": TRIAGE_SKIP} for i in range(skip_count)}
+    inbox["p1"] = {"from": "Connor Walsh <connorw@gmail.com>", "subject": "Lunch?", "body": "Lunch on Friday?",
+                   "date": "Mon, 2 Mar 2026 10:00:00 +0000", "triage": TRIAGE_KEEP}
+    return inbox
+
+
+def test_skipped_mail_becomes_a_tally():
+    inbox = _inbox(6)
+    kept, skipped = generation_layer.triage_emails(inbox)
+    prompt = generation_layer._prioritized_insights_request(kept, skipped)["messages"][1]["content"]
+    assert "Save big" not in prompt
+    assert "Also received 6 newsletter or automated emails" in prompt and "Store 0, Store 1, Store 2, Store 3 and others" in prompt
+    assert estimate_tokens(prompt) * 4 < estimate_tokens(generation_layer._prioritized_insights_request(inbox)["messages"][1]["content"])
+
+
+def test_bulk_only_inbox_skips_llm():
+    inbox = _inbox(2)
+    del inbox["p1"]
+    with mock.patch.object(generation_layer, "achat_completion", new_callable=mock.AsyncMock) as completion:
+        reply = prioritized_insights(inbox)
+    completion.assert_not_called()
+    assert reply == "Only newsletters and automated emails came in, from Store 0 and Store 1. Nothing needs your attention right now."
+
+
+def test_triage_headers_survive_the_masked_fetch():
+    mailbox_sync.clear()
+    gmail_client._idle_services.clear()
+    messages = [make_message(0, "Lunch on Friday?"),
+                make_message(1, "Save big.", sender="Deals <deals@shop.com>",
+                             extra_headers=[{"name": "List-Unsubscribe", "value": "<mailto:u@shop.com>"}])]
+    with FakeGmailServer(messages, latency=0) as server, \
+            mock.patch.object(gmail_client, "GMAIL_DISCOVERY_DOC", server.discovery_document()):
+        emails = get_emails(hours_back=24, access_token="token-a")
+    gmail_client._idle_services.clear()
+    assert {msg_id: data["triage"] for msg_id, data in emails.items()} == {"m0000": TRIAGE_KEEP, "m0001": TRIAGE_SKIP}
@@ -0,0 +1,57 @@
+import pytest
+from app.generation_layer import extract_verification_code
+from app.verification_codes import find_verification_code
+
+
+def _inbox(*emails):
+    return {f"m{i}": {"from": sender, "subject": subject, "body": body} for i, (sender, subject, body) in enumerate(emails)}
+
+
+@pytest.mark.parametrize("emails, expected_code, expected_sender", [
+    (_inbox(("Google <no-reply@accounts.google.com>", "Your Google verification code",
+             "Your Google verification code is 847291. This code expires in 10 minutes.")), "847291", "Google"),
+    (_inbox(("Google <no-reply@accounts.google.com>", "G-482913 is your Google verification code",
+             "Use this code to finish signing in.")), "482913", "Google"),
+    (_inbox(("noreply@slack.com", "Slack confirmation code: 482-913",
+             "Your confirmation code is below. 482-913")), "482913", "Slack"),
+    (_inbox(("Epic Games <help@epicgames.com>", "Your security code: K7Q2XZ",
+             "Your security code is K7Q2XZ. It expires in 15 minutes.")), "K7Q2XZ", "Epic Games"),
+    # The copyright year is not a second candidate.
+    (_inbox(("Acme <a@acme.com>", "Sign in to Acme",
+             "Your login code is 5512. Copyright 2025 Acme Inc.")), "5512", "Acme"),
+    # A newer order confirmation doesn't hide the real code behind it.
+    (_inbox(("Amazon <auto-confirm@amazon.com>", "Your Amazon.com order", "Confirmation number 8472910. Thanks for your order."),
+            ("Google <no-reply@accounts.google.com>", "Your Google verification code",
+             "Your Google verification code is 551902.")), "551902", "Google"),
+])
+def test_single_code_found_locally(emails, expected_code, expected_sender):
+    candidate = find_verification_code(emails)
+    assert candidate["code"] == expected_code
+    assert candidate["sender"] == expected_sender
+
+
+@pytest.mark.parametrize("emails", [
+    # Two services sent codes: the LLM decides which one the user wants.
+    _inbox(("Google <a@google.com>", "Your code", "Your verification code is 111222."),
+           ("Amazon <a@amazon.com>", "One-time password", "Your OTP is 333444.")),
+    # Promo codes look like alphanumeric OTPs; without the subject line they stay with the LLM.
+    _inbox(("Shop <deals@shop.com>", "Weekend sale", "Use code SAVE2024 at checkout for 20% off.")),
+    # Discount codes in the subject line, where a bare "code" would otherwise score high.
+    _inbox(("Shop <deals@shop.com>", "Your discount code: 482913", "Thanks for signing up! Enjoy this offer.")),
+    _inbox(("Shop <deals@shop.com>", "Promo code 771204 inside", "Use it for 15% off your next order.")),
+    # Confirmation numbers, addresses and card endings near "confirm" or "PIN".
+    _inbox(("Amazon <auto-confirm@amazon.com>", "Your Amazon.com order", "Confirmation number 8472910. Thanks for your order.")),
+    _inbox(("UCSB Housing <housing@ucsb.edu>", "Action needed", "Please confirm your address 93106 before move-in.")),
+    _inbox(("Chase <no-reply@chase.com>", "Security alert", "Your PIN ending 4821 was changed.")),
+    # Numbers without code context.
+    _inbox(("Amazon <a@amazon.com>", "Your order has shipped", "Order #1234567 is on its way. Call 555 1234 with questions.")),
+    _inbox(("Mom <mom@gmail.com>", "Checking in", "Call us when you get a chance, we miss you.")),
+])
+def test_ambiguous_or_missing_codes_defer_to_llm(emails):
+    assert find_verification_code(emails) is None
+
+
+def test_extract_verification_code_skips_llm_for_clear_code():
+    emails = _inbox(("Google <no-reply@accounts.google.com>", "Your Google verification code",
+                     "Your Google verification code is 847291."))
+    assert extract_verification_code(emails) == "Your verification code from Google is 8 4 7 2 9 1."